@@ -3,7 +3,7 @@ Configurações da API do Portal da Transparência.
 """
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Dict, Optional
 
@@ -23,10 +23,10 @@ class APIConfig:
     max_requests_per_minute: int = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "400"))
     
     # Rate limiting por horário
-    rate_limits: Dict[str, int] = {
+    rate_limits: Dict[str, int] = field(default_factory=lambda: {
         "madrugada": 700,  # 00:00 - 06:00
         "diurno": 400      # 06:00 - 24:00
-    }
+    })
     
     # Timeouts
     connection_timeout: int = 30
@@ -37,11 +37,11 @@ class APIConfig:
     backoff_factor: float = 1.5
     
     # Headers padrão
-    default_headers: Dict[str, str] = {
+    default_headers: Dict[str, str] = field(default_factory=lambda: {
         "Accept": "application/json",
         "Content-Type": "application/json",
         "User-Agent": "TransparenciaBR-Analytics/0.1.0"
-    }
+    })
     
     def get_current_rate_limit(self) -> int:
         """Retorna o limite de requisições baseado no horário atual."""
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the DataProcessor cleaning steps on synthetic data.
+
+Usage:
+    python scripts/benchmark_processing.py --rows 1000000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import logging
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data.dataset import PartitionedDatasetWriter
+from src.data.parsers import DATE_FORMAT_BR, parse_currency, parse_dates
+from src.data.processor import DataProcessor
+
+
+def timed(func: Callable, *args, repeat: int = 3) -> Dict[str, Any]:
+    """Best wall time of ``repeat`` runs, and the last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return {"seconds": best, "result": result}
+
+
+def report(name: str, baseline: Dict[str, Any], candidate: Dict[str, Any]) -> None:
+    print(f"{name}:")
+    print(f"  current:  {baseline['seconds']:.3f}s")
+    print(f"  new:      {candidate['seconds']:.3f}s "
+          f"({baseline['seconds'] / candidate['seconds']:.1f}x faster)")
+
+
+def legacy_clean_currency(values: pd.Series) -> pd.Series:
+    """The string-replace chain ``_clean_values`` used before ``parse_currency``."""
+    values = values.astype(str)
+    values = values.str.replace('R$', '', regex=False)
+    values = values.str.replace('.', '', regex=False)
+    values = values.str.replace(',', '.', regex=False)
+    values = values.str.strip()
+    return pd.to_numeric(values, errors='coerce')
+
+
+def currency_column(rows: int, seed: int = 0, negative_share: float = 0.05) -> pd.Series:
+    """Amounts formatted as the API returns them, with some negatives and blanks."""
+    rng = np.random.default_rng(seed)
+    amounts = np.round(rng.lognormal(8, 2, rows), 2)
+    text = pd.Series(amounts).map(
+        lambda v: f"{v:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    )
+    prefix = np.where(rng.random(rows) < 0.5, "R$ ", "")
+    text = prefix + text
+    negative = rng.random(rows) < negative_share
+    text[negative] = "-" + text[negative]
+    text = text.astype(object)
+    text[rng.random(rows) < 0.01] = None
+    return text
+
+
+def bench_currency(rows: int) -> None:
+    values = currency_column(rows)
+    baseline = timed(legacy_clean_currency, values)
+    candidate = timed(parse_currency, values)
+    report(f"currency parsing ({rows:,} rows)", baseline, candidate)
+    
+    # Both agree wherever the old chain produced a number; it lost "-R$ x"
+    # amounts (the "-" ends up separated from the digits) and floats
+    parsed = baseline["result"].notna()
+    assert np.allclose(baseline["result"][parsed], candidate["result"][parsed])
+    print(f"  unparsed: current {(~parsed).sum():,}, new {candidate['result'].isna().sum():,}")
+    floats = pd.Series([1234.5, 10.25])
+    print(f"  floats:   current {legacy_clean_currency(floats).tolist()}, "
+          f"new {parse_currency(floats).tolist()}")
+
+
+def legacy_parse_dates(values: pd.Series) -> pd.Series:
+    """The format-inferring ``pd.to_datetime`` call ``_parse_dates`` used before ``parse_dates``."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(values, errors='coerce')
+
+
+def date_column(rows: int, seed: int = 0) -> pd.Series:
+    """``dd/mm/yyyy`` dates over five years, as the API returns them, with some blanks."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 5 * 365, rows), unit="D")
+    text = pd.Series(days.strftime(DATE_FORMAT_BR), dtype=object)
+    text[rng.random(rows) < 0.01] = None
+    return text
+
+
+def bench_dates(rows: int) -> None:
+    values = date_column(rows)
+    baseline = timed(legacy_parse_dates, values)
+    candidate = timed(parse_dates, values)
+    report(f"date parsing ({rows:,} rows)", baseline, candidate)
+    
+    expected = pd.to_datetime(values, format=DATE_FORMAT_BR)
+    wrong = [(r.notna() & (r != expected)).sum() for r in (baseline["result"], candidate["result"])]
+    unparsed = [(r.isna() & values.notna()).sum() for r in (baseline["result"], candidate["result"])]
+    print(f"  month first: current {wrong[0]:,}, new {wrong[1]:,}")
+    print(f"  unparsed:    current {unparsed[0]:,}, new {unparsed[1]:,}")
+
+
+def write_raw_pagamentos(base_dir: Path, rows: int, seed: int = 0,
+                         basename: str = "pagamentos.parquet") -> None:
+    """Synthetic raw ``pagamentos`` dataset shaped like the API's records."""
+    rng = np.random.default_rng(seed)
+    days = rng.integers(1, 29, rows)
+    months = rng.integers(1, 13, rows)
+    favorecidos = rng.integers(0, 5000, rows)
+    # Negative amounts would fail validation and skip the save
+    amounts = currency_column(rows, seed, negative_share=0)
+    
+    with PartitionedDatasetWriter(base_dir / "pagamentos", basename,
+                                  date_field="data") as writer:
+        for start in range(0, rows, 100_000):
+            writer.write([
+                {
+                    "data": f"{days[i]:02d}/{months[i]:02d}/2023",
+                    "dataDocumento": f"{days[i]:02d}/{months[i]:02d}/2023",
+                    "valor": amounts[i],
+                    "valorDocumento": amounts[i],
+                    "codigoFavorecido": str(favorecidos[i]),
+                    "numeroDocumento": f"2023NE{seed:02d}{i:08d}",
+                    "nomeFavorecido": f"  EMPRESA   {favorecidos[i]}  LTDA ",
+                    "observacao": None if i % 7 else "pagamento  parcial",
+                    "unidadeGestora": {
+                        "codigo": str(150000 + favorecidos[i] % 50),
+                        "orgaoVinculado": {"codigoSIAFI": str(26000 + favorecidos[i] % 5)}
+                    }
+                }
+                for i in range(start, min(start + 100_000, rows))
+            ])
+
+
+def bench_engines(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_raw_pagamentos(tmp / "raw", rows)
+        
+        results = {}
+        for engine in ("pandas", "arrow"):
+            processor = DataProcessor(input_dir=str(tmp / "raw"),
+                                      output_dir=str(tmp / engine / "processed"),
+                                      current_dir=str(tmp / engine / "current"), engine=engine)
+            loaded = processor._load_raw_data("pagamentos")
+            start = time.perf_counter()
+            df = processor.process_dataset("pagamentos")
+            results[engine] = {
+                "seconds": time.perf_counter() - start,
+                "loaded_mb": loaded.memory_usage(deep=True).sum() / 2 ** 20,
+                "processed_mb": df.memory_usage(deep=True).sum() / 2 ** 20
+            }
+    
+    report(f"processing engines ({rows:,} rows)", results["pandas"], results["arrow"])
+    for engine, result in results.items():
+        print(f"  {engine + ':':9} loaded {result['loaded_mb']:.1f} MB, "
+              f"processed {result['processed_mb']:.1f} MB")
+
+
+def bench_streaming(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_raw_pagamentos(tmp / "raw", rows)
+        
+        results = {}
+        for mode in ("in_memory", "streaming"):
+            processor = DataProcessor(input_dir=str(tmp / "raw"),
+                                      output_dir=str(tmp / mode / "processed"),
+                                      current_dir=str(tmp / mode / "current"))
+            start = time.perf_counter()
+            if mode == "in_memory":
+                df = processor.process_dataset("pagamentos")
+                frame_mb = df.memory_usage(deep=True).sum() / 2 ** 20
+            else:
+                processor.process_dataset_streaming("pagamentos", batch_size=100_000)
+                info = next((tmp / mode / "processed" / "pagamentos").glob(".*.info.json"))
+                frame_mb = json.loads(info.read_text())["memory_mb"]
+            results[mode] = {"seconds": time.perf_counter() - start, "frame_mb": frame_mb}
+    
+    report(f"streaming processing ({rows:,} rows, 100,000-row batches)",
+           results["in_memory"], results["streaming"])
+    print(f"  largest frame: in memory {results['in_memory']['frame_mb']:.1f} MB, "
+          f"streaming {results['streaming']['frame_mb']:.1f} MB")
+
+
+def bench_parallel(rows: int) -> None:
+    workers = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_raw_pagamentos(tmp / "raw", rows)
+        
+        results = {}
+        for mode, max_workers in (("sequential", 1), ("parallel", workers)):
+            processor = DataProcessor(input_dir=str(tmp / "raw"),
+                                      output_dir=str(tmp / mode / "processed"),
+                                      current_dir=str(tmp / mode / "current"))
+            start = time.perf_counter()
+            # A budget of one task per worker splits pagamentos by órgão
+            summary = processor.process_all(max_workers=max_workers,
+                                            memory_budget_mb=rows // 1000 or 1)
+            results[mode] = {"seconds": time.perf_counter() - start, "result": summary}
+    
+    report(f"process_all ({rows:,} rows, {workers} workers)",
+           results["sequential"], results["parallel"])
+
+
+def bench_incremental(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_raw_pagamentos(tmp / "raw", rows)
+        processor = DataProcessor(input_dir=str(tmp / "raw"),
+                                  output_dir=str(tmp / "processed"),
+                                  current_dir=str(tmp / "current"))
+        processor.process_incremental("pagamentos")
+        
+        # A daily file of 1% new records, in the partitions of a single month
+        new_rows = max(rows // 100, 1)
+        write_raw_pagamentos(tmp / "raw", new_rows, seed=1, basename="pagamentos_new.parquet")
+        for path in (tmp / "raw" / "pagamentos").glob("year=*/month=*"):
+            if path.name != "month=1":
+                for new_file in path.rglob("pagamentos_new.parquet"):
+                    new_file.unlink()
+        
+        baseline = timed(processor.process_dataset, "pagamentos", repeat=1)
+        candidate = timed(processor.process_incremental, "pagamentos", repeat=1)
+    
+    report(f"incremental processing ({rows:,} rows, one month of {new_rows:,} new rows)",
+           baseline, candidate)
+    print(f"  rows processed: full {len(baseline['result']):,}, "
+          f"incremental {len(candidate['result']):,}")
+
+
+BENCHMARKS = {
+    "currency": bench_currency,
+    "dates": bench_dates,
+    "engines": bench_engines,
+    "streaming": bench_streaming,
+    "parallel": bench_parallel,
+    "incremental": bench_incremental
+}
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark DataProcessor cleaning steps")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows of synthetic data")
+    parser.add_argument("benchmarks", nargs="*",
+                        help=f"Benchmarks to run: {', '.join(BENCHMARKS)} (all by default)")
+    args = parser.parse_args()
+    
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    logging.disable(logging.WARNING)
+    
+    for name in args.benchmarks or BENCHMARKS:
+        BENCHMARKS[name](args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script to compact the Parquet datasets of TransparenciaBR-Analytics.
+
+Repeated collections and processing runs leave many small files per
+partition; this merges them into right-sized files.
+"""
+
+import sys
+import json
+import argparse
+import logging
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data.collector import DataCollector
+from src.data.processor import DataProcessor
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Compact small Parquet files per partition")
+    parser.add_argument("--raw-dir", default="data/raw", help="Raw data directory")
+    parser.add_argument("--processed-dir", default="data/processed",
+                        help="Processed data directory")
+    parser.add_argument("--current-dir", default="data/current",
+                        help="Current-state tables directory")
+    parser.add_argument("--target-rows", type=int, default=None,
+                        help="Rows per compacted file (COMPACT_TARGET_ROWS by default)")
+    parser.add_argument("--skip-raw", action="store_true", help="Do not compact raw data")
+    parser.add_argument("--skip-processed", action="store_true",
+                        help="Do not compact processed data and current-state tables")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    
+    results = {}
+    if not args.skip_raw:
+        collector = DataCollector(output_dir=args.raw_dir)
+        results["raw"] = collector.compact_data(target_rows=args.target_rows)
+    if not args.skip_processed:
+        processor = DataProcessor(input_dir=args.raw_dir, output_dir=args.processed_dir,
+                                  current_dir=args.current_dir)
+        results["processed"] = processor.compact_data(target_rows=args.target_rows)
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -186,8 +186,8 @@ class SetupValidator:
         try:
             from src.api.client import TransparenciaAPIClient
             
-            client = TransparenciaAPIClient()
-            connected = client.test_connection()
+            with TransparenciaAPIClient() as client:
+                connected = client.test_connection()
             
             return self.check(
                 "API Connection",
@@ -45,6 +45,7 @@ setup(
             "transparencia-download=scripts.download_data:main",
             "transparencia-analyze=scripts.run_analysis:main",
             "transparencia-dashboard=scripts.deploy_streamlit:main",
+            "transparencia-compact=scripts.compact_data:main",
         ],
     },
 )
\ No newline at end of file
@@ -1,5 +1,6 @@
 """API client module for Portal da Transparência."""
 
 from .client import TransparenciaAPIClient
+from .async_client import AsyncTransparenciaAPIClient
 
-__all__ = ["TransparenciaAPIClient"]
\ No newline at end of file
+__all__ = ["TransparenciaAPIClient", "AsyncTransparenciaAPIClient"]
\ No newline at end of file
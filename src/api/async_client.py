@@ -0,0 +1,506 @@
+"""
+Asyncio client for Portal da Transparência with bounded concurrency.
+"""
+
+import os
+import json
+import asyncio
+import logging
+from functools import partial
+from typing import Dict, Any, Optional, List, Callable, Awaitable, Tuple
+from urllib.parse import urljoin
+
+import aiohttp
+from dotenv import load_dotenv
+
+from config.constants import MAX_PARALLEL_REQUESTS
+from src.api.cache import CacheEntry, CacheManager, extract_validators
+from src.api.client import (
+    AdaptiveRateController, RateLimiter, TransparenciaAPIClient, parse_retry_after
+)
+from src.api.rate_limiter import (
+    AsyncRateLimiter, AsyncSharedRateLimiter, SharedRateLimiter, get_current_limit
+)
+from src.api.singleflight import AsyncSingleFlight, request_key
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Returned by _fetch when a conditional request gets 304 Not Modified
+NOT_MODIFIED = object()
+
+
+class AsyncTransparenciaAPIClient:
+    """
+    Asyncio counterpart of TransparenciaAPIClient.
+
+    Features:
+    - Same endpoint surface as the synchronous client (awaitable methods)
+    - Single pooled aiohttp connection pool per client
+    - Token-bucket rate limiting (API_RATE_LIMIT requests/minute) adapted to
+      X-Rate-Limit-Remaining and 429 feedback, as in the synchronous client
+    - Time-of-day rate limiting through AsyncRateLimiter (400/700 req/min),
+      lowered along with the adaptive quota
+    - Bounded fan-out of concurrent requests (MAX_PARALLEL_REQUESTS)
+    - Retry with exponential backoff and the shared CacheManager
+    - Coalescing of concurrent identical requests (single-flight)
+
+    Usage:
+        async with AsyncTransparenciaAPIClient() as client:
+            contratos = await client.paginate(client.get_contratos, codigoOrgao="26000")
+    """
+
+    BASE_URL = TransparenciaAPIClient.BASE_URL
+    ENDPOINTS = TransparenciaAPIClient.ENDPOINTS
+
+    # Mirrors the urllib3 Retry configuration of the synchronous client
+    RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+    MAX_RETRIES = 3
+    BACKOFF_FACTOR = 1
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        rate_limiter: Optional[AsyncRateLimiter] = None
+    ):
+        """
+        Initialize the async API client with configuration from environment.
+
+        Args:
+            max_concurrency: Maximum number of requests in flight
+                (defaults to API_MAX_PARALLEL_REQUESTS or MAX_PARALLEL_REQUESTS)
+            rate_limiter: Rate limiter shared with other clients (optional; when
+                RATE_LIMIT_STATE_FILE is set, defaults to one shared across processes)
+        """
+        self.api_token = os.getenv("TRANSPARENCIA_API_TOKEN")
+        self.api_email = os.getenv("TRANSPARENCIA_API_EMAIL")
+
+        if not self.api_token:
+            raise ValueError("TRANSPARENCIA_API_TOKEN not found in environment variables")
+
+        # Configuration
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("API_MAX_PARALLEL_REQUESTS", str(MAX_PARALLEL_REQUESTS))
+        )
+        self.timeout = int(os.getenv("API_TIMEOUT", "60"))
+        self.cache_ttl = int(os.getenv("CACHE_TTL", "3600"))
+
+        self.rate_limit = int(os.getenv("API_RATE_LIMIT", "30"))
+        self.rate_burst = int(os.getenv("API_RATE_BURST", "1"))
+
+        # Setup components
+        self.rate_bucket = RateLimiter(max_calls=self.rate_limit, burst=self.rate_burst,
+                                       schedule=get_current_limit)
+
+        # Speed up or slow down from X-Rate-Limit-Remaining and 429 feedback;
+        # the window limiter follows the same quota
+        self.rate_controller = None
+        if os.getenv("API_ADAPTIVE_RATE", "true").lower() == "true":
+            self.rate_controller = AdaptiveRateController(self.rate_bucket)
+
+        state_file = os.getenv("RATE_LIMIT_STATE_FILE")
+        if rate_limiter is None and state_file:
+            rate_limiter = AsyncSharedRateLimiter(
+                state_file, scope=SharedRateLimiter.scope_for_token(self.api_token),
+                limit=self.rate_bucket.calls_per_minute
+            )
+        self.rate_limiter = rate_limiter or AsyncRateLimiter(
+            limit=self.rate_bucket.calls_per_minute
+        )
+        self.cache = CacheManager(ttl=self.cache_ttl)
+        self.inflight = AsyncSingleFlight()
+
+        # Periodically purge expired entries and keep the cache under its size budget
+        sweep_interval = float(os.getenv("CACHE_SWEEP_INTERVAL", "600"))
+        if self.cache.enabled and sweep_interval > 0:
+            self.cache.start_sweeper(interval=sweep_interval)
+
+        # Created lazily inside the running event loop
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        logger.info(
+            f"AsyncTransparenciaAPIClient initialized (max_concurrency={self.max_concurrency})"
+        )
+
+    async def __aenter__(self) -> "AsyncTransparenciaAPIClient":
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Create the pooled session on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                limit_per_host=self.max_concurrency
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "chave-api-dados": self.api_token,
+                    "Accept": "application/json",
+                    "User-Agent": f"TransparenciaBR-Analytics/1.0 ({self.api_email})"
+                }
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._session
+
+    async def close(self) -> None:
+        """Close the underlying connection pool and the cache."""
+        self.cache.close()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str,
+                     params: Dict[str, Any],
+                     stale: Optional[CacheEntry] = None) -> Tuple[Any, Dict[str, Optional[str]]]:
+        """
+        Perform a single GET request, conditional when ``stale`` has validators.
+
+        Returns:
+            The JSON data (or NOT_MODIFIED on a 304) and the response validators
+
+        Raises:
+            aiohttp.ClientResponseError: For HTTP errors
+            ValueError: For invalid responses
+        """
+        query = {k: v if isinstance(v, str) else str(v) for k, v in params.items()}
+
+        headers = stale.conditional_headers() if stale is not None else {}
+
+        async with session.get(url, params=query, headers=headers) as response:
+            logger.debug(f"Response status: {response.status}")
+
+            # Adjust the shared quota; a 429 also pauses the token bucket
+            if self.rate_controller is not None:
+                self.rate_controller.on_response(response.status, response.headers)
+
+            validators = extract_validators(response.headers)
+            if response.status == 304 and stale is not None:
+                return NOT_MODIFIED, validators
+
+            response.raise_for_status()
+
+            try:
+                return await response.json(content_type=None), validators
+            except json.JSONDecodeError:
+                logger.error(f"Invalid JSON response from {url}")
+                raise ValueError("Invalid JSON response from API")
+
+    async def _cache_call(self, method: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a (disk-backed, blocking) CacheManager method in the default executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(method, *args, **kwargs))
+
+    def _should_retry(self, error: Exception) -> bool:
+        """Return whether a failed request is worth retrying."""
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in self.RETRY_STATUS_CODES
+        return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """
+        Seconds to wait before retrying: Retry-After on 429, else exponential backoff.
+
+        With the adaptive controller a 429 has already paused the token
+        bucket for Retry-After, so the retry just waits for its next token.
+        """
+        if isinstance(error, aiohttp.ClientResponseError) and error.status == 429:
+            if self.rate_controller is not None:
+                return 0.0
+            delay = parse_retry_after((error.headers or {}).get("Retry-After"))
+            if delay is not None:
+                return delay
+        return self.BACKOFF_FACTOR * (2 ** attempt)
+
+    async def _make_request(self, endpoint: str,
+                            params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Make HTTP request with rate limiting, bounded concurrency and retries.
+
+        Concurrent calls for the same endpoint and parameters await a single
+        HTTP request instead of each going to the network. Cache lookups and
+        writes run in the default executor so disk I/O never blocks the loop.
+
+        Args:
+            endpoint: API endpoint path
+            params: Query parameters
+
+        Returns:
+            JSON response data
+        """
+        url = urljoin(self.BASE_URL, endpoint)
+        params = params or {}
+
+        # Check cache first
+        cached_data = await self._cache_call(self.cache.get, url, params)
+        if cached_data is not None:
+            return cached_data
+
+        return await self.inflight.do(request_key(url, params), self._request,
+                                      endpoint, url, params)
+
+    async def _request(self, endpoint: str, url: str, params: Dict[str, Any]) -> Any:
+        """
+        Perform the HTTP request for a cache miss, with retries, and cache the response.
+
+        Expired cache entries with validators are revalidated with a
+        conditional GET, as in the synchronous client. The cache is checked
+        again first, in case the previous leader stored the response just
+        after this caller missed it.
+        """
+        cached_data = await self._cache_call(self.cache.get, url, params)
+        if cached_data is not None:
+            return cached_data
+
+        stale = await self._cache_call(self.cache.get_stale, url, params)
+        session = await self._get_session()
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            # Wait for a token before taking a slot, so paced callers never
+            # hold the semaphore while requests that could go out are queued
+            await asyncio.sleep(self.rate_bucket.reserve())
+            await self.rate_limiter.wait_if_needed()
+            async with self._semaphore:
+                logger.info(f"Making request to {endpoint} with params: {params}")
+
+                try:
+                    data, validators = await self._fetch(session, url, params, stale)
+                except Exception as e:
+                    if attempt >= self.MAX_RETRIES or not self._should_retry(e):
+                        logger.error(f"Request failed for {url}: {e!r}")
+                        raise
+                    error = e
+                else:
+                    if data is NOT_MODIFIED:
+                        return await self._cache_call(self.cache.revalidate, url, params,
+                                                      stale, **validators)
+                    await self._cache_call(self.cache.set, url, params, data,
+                                           refetched=stale is not None, **validators)
+                    return data
+
+            # Back off outside the semaphore so other requests keep flowing;
+            # a 429 waits exactly as long as the server asks, once
+            delay = self._retry_delay(error, attempt)
+            logger.warning(
+                f"Retrying {endpoint} in {delay:.1f}s after {error!r} "
+                f"(attempt {attempt + 1}/{self.MAX_RETRIES})"
+            )
+            await asyncio.sleep(delay)
+
+    async def test_connection(self) -> bool:
+        """
+        Test API connection and authentication.
+
+        Returns:
+            True if connection is successful
+        """
+        try:
+            await self._make_request("/orgaos-siafi", {"pagina": 1, "quantidade": 1})
+            logger.info("API connection test successful")
+            return True
+        except Exception as e:
+            logger.error(f"API connection test failed: {e}")
+            return False
+
+    # Despesas methods
+    async def get_contratos(self, **params) -> List[Dict[str, Any]]:
+        """Buscar contratos."""
+        return await self._make_request(self.ENDPOINTS["despesas_contratos"], params)
+
+    async def get_convenios(self, **params) -> List[Dict[str, Any]]:
+        """Buscar convênios."""
+        return await self._make_request(self.ENDPOINTS["despesas_convenios"], params)
+
+    async def get_cartoes(self, **params) -> List[Dict[str, Any]]:
+        """Buscar despesas com cartões."""
+        return await self._make_request(self.ENDPOINTS["despesas_cartoes"], params)
+
+    async def get_empenhos(self, **params) -> List[Dict[str, Any]]:
+        """Buscar empenhos."""
+        return await self._make_request(self.ENDPOINTS["despesas_empenhos"], params)
+
+    async def get_pagamentos(self, **params) -> List[Dict[str, Any]]:
+        """Buscar pagamentos."""
+        return await self._make_request(self.ENDPOINTS["despesas_pagamentos"], params)
+
+    # Receitas methods
+    async def get_receitas_previstas(self, **params) -> List[Dict[str, Any]]:
+        """Buscar receitas previstas."""
+        return await self._make_request(self.ENDPOINTS["receitas_previstas"], params)
+
+    async def get_receitas_realizadas(self, **params) -> List[Dict[str, Any]]:
+        """Buscar receitas realizadas."""
+        return await self._make_request(self.ENDPOINTS["receitas_realizadas"], params)
+
+    # Servidores methods
+    async def get_servidores(self, **params) -> List[Dict[str, Any]]:
+        """Buscar servidores públicos."""
+        return await self._make_request(self.ENDPOINTS["servidores"], params)
+
+    async def get_servidores_remuneracao(self, **params) -> List[Dict[str, Any]]:
+        """Buscar remuneração de servidores."""
+        return await self._make_request(self.ENDPOINTS["servidores_remuneracao"], params)
+
+    # Benefícios methods
+    async def get_bolsa_familia(self, **params) -> List[Dict[str, Any]]:
+        """Buscar beneficiários do Bolsa Família."""
+        return await self._make_request(self.ENDPOINTS["beneficios_bolsa_familia"], params)
+
+    async def get_auxilio_brasil(self, **params) -> List[Dict[str, Any]]:
+        """Buscar beneficiários do Auxílio Brasil."""
+        return await self._make_request(self.ENDPOINTS["beneficios_auxilio_brasil"], params)
+
+    # Licitações methods
+    async def get_licitacoes(self, **params) -> List[Dict[str, Any]]:
+        """Buscar licitações."""
+        return await self._make_request(self.ENDPOINTS["licitacoes"], params)
+
+    # Sanções methods
+    async def get_empresas_sancionadas(self, tipo: str = "ceis", **params) -> List[Dict[str, Any]]:
+        """
+        Buscar empresas sancionadas.
+
+        Args:
+            tipo: Tipo de sanção (ceis, cepim, ceaf, cnep)
+            **params: Parâmetros adicionais da consulta
+        """
+        endpoint_key = f"sancoes_{tipo}"
+        if endpoint_key not in self.ENDPOINTS:
+            raise ValueError(f"Tipo de sanção inválido: {tipo}")
+
+        return await self._make_request(self.ENDPOINTS[endpoint_key], params)
+
+    # Órgãos methods
+    async def get_orgaos(self, sistema: str = "siafi", **params) -> List[Dict[str, Any]]:
+        """
+        Buscar órgãos.
+
+        Args:
+            sistema: Sistema de origem (siafi ou siape)
+            **params: Parâmetros adicionais da consulta
+        """
+        endpoint_key = f"orgaos_{sistema}"
+        if endpoint_key not in self.ENDPOINTS:
+            raise ValueError(f"Sistema inválido: {sistema}")
+
+        return await self._make_request(self.ENDPOINTS[endpoint_key], params)
+
+    # Fornecedores methods
+    async def get_fornecedores(self, **params) -> List[Dict[str, Any]]:
+        """Buscar fornecedores."""
+        return await self._make_request(self.ENDPOINTS["fornecedores"], params)
+
+    # Utility methods
+    async def fetch_pages(self, method: Callable[..., Awaitable[Any]], pages: List[int],
+                          page_size: int = 500, **params) -> List[Any]:
+        """
+        Fetch several pages concurrently.
+
+        Args:
+            method: Async API method to call
+            pages: Page numbers to fetch
+            page_size: Number of items per page
+            **params: Additional parameters for the API call
+
+        Returns:
+            Page results in the same order as ``pages``
+
+        Raises:
+            Exception: The first failed page's error, once the pages still in
+                flight have been cancelled
+        """
+        results, error = await self._fetch_leading_pages(method, pages, page_size, **params)
+        if error is not None:
+            raise error
+        return results
+
+    async def _fetch_leading_pages(self, method: Callable[..., Awaitable[Any]], pages: List[int],
+                                   page_size: int,
+                                   **params) -> Tuple[List[Any], Optional[Exception]]:
+        """
+        Fetch ``pages`` concurrently, keeping the results that precede the first failure.
+
+        Returns:
+            The results of the pages before the first failed one, in order,
+            and that page's error (None when every page succeeded)
+        """
+        tasks = [
+            asyncio.ensure_future(method(**{**params, "pagina": page, "quantidade": page_size}))
+            for page in pages
+        ]
+        results = []
+        try:
+            for page, task in zip(pages, tasks):
+                try:
+                    results.append(await task)
+                except Exception as e:
+                    logger.error(f"Error on page {page}: {e}")
+                    return results, e
+            return results, None
+        finally:
+            # Later pages are useless past a gap; stop them instead of letting them run on
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def paginate(self, method: Callable[..., Awaitable[Any]],
+                       max_pages: Optional[int] = None, page_size: int = 500,
+                       **params) -> List[Dict[str, Any]]:
+        """
+        Paginate through API results fetching ``max_concurrency`` pages at a time.
+
+        Pagination stops at the first empty or failed page; the pages before
+        a failed one are kept and the requests still in flight are cancelled.
+
+        Args:
+            method: Async API method to call
+            max_pages: Maximum number of pages to fetch (None for all)
+            page_size: Number of items per page
+            **params: Additional parameters for the API call
+
+        Returns:
+            Combined list of all results
+        """
+        all_results = []
+        next_page = 1
+        pages_fetched = 0
+
+        while max_pages is None or next_page <= max_pages:
+            last_page = next_page + self.max_concurrency - 1
+            if max_pages is not None:
+                last_page = min(last_page, max_pages)
+            pages = list(range(next_page, last_page + 1))
+
+            logger.info(f"Fetching pages {pages[0]}-{pages[-1]}")
+            batch, error = await self._fetch_leading_pages(method, pages, page_size, **params)
+
+            reached_end = error is not None
+            for results in batch:
+                if not results:
+                    reached_end = True
+                    break
+                all_results.extend(results)
+                pages_fetched += 1
+
+            if reached_end:
+                break
+
+            next_page = last_page + 1
+
+        logger.info(f"Fetched {len(all_results)} total results across {pages_fetched} pages")
+        return all_results
+
+    def get_available_endpoints(self) -> Dict[str, str]:
+        """Return all available API endpoints."""
+        return self.ENDPOINTS.copy()
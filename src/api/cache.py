@@ -0,0 +1,1131 @@
+"""
+Cache storage for API responses with pluggable backends.
+"""
+
+import os
+import gzip
+import json
+import time
+import zlib
+import sys
+import struct
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import pyarrow as pa
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is listed in requirements.txt
+    msgpack = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """A cached API response."""
+
+    data: Any
+    cached_at: float
+    url: str = ""
+    params: Optional[Dict[str, Any]] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def revalidatable(self) -> bool:
+        """Whether the server sent validators usable in a conditional request."""
+        return bool(self.etag or self.last_modified)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers turning a GET into a conditional request for this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def extract_validators(headers) -> Dict[str, Optional[str]]:
+    """Read the ETag and Last-Modified validators from response headers."""
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified")
+    }
+
+
+class PayloadCodec:
+    """
+    Binary encoding and compression of cached payloads.
+
+    Every payload starts with a small header recording the encoding, the
+    compression codec and the uncompressed size, so entries written with
+    different settings can coexist and be read back transparently.
+    """
+
+    MAGIC = b"TB"
+    VERSION = 1
+    HEADER = struct.Struct(">2sBBBQ")
+
+    ENCODINGS = {"json": 1, "msgpack": 2}
+    CODECS = {"none": 0, "zlib": 1, "gzip": 2, "zstd": 3, "lz4": 4}
+
+    def __init__(self, encoding: Optional[str] = None, codec: Optional[str] = None,
+                 level: Optional[int] = None):
+        """
+        Args:
+            encoding: "msgpack" (default when installed) or "json"
+            codec: "zstd" (default), "lz4", "gzip", "zlib" or "none"
+            level: Compression level (codec default if omitted)
+        """
+        encoding = encoding or os.getenv("CACHE_ENCODING") or (
+            "msgpack" if msgpack is not None else "json"
+        )
+        codec = codec or os.getenv("CACHE_CODEC", "zstd")
+        if level is None and os.getenv("CACHE_COMPRESSION_LEVEL"):
+            level = int(os.getenv("CACHE_COMPRESSION_LEVEL"))
+
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"Unknown cache encoding: {encoding}")
+        if encoding == "msgpack" and msgpack is None:
+            raise ValueError("msgpack encoding requires the msgpack package")
+        if codec not in self.CODECS:
+            raise ValueError(f"Unknown cache codec: {codec}")
+
+        self.encoding = encoding
+        self.codec = codec
+        self.level = level
+
+    def _serialize(self, data: Any, encoding: str) -> bytes:
+        if encoding == "msgpack":
+            return msgpack.packb(data, use_bin_type=True)
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def _deserialize(self, raw: bytes, encoding: str) -> Any:
+        if encoding == "msgpack":
+            return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+        return json.loads(raw.decode('utf-8'))
+
+    def _compress(self, raw: bytes) -> bytes:
+        if self.codec == "zlib":
+            return zlib.compress(raw, 6 if self.level is None else self.level)
+        if self.codec == "gzip":
+            return gzip.compress(raw, 6 if self.level is None else self.level)
+        if self.codec in ("zstd", "lz4"):
+            return pa.Codec(self.codec, compression_level=self.level).compress(raw, asbytes=True)
+        return raw
+
+    @staticmethod
+    def _decompress(body: bytes, codec: str, size: int) -> bytes:
+        if codec == "zlib":
+            return zlib.decompress(body)
+        if codec == "gzip":
+            return gzip.decompress(body)
+        if codec in ("zstd", "lz4"):
+            return pa.Codec(codec).decompress(body, decompressed_size=size, asbytes=True)
+        return body
+
+    def encode(self, data: Any) -> bytes:
+        """Serialize and compress ``data``."""
+        raw = self._serialize(data, self.encoding)
+        header = self.HEADER.pack(
+            self.MAGIC, self.VERSION, self.ENCODINGS[self.encoding],
+            self.CODECS[self.codec], len(raw)
+        )
+        return header + self._compress(raw)
+
+    def decode(self, payload: bytes) -> Any:
+        """Decode a payload written by any codec configuration."""
+        if payload[:2] != self.MAGIC:
+            raise ValueError("Unrecognized cache payload")
+
+        _, _, encoding_id, codec_id, size = self.HEADER.unpack_from(payload)
+        encoding = next(k for k, v in self.ENCODINGS.items() if v == encoding_id)
+        codec = next(k for k, v in self.CODECS.items() if v == codec_id)
+
+        raw = self._decompress(payload[self.HEADER.size:], codec, size)
+        return self._deserialize(raw, encoding)
+
+
+def read_legacy_json(cache_file: Path) -> CacheEntry:
+    """Read a cache file in the original pretty-printed JSON format."""
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        cached_data = json.load(f)
+
+    return CacheEntry(
+        data=cached_data['data'],
+        cached_at=datetime.fromisoformat(cached_data['cached_at']).timestamp(),
+        url=cached_data.get('url', ""),
+        params=cached_data.get('params')
+    )
+
+
+class CacheBackend:
+    """
+    Interface for persistent cache stores.
+
+    Backends store opaque entries by key; expiry and size policy live in
+    CacheManager.
+    """
+
+    name = "base"
+    eviction_policies = ()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry stored under ``key`` or None."""
+        raise NotImplementedError
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Store ``entry`` under ``key``, replacing any previous entry."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Remove the entry stored under ``key`` if present."""
+        raise NotImplementedError
+
+    def clear(self) -> int:
+        """Remove every entry and return how many were removed."""
+        raise NotImplementedError
+
+    def touch(self, key: str, entry: CacheEntry) -> None:
+        """Update ``cached_at`` and the validators of an entry whose payload is unchanged."""
+        self.set(key, entry)
+
+    def purge_expired(self, ttl: int, stale_ttl: int = 0) -> int:
+        """
+        Remove entries older than ``ttl`` seconds and return how many were removed.
+
+        Entries carrying validators are kept ``stale_ttl`` seconds longer so
+        they can still be revalidated with a conditional request.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and size in bytes."""
+        raise NotImplementedError
+
+    def migrate_legacy(self) -> int:
+        """Convert legacy JSON cache files to the backend format and return how many."""
+        return 0
+
+    def evict(self, max_bytes: int, policy: str = "lru") -> int:
+        """Remove entries by ``policy`` until the store fits in ``max_bytes``; return how many."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+
+class FileCacheBackend(CacheBackend):
+    """
+    One file per entry, named after the cache key.
+
+    Entries are written as ``<key>.bin`` through a PayloadCodec. Legacy
+    ``<key>.json`` files are still read and are rewritten in the binary
+    format the first time they are hit. Reads touch the file's mtime, which
+    drives LRU eviction; access counts are not tracked, so LFU is unavailable.
+    """
+
+    name = "file"
+    eviction_policies = ("lru",)
+
+    def __init__(self, cache_dir: Union[str, Path], codec: Optional[PayloadCodec] = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.codec = codec or PayloadCodec()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.bin"
+
+    def _legacy_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _files(self):
+        yield from self.cache_dir.glob("*.bin")
+        yield from self.cache_dir.glob("*.json")
+
+    def _read(self, cache_file: Path) -> CacheEntry:
+        if cache_file.suffix == ".json":
+            return read_legacy_json(cache_file)
+
+        envelope = self.codec.decode(cache_file.read_bytes())
+        return CacheEntry(
+            data=envelope['data'],
+            cached_at=envelope['cached_at'],
+            url=envelope.get('url', ""),
+            params=envelope.get('params'),
+            etag=envelope.get('etag'),
+            last_modified=envelope.get('last_modified')
+        )
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        cache_file = self._path(key)
+        if cache_file.exists():
+            entry = self._read(cache_file)
+            os.utime(cache_file)
+            return entry
+
+        legacy_file = self._legacy_path(key)
+        if legacy_file.exists():
+            entry = read_legacy_json(legacy_file)
+            self.set(key, entry)
+            legacy_file.unlink(missing_ok=True)
+            return entry
+
+        return None
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        payload = self.codec.encode({
+            'cached_at': entry.cached_at,
+            'url': entry.url,
+            'params': entry.params,
+            'etag': entry.etag,
+            'last_modified': entry.last_modified,
+            'data': entry.data
+        })
+
+        # Write atomically so concurrent readers never see a partial file
+        cache_file = self._path(key)
+        tmp_file = cache_file.with_name(f".{cache_file.name}.{os.getpid()}.{threading.get_ident()}")
+        tmp_file.write_bytes(payload)
+        os.replace(tmp_file, cache_file)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+        self._legacy_path(key).unlink(missing_ok=True)
+
+    def clear(self) -> int:
+        removed = 0
+        for cache_file in list(self._files()):
+            cache_file.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def purge_expired(self, ttl: int, stale_ttl: int = 0) -> int:
+        now = time.time()
+        removed = 0
+        for cache_file in list(self._files()):
+            try:
+                entry = self._read(cache_file)
+            except Exception as e:
+                logger.error(f"Error reading cache file {cache_file}: {e}")
+                continue
+            max_age = ttl + stale_ttl if entry.revalidatable else ttl
+            if entry.cached_at < now - max_age:
+                cache_file.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        files = list(self._files())
+        return {
+            "entries": len(files),
+            "size_bytes": sum(f.stat().st_size for f in files)
+        }
+
+    def evict(self, max_bytes: int, policy: str = "lru") -> int:
+        if policy not in self.eviction_policies:
+            raise ValueError(f"Eviction policy {policy} is not supported by the file backend")
+
+        files = []
+        for cache_file in self._files():
+            try:
+                file_stat = cache_file.stat()
+            except FileNotFoundError:
+                continue
+            files.append((file_stat.st_mtime, file_stat.st_size, cache_file))
+
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, cache_file in sorted(files, key=lambda f: f[0]):
+            if total <= max_bytes:
+                break
+            cache_file.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def migrate_legacy(self) -> int:
+        migrated = 0
+        for legacy_file in list(self.cache_dir.glob("*.json")):
+            try:
+                self.set(legacy_file.stem, read_legacy_json(legacy_file))
+            except Exception as e:
+                logger.error(f"Error migrating cache file {legacy_file}: {e}")
+                continue
+            legacy_file.unlink(missing_ok=True)
+            migrated += 1
+        return migrated
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Single SQLite database (WAL mode) holding PayloadCodec-encoded payloads.
+
+    Lookups go through the primary key index and expiry sweeps through an
+    index on ``cached_at``, so neither depends on the number of entries on disk.
+    Reads update ``last_accessed`` and ``hits``, which back LRU and LFU
+    eviction; the updates are buffered in memory and written in one
+    transaction every ACCESS_FLUSH_SIZE distinct keys, before eviction and on
+    ``close``, so hits do not each pay for a write. Legacy ``<key>.json`` files found in the cache directory are
+    imported the first time they are hit.
+    """
+
+    name = "sqlite"
+    eviction_policies = ("lru", "lfu")
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            params TEXT NOT NULL,
+            cached_at REAL NOT NULL,
+            size INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            last_accessed REAL NOT NULL DEFAULT 0,
+            hits INTEGER NOT NULL DEFAULT 0,
+            etag TEXT,
+            last_modified TEXT
+        );
+    """
+
+    INDEXES = """
+        CREATE INDEX IF NOT EXISTS idx_responses_cached_at ON responses (cached_at);
+        CREATE INDEX IF NOT EXISTS idx_responses_last_accessed ON responses (last_accessed);
+        CREATE INDEX IF NOT EXISTS idx_responses_hits ON responses (hits, last_accessed);
+    """
+
+    EVICTION_ORDER = {
+        "lru": "last_accessed",
+        "lfu": "hits, last_accessed",
+    }
+
+    # Keys whose access updates are buffered before they are written
+    ACCESS_FLUSH_SIZE = 256
+
+    def __init__(self, cache_dir: Union[str, Path], codec: Optional[PayloadCodec] = None,
+                 filename: str = "responses.sqlite3"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / filename
+        self.codec = codec or PayloadCodec()
+
+        # Buffered reads: key -> (last access time, hits not yet written)
+        self._accesses: Dict[str, Tuple[float, int]] = {}
+
+        # A single connection shared across threads, serialized by a lock
+        self.lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(self.SCHEMA)
+            self._migrate_schema()
+            self.conn.executescript(self.INDEXES)
+            self.conn.commit()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """The shared connection, reopened on first use after ``close``."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        return self._conn
+
+    def _migrate_schema(self) -> None:
+        """Add columns to databases created before they existed."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(responses)")}
+        for column, definition in (("last_accessed", "REAL NOT NULL DEFAULT 0"),
+                                   ("hits", "INTEGER NOT NULL DEFAULT 0"),
+                                   ("etag", "TEXT"),
+                                   ("last_modified", "TEXT")):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE responses ADD COLUMN {column} {definition}")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT url, params, cached_at, payload, etag, last_modified "
+                "FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is not None:
+                hits = self._accesses.get(key, (0.0, 0))[1]
+                self._accesses[key] = (time.time(), hits + 1)
+                if len(self._accesses) >= self.ACCESS_FLUSH_SIZE:
+                    self._flush_accesses()
+
+        if row is None:
+            return self._import_legacy(key)
+
+        url, params, cached_at, payload, etag, last_modified = row
+        return CacheEntry(
+            data=self.codec.decode(payload),
+            cached_at=cached_at,
+            url=url,
+            params=json.loads(params),
+            etag=etag,
+            last_modified=last_modified
+        )
+
+    def _flush_accesses(self) -> None:
+        """Write the buffered access times and hit counts (lock held)."""
+        if not self._accesses:
+            return
+        self.conn.executemany(
+            "UPDATE responses SET last_accessed = MAX(last_accessed, ?), hits = hits + ? "
+            "WHERE key = ?",
+            [(accessed, hits, key) for key, (accessed, hits) in self._accesses.items()]
+        )
+        self.conn.commit()
+        self._accesses.clear()
+
+    def _import_legacy(self, key: str) -> Optional[CacheEntry]:
+        """Move a legacy JSON cache file into the database."""
+        legacy_file = self.cache_dir / f"{key}.json"
+        if not legacy_file.exists():
+            return None
+
+        entry = read_legacy_json(legacy_file)
+        self.set(key, entry)
+        legacy_file.unlink(missing_ok=True)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        payload = self.codec.encode(entry.data)
+        with self.lock:
+            self._accesses.pop(key, None)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, params, cached_at, size, payload, last_accessed, hits, "
+                "etag, last_modified) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (key, entry.url, json.dumps(entry.params or {}, sort_keys=True),
+                 entry.cached_at, len(payload), payload, time.time(),
+                 entry.etag, entry.last_modified)
+            )
+            self.conn.commit()
+
+    def touch(self, key: str, entry: CacheEntry) -> None:
+        # Leave the payload untouched: a 304 means the stored body is still current
+        with self.lock:
+            updated = self.conn.execute(
+                "UPDATE responses SET cached_at = ?, etag = ?, last_modified = ?, "
+                "last_accessed = ? WHERE key = ?",
+                (entry.cached_at, entry.etag, entry.last_modified, time.time(), key)
+            ).rowcount
+            self.conn.commit()
+        if not updated:
+            self.set(key, entry)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self._accesses.pop(key, None)
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def clear(self) -> int:
+        with self.lock:
+            self._accesses.clear()
+            removed = self.conn.execute("DELETE FROM responses").rowcount
+            self.conn.commit()
+        return removed
+
+    def purge_expired(self, ttl: int, stale_ttl: int = 0) -> int:
+        now = time.time()
+        with self.lock:
+            removed = self.conn.execute(
+                "DELETE FROM responses WHERE cached_at < ? AND "
+                "((etag IS NULL AND last_modified IS NULL) OR cached_at < ?)",
+                (now - ttl, now - ttl - stale_ttl)
+            ).rowcount
+            self.conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": entries, "size_bytes": size}
+
+    def evict(self, max_bytes: int, policy: str = "lru") -> int:
+        if policy not in self.eviction_policies:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+
+        with self.lock:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= max_bytes:
+                return 0
+
+            # Rank entries by their latest reads
+            self._flush_accesses()
+
+            victims = []
+            cursor = self.conn.execute(
+                f"SELECT key, size FROM responses ORDER BY {self.EVICTION_ORDER[policy]}"
+            )
+            for key, size in cursor:
+                if total <= max_bytes:
+                    break
+                victims.append((key,))
+                total -= size
+            cursor.close()
+
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            self.conn.commit()
+        return len(victims)
+
+    def migrate_legacy(self) -> int:
+        migrated = 0
+        for legacy_file in list(self.cache_dir.glob("*.json")):
+            try:
+                self._import_legacy(legacy_file.stem)
+            except Exception as e:
+                logger.error(f"Error migrating cache file {legacy_file}: {e}")
+                continue
+            migrated += 1
+        return migrated
+
+    def close(self) -> None:
+        with self.lock:
+            if self._conn is None:
+                return
+            self._flush_accesses()
+            self._conn.close()
+            self._conn = None
+
+
+def estimate_size(obj: Any) -> int:
+    """Approximate the in-memory footprint of a decoded JSON value in bytes."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(estimate_size(item) for item in obj)
+    return size
+
+
+class MemoryCache:
+    """
+    Thread-safe in-process LRU cache bounded by entry count and approximate bytes.
+
+    Entries keep the ``cached_at`` of the persistent entry they mirror, so a
+    value never outlives the TTL it would have on disk. Cached values are
+    shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, ttl: int) -> Optional[CacheEntry]:
+        """Return a fresh entry and mark it as most recently used."""
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            entry, size = item
+            if time.time() - entry.cached_at >= ttl:
+                del self.entries[key]
+                self.current_bytes -= size
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Store an entry, evicting least recently used ones to stay within bounds."""
+        size = estimate_size(entry.data)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+
+            self.entries[key] = (entry, size)
+            self.current_bytes += size
+
+            while len(self.entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """Remove an entry if present."""
+        with self.lock:
+            item = self.entries.pop(key, None)
+            if item is not None:
+                self.current_bytes -= item[1]
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def purge_expired(self, ttl: int) -> int:
+        """Remove expired entries and return how many were removed."""
+        cutoff = time.time() - ttl
+        with self.lock:
+            expired = [k for k, (entry, _) in self.entries.items() if entry.cached_at < cutoff]
+            for key in expired:
+                self.current_bytes -= self.entries.pop(key)[1]
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return occupancy and hit/miss/eviction counters."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "size_bytes": self.current_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+CACHE_BACKENDS = {
+    FileCacheBackend.name: FileCacheBackend,
+    SQLiteCacheBackend.name: SQLiteCacheBackend,
+}
+
+# Running sweepers by resolved cache directory, shared by the managers using it
+_sweepers: Dict[Path, "CacheSweeper"] = {}
+_sweepers_lock = threading.Lock()
+
+
+class CacheManager:
+    """
+    TTL cache for API responses on top of a pluggable storage backend.
+
+    The backend is chosen with ``backend`` or the CACHE_BACKEND environment
+    variable ("sqlite" by default, "file" for one file per entry). Payloads are
+    encoded with ``codec`` (see PayloadCodec for the CACHE_ENCODING,
+    CACHE_CODEC and CACHE_COMPRESSION_LEVEL variables).
+
+    A MemoryCache tier sits in front of the backend so repeated lookups skip
+    disk access and decoding. It is sized by CACHE_MEMORY_ENTRIES and
+    CACHE_MEMORY_MB; setting either to 0 disables it.
+
+    The persistent tier is kept under a byte budget by evicting entries with
+    an LRU or LFU policy. The budget and policy come from the arguments, then
+    from ``cache_settings.json`` in the cache directory (written by the
+    dashboard through ``set_limits``), then from CACHE_MAX_SIZE_MB and
+    CACHE_EVICTION_POLICY. A CacheSweeper can enforce them periodically.
+
+    Entries stored with ETag/Last-Modified validators outlive their TTL by
+    ``stale_ttl`` seconds (CACHE_STALE_TTL, one week by default). During that
+    window ``get_stale`` hands them to the client for a conditional request,
+    and ``revalidate`` renews them on a 304 without rewriting the payload.
+    """
+
+    SETTINGS_FILE = "cache_settings.json"
+    DEFAULT_MAX_SIZE_MB = 500
+
+    # Enforce the size budget every this many writes
+    EVICTION_CHECK_INTERVAL = 100
+
+    def __init__(self, cache_dir: str = "data/cache", ttl: int = 3600,
+                 backend: Optional[Union[str, CacheBackend]] = None,
+                 codec: Optional[PayloadCodec] = None,
+                 memory_entries: Optional[int] = None,
+                 memory_mb: Optional[float] = None,
+                 max_size_mb: Optional[float] = None,
+                 eviction_policy: Optional[str] = None,
+                 stale_ttl: Optional[int] = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl if stale_ttl is not None else int(
+            os.getenv("CACHE_STALE_TTL", str(7 * 24 * 3600))
+        )
+        self.enabled = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+
+        # Persistent tier counters
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+        # Expired entries renewed by a 304 vs downloaded again
+        self.revalidated = 0
+        self.refetched = 0
+
+        # In-process tier
+        if memory_entries is None:
+            memory_entries = int(os.getenv("CACHE_MEMORY_ENTRIES", "1024"))
+        if memory_mb is None:
+            memory_mb = float(os.getenv("CACHE_MEMORY_MB", "64"))
+        self.memory = None
+        if memory_entries > 0 and memory_mb > 0:
+            self.memory = MemoryCache(max_entries=memory_entries,
+                                      max_bytes=int(memory_mb * 1024 * 1024))
+
+        if isinstance(backend, CacheBackend):
+            self.backend = backend
+        else:
+            backend_name = backend or os.getenv("CACHE_BACKEND", "sqlite")
+            if backend_name not in CACHE_BACKENDS:
+                raise ValueError(f"Unknown cache backend: {backend_name}")
+            self.backend = CACHE_BACKENDS[backend_name](self.cache_dir, codec=codec)
+
+        # Size budget
+        self._fixed_limits = {"max_size_mb": max_size_mb, "eviction_policy": eviction_policy}
+        self.max_size_mb = None
+        self.eviction_policy = None
+        self.evictions = 0
+        self._writes_since_check = 0
+        self.sweeper = None
+        self.load_settings()
+
+    def load_settings(self) -> None:
+        """Resolve the size budget and eviction policy."""
+        settings = {}
+        settings_file = self.cache_dir / self.SETTINGS_FILE
+        if settings_file.exists():
+            try:
+                with open(settings_file, 'r', encoding='utf-8') as f:
+                    settings = json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading cache settings: {e}")
+
+        max_size_mb = self._fixed_limits["max_size_mb"]
+        if max_size_mb is None:
+            max_size_mb = settings.get("max_size_mb")
+        if max_size_mb is None:
+            max_size_mb = float(os.getenv("CACHE_MAX_SIZE_MB", str(self.DEFAULT_MAX_SIZE_MB)))
+
+        policy = (self._fixed_limits["eviction_policy"]
+                  or settings.get("eviction_policy")
+                  or os.getenv("CACHE_EVICTION_POLICY", "lru")).lower()
+        if policy not in self.backend.eviction_policies:
+            raise ValueError(
+                f"Eviction policy {policy} is not supported by the {self.backend.name} backend"
+            )
+
+        self.max_size_mb = max_size_mb
+        self.eviction_policy = policy
+
+    def set_limits(self, max_size_mb: Optional[float] = None,
+                   eviction_policy: Optional[str] = None, persist: bool = True) -> int:
+        """
+        Change the size budget, optionally persisting it for other processes.
+
+        Returns:
+            Number of entries evicted to fit the new budget
+        """
+        if eviction_policy is not None and eviction_policy not in self.backend.eviction_policies:
+            raise ValueError(
+                f"Eviction policy {eviction_policy} is not supported by the "
+                f"{self.backend.name} backend"
+            )
+
+        if max_size_mb is not None:
+            self.max_size_mb = max_size_mb
+        if eviction_policy is not None:
+            self.eviction_policy = eviction_policy
+
+        if persist:
+            settings_file = self.cache_dir / self.SETTINGS_FILE
+            tmp_file = settings_file.with_suffix(".tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({"max_size_mb": self.max_size_mb,
+                           "eviction_policy": self.eviction_policy}, f, indent=2)
+            os.replace(tmp_file, settings_file)
+
+        return self.enforce_size_limit()
+
+    def _get_cache_key(self, url: str, params: Dict[str, Any]) -> str:
+        """Generate a cache key from URL and parameters."""
+        cache_string = f"{url}:{json.dumps(params, sort_keys=True)}"
+        return hashlib.md5(cache_string.encode()).hexdigest()
+
+    def get(self, url: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Retrieve data from cache if available and not expired."""
+        if not self.enabled:
+            return None
+
+        cache_key = self._get_cache_key(url, params)
+
+        if self.memory is not None:
+            entry = self.memory.get(cache_key, self.ttl)
+            if entry is not None:
+                logger.debug(f"Memory cache hit for {url}")
+                return entry.data
+
+        try:
+            entry = self.backend.get(cache_key)
+            if entry is None:
+                self.disk_misses += 1
+                return None
+
+            # Check if cache is still valid
+            if time.time() - entry.cached_at < self.ttl:
+                logger.debug(f"Cache hit for {url}")
+                self.disk_hits += 1
+                if self.memory is not None:
+                    self.memory.set(cache_key, entry)
+                return entry.data
+
+            logger.debug(f"Cache expired for {url}")
+            self.disk_misses += 1
+            # Keep entries that can be revalidated; get_stale() picks them up
+            age = time.time() - entry.cached_at
+            if not entry.revalidatable or age >= self.ttl + self.stale_ttl:
+                self.backend.delete(cache_key)
+        except Exception as e:
+            logger.error(f"Error reading cache: {e}")
+
+        return None
+
+    def get_stale(self, url: str, params: Dict[str, Any]) -> Optional[CacheEntry]:
+        """Return an expired entry that can be revalidated with a conditional request."""
+        if not self.enabled:
+            return None
+
+        try:
+            entry = self.backend.get(self._get_cache_key(url, params))
+        except Exception as e:
+            logger.error(f"Error reading cache: {e}")
+            return None
+
+        if entry is None or not entry.revalidatable:
+            return None
+        return entry
+
+    def revalidate(self, url: str, params: Dict[str, Any], entry: CacheEntry,
+                   etag: Optional[str] = None, last_modified: Optional[str] = None) -> Any:
+        """
+        Renew an entry after the server answered 304 Not Modified.
+
+        Only ``cached_at`` and the validators change; the stored payload is
+        reused as is.
+
+        Returns:
+            The cached data
+        """
+        self.revalidated += 1
+        if not self.enabled:
+            return entry.data
+
+        cache_key = self._get_cache_key(url, params)
+        entry = CacheEntry(
+            data=entry.data,
+            cached_at=time.time(),
+            url=url,
+            params=params,
+            etag=etag or entry.etag,
+            last_modified=last_modified or entry.last_modified
+        )
+
+        if self.memory is not None:
+            self.memory.set(cache_key, entry)
+
+        try:
+            self.backend.touch(cache_key, entry)
+            logger.debug(f"Cache revalidated for {url}")
+        except Exception as e:
+            logger.error(f"Error writing cache: {e}")
+
+        return entry.data
+
+    def set(self, url: str, params: Dict[str, Any], data: Dict[str, Any],
+            etag: Optional[str] = None, last_modified: Optional[str] = None,
+            refetched: bool = False) -> None:
+        """
+        Store data in cache.
+
+        Args:
+            etag: ETag response header, if any
+            last_modified: Last-Modified response header, if any
+            refetched: The data replaces a stale entry whose revalidation failed
+        """
+        if refetched:
+            self.refetched += 1
+        if not self.enabled:
+            return
+
+        cache_key = self._get_cache_key(url, params)
+
+        entry = CacheEntry(data=data, cached_at=time.time(), url=url, params=params,
+                           etag=etag, last_modified=last_modified)
+
+        if self.memory is not None:
+            self.memory.set(cache_key, entry)
+
+        try:
+            self.backend.set(cache_key, entry)
+            logger.debug(f"Data cached for {url}")
+        except Exception as e:
+            logger.error(f"Error writing cache: {e}")
+
+        self._writes_since_check += 1
+        if self._writes_since_check >= self.EVICTION_CHECK_INTERVAL:
+            self.enforce_size_limit()
+
+    def enforce_size_limit(self) -> int:
+        """Evict entries until the persistent tier fits the budget; return how many."""
+        self._writes_since_check = 0
+        if not self.max_size_mb:
+            return 0
+
+        try:
+            evicted = self.backend.evict(int(self.max_size_mb * 1024 * 1024),
+                                         self.eviction_policy)
+        except Exception as e:
+            logger.error(f"Error evicting cache entries: {e}")
+            return 0
+
+        if evicted:
+            self.evictions += evicted
+            logger.info(
+                f"Evicted {evicted} cache entries ({self.eviction_policy}) "
+                f"to stay under {self.max_size_mb:g} MB"
+            )
+        return evicted
+
+    def start_sweeper(self, interval: float = 600) -> "CacheSweeper":
+        """
+        Start a background thread purging expired entries and enforcing the budget.
+
+        Managers over the same cache directory share one sweeper; it runs
+        until every manager that started it has called ``stop_sweeper``.
+        """
+        if self.sweeper is not None and self.sweeper.is_alive():
+            return self.sweeper
+
+        key = self.cache_dir.resolve()
+        with _sweepers_lock:
+            sweeper = _sweepers.get(key)
+            if sweeper is None or not sweeper.is_alive():
+                sweeper = CacheSweeper(self, interval=interval)
+                sweeper.start()
+                _sweepers[key] = sweeper
+            sweeper.users.append(self)
+        self.sweeper = sweeper
+        return sweeper
+
+    def stop_sweeper(self) -> None:
+        """Release the background sweeper, stopping it once no manager uses it."""
+        if self.sweeper is None:
+            return
+
+        key = self.cache_dir.resolve()
+        with _sweepers_lock:
+            self.sweeper.users.remove(self)
+            if not self.sweeper.users:
+                self.sweeper.stop()
+                if _sweepers.get(key) is self.sweeper:
+                    del _sweepers[key]
+            elif self.sweeper.cache is self:
+                # Keep sweeping through a manager that is still open
+                self.sweeper.cache = self.sweeper.users[0]
+        self.sweeper = None
+
+    def close(self) -> None:
+        """Release the background sweeper and close the persistent tier."""
+        sweeper = self.sweeper
+        self.stop_sweeper()
+        if sweeper is not None and not sweeper.users:
+            # Let a sweep in progress finish before the backend goes away
+            sweeper.join()
+        self.backend.close()
+
+    def clear(self) -> int:
+        """Remove all cached entries and return how many were removed."""
+        if self.memory is not None:
+            self.memory.clear()
+        removed = self.backend.clear()
+        logger.info(f"Cache cleared successfully ({removed} entries)")
+        return removed
+
+    def purge_expired(self) -> int:
+        """Remove every expired entry and return how many were removed."""
+        if self.memory is not None:
+            self.memory.purge_expired(self.ttl)
+        removed = self.backend.purge_expired(self.ttl, self.stale_ttl)
+        if removed:
+            logger.info(f"Purged {removed} expired cache entries")
+        return removed
+
+    def migrate_legacy(self) -> int:
+        """Convert legacy JSON cache files in place and return how many were migrated."""
+        migrated = self.backend.migrate_legacy()
+        if migrated:
+            logger.info(f"Migrated {migrated} legacy cache entries")
+        return migrated
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache statistics."""
+        stats = self.backend.stats()
+        stats.update({
+            "backend": self.backend.name,
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "disk_hits": self.disk_hits,
+            "disk_misses": self.disk_misses,
+            "max_size_mb": self.max_size_mb,
+            "eviction_policy": self.eviction_policy,
+            "evictions": self.evictions,
+            "stale_ttl": self.stale_ttl,
+            "revalidated": self.revalidated,
+            "refetched": self.refetched,
+            "memory": self.memory.stats() if self.memory is not None else None
+        })
+        return stats
+
+
+class CacheSweeper(threading.Thread):
+    """Daemon thread that periodically purges expired entries and enforces the size budget."""
+
+    def __init__(self, cache: CacheManager, interval: float = 600):
+        super().__init__(name="cache-sweeper", daemon=True)
+        self.cache = cache
+        self.interval = interval
+        # CacheManagers sharing this sweeper (see CacheManager.start_sweeper)
+        self.users: List[CacheManager] = []
+        self._stop_event = threading.Event()
+
+    def sweep(self) -> Dict[str, int]:
+        """Run one sweep and return what was removed."""
+        self.cache.load_settings()
+        return {
+            "expired": self.cache.purge_expired(),
+            "evicted": self.cache.enforce_size_limit()
+        }
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Cache sweep failed: {e}")
+
+    def stop(self) -> None:
+        """Ask the thread to exit after the current sweep."""
+        self._stop_event.set()
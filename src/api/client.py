@@ -5,19 +5,25 @@ Robust API client for Portal da Transparência with rate limiting, caching, and
 import os
 import time
 import json
-import hashlib
 import logging
-from typing import Dict, Any, Optional, List, Union
-from datetime import datetime, timedelta
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Union, Iterator, Callable
+from email.utils import parsedate_to_datetime
 from functools import wraps
 from urllib.parse import urljoin
-from pathlib import Path
 
+import pyarrow as pa
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+from src.api.cache import CacheManager, extract_validators
+from src.api.rate_limiter import SharedRateLimiter, get_current_limit
+from src.api.singleflight import SingleFlight, request_key
+
 # Load environment variables
 load_dotenv()
 
@@ -26,98 +32,217 @@ logger = logging.getLogger(__name__)
 
 
 class RateLimiter:
-    """Simple rate limiter implementation."""
+    """
+    Thread-safe token-bucket rate limiter.
+    
+    The bucket refills continuously at ``max_calls / window_seconds`` tokens
+    per second, so sustained throughput equals the quota, and holds up to
+    ``burst`` tokens: after an idle spell that many calls may go out back to
+    back, which lets a window that opens with a full bucket admit up to
+    ``burst`` calls beyond ``max_calls``; keep ``burst`` well below
+    ``max_calls`` when the server counts calls per fixed window. Callers
+    that find the bucket empty reserve the next token and sleep outside the
+    lock, so acquiring is O(1) and waiters are served in arrival order.
+    
+    ``schedule`` optionally returns the server's current per-minute quota
+    (e.g. ``get_current_limit`` from src.api.rate_limiter, 400/700 by time
+    of day); the refill rate follows it whenever it is the tighter bound.
+    
+    Use ``acquire()`` directly or decorate a function with the instance;
+    asyncio callers ``await asyncio.sleep(limiter.reserve())`` instead.
+    """
     
-    def __init__(self, max_calls: int = 30, window_seconds: int = 60):
+    def __init__(self, max_calls: int = 30, window_seconds: float = 60, burst: int = 1,
+                 schedule: Optional[Callable[[], int]] = None):
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        
         self.max_calls = max_calls
         self.window_seconds = window_seconds
-        self.calls = []
+        self.burst = burst
+        self.schedule = schedule
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def refill_rate(self) -> float:
+        """Tokens added per second under the current quota."""
+        calls = self.max_calls
+        if self.schedule is not None:
+            calls = min(calls, self.schedule() * self.window_seconds / 60)
+        return calls / self.window_seconds
+    
+    def calls_per_minute(self) -> float:
+        """Current quota (as adjusted by an AdaptiveRateController) per minute."""
+        return self.max_calls * 60 / self.window_seconds
+    
+    def reserve(self) -> float:
+        """
+        Take one token without sleeping.
+        
+        Returns:
+            Seconds the caller must wait before using the token
+        """
+        with self.lock:
+            rate = self._refill()
+            
+            # Tokens go negative while callers are queued for future refills
+            self.tokens -= 1
+            return -self.tokens / rate if self.tokens < 0 else 0.0
+    
+    def acquire(self) -> float:
+        """
+        Take one token, sleeping until it is available.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        wait_time = self.reserve()
+        if wait_time > 0:
+            logger.debug(f"Rate limit reached. Sleeping for {wait_time:.2f} seconds")
+            time.sleep(wait_time)
+        return wait_time
+    
+    def _refill(self) -> float:
+        """Credit tokens accrued since the last update (lock held); return the rate."""
+        now = time.monotonic()
+        rate = self.refill_rate()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        return rate
+    
+    def set_max_calls(self, max_calls: float) -> None:
+        """Change the quota; tokens accrued so far are kept."""
+        with self.lock:
+            self._refill()
+            self.max_calls = max_calls
+    
+    def pause(self, seconds: float) -> None:
+        """Hold back callers that have not reserved a token yet for ``seconds``."""
+        with self.lock:
+            rate = self._refill()
+            # The next token becomes available exactly when the pause ends
+            self.tokens = min(self.tokens, 1.0) - seconds * rate
     
     def __call__(self, func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            now = time.time()
-            # Remove old calls outside the window
-            self.calls = [call_time for call_time in self.calls 
-                          if now - call_time < self.window_seconds]
-            
-            # Check if we've exceeded the rate limit
-            if len(self.calls) >= self.max_calls:
-                sleep_time = self.window_seconds - (now - self.calls[0])
-                logger.warning(f"Rate limit reached. Sleeping for {sleep_time:.2f} seconds")
-                time.sleep(sleep_time)
-                # Retry after sleeping
-                return wrapper(*args, **kwargs)
-            
-            # Record this call and proceed
-            self.calls.append(now)
+            self.acquire()
             return func(*args, **kwargs)
         
         return wrapper
 
 
-class CacheManager:
-    """Simple file-based cache manager."""
-    
-    def __init__(self, cache_dir: str = "data/cache", ttl: int = 3600):
-        self.cache_dir = Path(cache_dir)
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self.ttl = ttl
-        self.enabled = os.getenv("CACHE_ENABLED", "true").lower() == "true"
-    
-    def _get_cache_key(self, url: str, params: Dict[str, Any]) -> str:
-        """Generate a cache key from URL and parameters."""
-        cache_string = f"{url}:{json.dumps(params, sort_keys=True)}"
-        return hashlib.md5(cache_string.encode()).hexdigest()
-    
-    def get(self, url: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Retrieve data from cache if available and not expired."""
-        if not self.enabled:
-            return None
-            
-        cache_key = self._get_cache_key(url, params)
-        cache_file = self.cache_dir / f"{cache_key}.json"
-        
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    cached_data = json.load(f)
-                
-                # Check if cache is still valid
-                cached_time = datetime.fromisoformat(cached_data['cached_at'])
-                if datetime.now() - cached_time < timedelta(seconds=self.ttl):
-                    logger.debug(f"Cache hit for {url}")
-                    return cached_data['data']
-                else:
-                    logger.debug(f"Cache expired for {url}")
-                    cache_file.unlink()
-            except Exception as e:
-                logger.error(f"Error reading cache: {e}")
-        
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delay in seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
         return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class AdaptiveRateController:
+    """
+    AIMD control of a RateLimiter from server feedback.
+    
+    - Additive increase: every successful response that reports headroom in
+      ``X-Rate-Limit-Remaining`` raises the quota by ``increase`` calls per
+      window, up to ``ceiling`` (defaults to the limiter's configured
+      quota, capped by its schedule).
+    - Multiplicative decrease: a 429 multiplies the quota by ``decrease`` and
+      pauses the limiter for ``Retry-After`` (or one paced interval); a
+      response reporting less than ``low_watermark`` of the quota left
+      applies the gentler ``soft_decrease``.
+    
+    Without the header the quota only moves down, so the configured rate is
+    never exceeded blindly.
+    """
     
-    def set(self, url: str, params: Dict[str, Any], data: Dict[str, Any]) -> None:
-        """Store data in cache."""
-        if not self.enabled:
-            return
-            
-        cache_key = self._get_cache_key(url, params)
-        cache_file = self.cache_dir / f"{cache_key}.json"
+    def __init__(self, limiter: RateLimiter, floor: float = 5, ceiling: Optional[float] = None,
+                 increase: float = 1, decrease: float = 0.5, soft_decrease: float = 0.9,
+                 low_watermark: float = 0.1):
+        self.limiter = limiter
+        self.floor = floor
+        self.ceiling = ceiling
+        self.increase = increase
+        self.decrease = decrease
+        self.soft_decrease = soft_decrease
+        self.low_watermark = low_watermark
+        self.initial_calls = limiter.max_calls
+        self.lock = threading.Lock()
+        self.throttled = 0
+        self.last_remaining: Optional[int] = None
+    
+    def get_ceiling(self) -> float:
+        """Highest quota the controller may reach in the current window."""
+        if self.ceiling is not None:
+            return self.ceiling
+        if self.limiter.schedule is not None:
+            scheduled = self.limiter.schedule() * self.limiter.window_seconds / 60
+            return min(self.initial_calls, scheduled)
+        return self.initial_calls
+    
+    def on_response(self, status_code: int, headers) -> Optional[float]:
+        """
+        Adjust the limiter after a response.
         
+        Returns:
+            Seconds to wait before retrying when throttled (429), else None
+        """
+        remaining = headers.get("X-Rate-Limit-Remaining")
         try:
-            cached_data = {
-                'cached_at': datetime.now().isoformat(),
-                'url': url,
-                'params': params,
-                'data': data
-            }
+            remaining = int(remaining) if remaining is not None else None
+        except ValueError:
+            remaining = None
+        
+        with self.lock:
+            current = self.limiter.max_calls
+            ceiling = self.get_ceiling()
+            self.last_remaining = remaining
             
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cached_data, f, ensure_ascii=False, indent=2)
+            if status_code == 429:
+                self.throttled += 1
+                target = max(self.floor, current * self.decrease)
+                delay = parse_retry_after(headers.get("Retry-After"))
+                if delay is None:
+                    delay = 1 / self.limiter.refill_rate()
+                self.limiter.set_max_calls(target)
+                self.limiter.pause(delay)
+                logger.warning(
+                    f"Throttled by the API: rate lowered to {target:.0f}/window, "
+                    f"pausing {delay:.1f}s"
+                )
+                return delay
             
-            logger.debug(f"Data cached for {url}")
-        except Exception as e:
-            logger.error(f"Error writing cache: {e}")
+            if remaining is None or status_code >= 400:
+                return None
+            
+            if remaining < self.low_watermark * ceiling:
+                target = max(self.floor, current * self.soft_decrease)
+            else:
+                target = min(ceiling, current + self.increase)
+            
+            if target != current:
+                self.limiter.set_max_calls(target)
+                logger.debug(f"Adaptive rate: {current:.0f} -> {target:.0f} per window "
+                             f"(remaining {remaining})")
+        return None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the current quota and throttling counters."""
+        return {
+            "max_calls": self.limiter.max_calls,
+            "ceiling": self.get_ceiling(),
+            "throttled": self.throttled,
+            "last_remaining": self.last_remaining
+        }
 
 
 class TransparenciaAPIClient:
@@ -125,15 +250,21 @@ class TransparenciaAPIClient:
     Robust client for Portal da Transparência API.
     
     Features:
-    - Automatic rate limiting (30 requests/minute)
+    - Automatic token-bucket rate limiting (API_RATE_LIMIT requests/minute,
+      capped by the 400/700 time-of-day quota), adapted to the server's
+      X-Rate-Limit-Remaining and 429/Retry-After feedback
     - Exponential backoff retry logic
     - Intelligent caching with configurable TTL
+    - Coalescing of concurrent identical requests (single-flight)
     - Comprehensive error handling
     - Detailed logging
     """
     
     BASE_URL = "https://api.portaldatransparencia.gov.br/api-de-dados"
     
+    # Retries of a request answered with 429 Too Many Requests
+    THROTTLE_RETRIES = 3
+    
     # API Endpoints
     ENDPOINTS = {
         # Despesas
@@ -189,13 +320,36 @@ class TransparenciaAPIClient:
         
         # Configuration
         self.rate_limit = int(os.getenv("API_RATE_LIMIT", "30"))
+        self.rate_burst = int(os.getenv("API_RATE_BURST", "1"))
         self.timeout = int(os.getenv("API_TIMEOUT", "60"))
         self.cache_ttl = int(os.getenv("CACHE_TTL", "3600"))
         
         # Setup components
         self.session = self._setup_session()
-        self.rate_limiter = RateLimiter(max_calls=self.rate_limit)
+        self.rate_limiter = RateLimiter(max_calls=self.rate_limit, burst=self.rate_burst,
+                                        schedule=get_current_limit)
+        
+        # Speed up or slow down from X-Rate-Limit-Remaining and 429 feedback
+        self.rate_controller = None
+        if os.getenv("API_ADAPTIVE_RATE", "true").lower() == "true":
+            self.rate_controller = AdaptiveRateController(self.rate_limiter)
+        
+        # Quota shared with other processes using the same token (opt-in),
+        # lowered along with the adaptive quota
+        self.shared_limiter = None
+        state_file = os.getenv("RATE_LIMIT_STATE_FILE")
+        if state_file:
+            self.shared_limiter = SharedRateLimiter(
+                state_file, scope=SharedRateLimiter.scope_for_token(self.api_token),
+                limit=self.rate_limiter.calls_per_minute
+            )
         self.cache = CacheManager(ttl=self.cache_ttl)
+        self.inflight = SingleFlight()
+        
+        # Periodically purge expired entries and keep the cache under its size budget
+        sweep_interval = float(os.getenv("CACHE_SWEEP_INTERVAL", "600"))
+        if self.cache.enabled and sweep_interval > 0:
+            self.cache.start_sweeper(interval=sweep_interval)
         
         # Configure logging
         log_level = os.getenv("LOG_LEVEL", "INFO")
@@ -206,6 +360,17 @@ class TransparenciaAPIClient:
         
         logger.info("TransparenciaAPIClient initialized successfully")
     
+    def close(self) -> None:
+        """Close the cache and the HTTP session."""
+        self.cache.close()
+        self.session.close()
+    
+    def __enter__(self) -> "TransparenciaAPIClient":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
     def _setup_session(self) -> requests.Session:
         """Setup requests session with retry logic and connection pooling."""
         session = requests.Session()
@@ -214,7 +379,8 @@ class TransparenciaAPIClient:
         retry_strategy = Retry(
             total=3,
             backoff_factor=1,
-            status_forcelist=[408, 429, 500, 502, 503, 504],
+            # 429 is handled by _send() through the adaptive rate controller
+            status_forcelist=[408, 500, 502, 503, 504],
             allowed_methods=["HEAD", "GET", "OPTIONS"]
         )
         
@@ -236,11 +402,14 @@ class TransparenciaAPIClient:
         
         return session
     
-    @RateLimiter()
     def _make_request(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Make HTTP request with rate limiting and error handling.
         
+        Concurrent calls for the same endpoint and parameters share a single
+        HTTP request: the first caller performs it and the others wait for
+        its result, so only one of them spends rate-limit quota.
+        
         Args:
             endpoint: API endpoint path
             params: Query parameters
@@ -260,23 +429,34 @@ class TransparenciaAPIClient:
         if cached_data is not None:
             return cached_data
         
-        logger.info(f"Making request to {endpoint} with params: {params}")
+        return self.inflight.do(request_key(url, params), self._fetch, endpoint, url, params)
+    
+    def _fetch(self, endpoint: str, url: str, params: Dict[str, Any]) -> Any:
+        """
+        Perform the HTTP request for a cache miss and cache the response.
+        
+        Runs as the single-flight leader. The cache is checked again first:
+        a caller that missed just as the previous leader stored its response
+        must not repeat the request.
+        
+        Expired cache entries that carry an ETag or Last-Modified validator
+        are revalidated with a conditional GET; on 304 Not Modified the cached
+        body is reused instead of being downloaded again.
+        """
+        cached_data = self.cache.get(url, params)
+        if cached_data is not None:
+            return cached_data
+        
+        stale = self.cache.get_stale(url, params)
+        headers = stale.conditional_headers() if stale is not None else {}
         
         try:
-            response = self.session.get(
-                url,
-                params=params,
-                timeout=self.timeout
-            )
-            
-            # Log response details
-            logger.debug(f"Response status: {response.status_code}")
-            logger.debug(f"Response headers: {dict(response.headers)}")
+            response = self._send(endpoint, url, params, headers)
             
-            # Check for rate limit headers
-            if 'X-Rate-Limit-Remaining' in response.headers:
-                remaining = response.headers['X-Rate-Limit-Remaining']
-                logger.info(f"Rate limit remaining: {remaining}")
+            validators = extract_validators(response.headers)
+            if response.status_code == 304 and stale is not None:
+                logger.debug(f"Not modified: reusing cached body for {endpoint}")
+                return self.cache.revalidate(url, params, stale, **validators)
             
             response.raise_for_status()
             
@@ -284,7 +464,7 @@ class TransparenciaAPIClient:
             data = response.json()
             
             # Cache the successful response
-            self.cache.set(url, params, data)
+            self.cache.set(url, params, data, refetched=stale is not None, **validators)
             
             return data
             
@@ -304,6 +484,55 @@ class TransparenciaAPIClient:
             logger.error(f"Unexpected error for {url}: {e}")
             raise
     
+    def _send(self, endpoint: str, url: str, params: Dict[str, Any],
+              headers: Dict[str, str]) -> requests.Response:
+        """
+        Issue the GET once the rate limiters allow it, retrying throttled responses.
+        
+        Every response is fed to the adaptive controller. On 429 it lowers the
+        rate and pauses the limiter for Retry-After, so the retry waits in
+        ``acquire()`` instead of sleeping blindly. The last response is
+        returned as is after THROTTLE_RETRIES retries.
+        """
+        for attempt in range(self.THROTTLE_RETRIES + 1):
+            self.rate_limiter.acquire()
+            if self.shared_limiter is not None:
+                self.shared_limiter.wait_if_needed()
+            
+            logger.info(f"Making request to {endpoint} with params: {params}")
+            
+            response = self.session.get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=self.timeout
+            )
+            
+            # Log response details
+            logger.debug(f"Response status: {response.status_code}")
+            logger.debug(f"Response headers: {dict(response.headers)}")
+            
+            # Check for rate limit headers
+            if 'X-Rate-Limit-Remaining' in response.headers:
+                remaining = response.headers['X-Rate-Limit-Remaining']
+                logger.info(f"Rate limit remaining: {remaining}")
+            
+            if self.rate_controller is not None:
+                self.rate_controller.on_response(response.status_code, response.headers)
+            
+            if response.status_code != 429 or attempt == self.THROTTLE_RETRIES:
+                return response
+            
+            if self.rate_controller is None:
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                self.rate_limiter.pause(delay if delay is not None else 2 ** attempt)
+            
+            logger.warning(
+                f"Throttled on {endpoint}; retrying (attempt {attempt + 1}/{self.THROTTLE_RETRIES})"
+            )
+        
+        return response
+    
     def test_connection(self) -> bool:
         """
         Test API connection and authentication.
@@ -410,20 +639,86 @@ class TransparenciaAPIClient:
     
     # Utility methods
     def paginate(self, method: callable, max_pages: Optional[int] = None, 
-                 page_size: int = 500, **params) -> List[Dict[str, Any]]:
+                 page_size: int = 500, prefetch: int = 0, **params) -> List[Dict[str, Any]]:
         """
         Paginate through API results.
         
+        Materializes every record in memory; use iter_pages() or iter_records()
+        for large endpoints.
+        
         Args:
             method: API method to call
             max_pages: Maximum number of pages to fetch (None for all)
             page_size: Number of items per page
+            prefetch: Number of pages kept in flight (0 fetches one page at a time)
             **params: Additional parameters for the API call
             
         Returns:
             Combined list of all results
         """
         all_results = []
+        pages = 0
+        
+        for results in self.iter_pages(method, max_pages=max_pages, page_size=page_size,
+                                       prefetch=prefetch, **params):
+            all_results.extend(results)
+            pages += 1
+        
+        logger.info(f"Fetched {len(all_results)} total results across {pages} pages")
+        return all_results
+    
+    def iter_pages(self, method: callable, max_pages: Optional[int] = None,
+                   page_size: int = 500, prefetch: int = 0, as_arrow: bool = False,
+                   **params) -> Iterator[Union[List[Dict[str, Any]], pa.RecordBatch]]:
+        """
+        Yield API results one page at a time.
+        
+        Only the current page (plus ``prefetch`` pages in flight) is held in
+        memory, so callers can flush each page before the next one arrives.
+        
+        Args:
+            method: API method to call
+            max_pages: Maximum number of pages to fetch (None for all)
+            page_size: Number of items per page
+            prefetch: Number of pages kept in flight (0 fetches one page at a time)
+            as_arrow: Yield each page as a ``pyarrow.RecordBatch`` instead of a list
+            **params: Additional parameters for the API call
+            
+        Yields:
+            The results of each non-empty page
+        """
+        if prefetch > 0:
+            pages = self.prefetch_pages(method, window=prefetch, max_pages=max_pages,
+                                        page_size=page_size, **params)
+        else:
+            pages = self._iter_pages_sequential(method, max_pages, page_size, **params)
+        
+        for results in pages:
+            yield pa.RecordBatch.from_pylist(results) if as_arrow else results
+    
+    def iter_records(self, method: callable, max_pages: Optional[int] = None,
+                     page_size: int = 500, prefetch: int = 0,
+                     **params) -> Iterator[Dict[str, Any]]:
+        """
+        Yield API results one record at a time.
+        
+        Args:
+            method: API method to call
+            max_pages: Maximum number of pages to fetch (None for all)
+            page_size: Number of items per page
+            prefetch: Number of pages kept in flight (0 fetches one page at a time)
+            **params: Additional parameters for the API call
+            
+        Yields:
+            Each record of each page
+        """
+        for results in self.iter_pages(method, max_pages=max_pages, page_size=page_size,
+                                       prefetch=prefetch, **params):
+            yield from results
+    
+    def _iter_pages_sequential(self, method: callable, max_pages: Optional[int],
+                               page_size: int, **params) -> Iterator[List[Dict[str, Any]]]:
+        """Fetch pages one after another until an empty page or an error."""
         page = 1
         
         while True:
@@ -433,23 +728,83 @@ class TransparenciaAPIClient:
                 
                 logger.info(f"Fetching page {page}")
                 results = method(**params)
+            except Exception as e:
+                logger.error(f"Error on page {page}: {e}")
+                break
+            
+            if not results:
+                break
+            
+            yield results
+            
+            if max_pages and page >= max_pages:
+                break
+            
+            page += 1
+    
+    def prefetch_pages(self, method: callable, window: int = 4, max_pages: Optional[int] = None,
+                       page_size: int = 500, **params) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield pages in order while keeping up to ``window`` requests in flight.
+        
+        Pages are fetched speculatively on a thread pool. Iteration stops at the
+        first empty page, or at a page shorter than the largest page seen so far
+        (the API may cap ``quantidade`` below ``page_size``). Speculative requests
+        past the end are cancelled when they have not started yet and discarded
+        otherwise.
+        
+        Args:
+            method: API method to call
+            window: Number of pages kept in flight
+            max_pages: Maximum number of pages to fetch (None for all)
+            page_size: Number of items per page
+            **params: Additional parameters for the API call
+            
+        Yields:
+            The results of each page, starting at page 1
+        """
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        
+        def fetch(page: int) -> List[Dict[str, Any]]:
+            logger.info(f"Fetching page {page}")
+            return method(**{**params, 'pagina': page, 'quantidade': page_size})
+        
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix="paginate")
+        pending = deque()
+        next_page = 1
+        largest_page = 0
+        
+        try:
+            while True:
+                # Keep the window full
+                while len(pending) < window and (max_pages is None or next_page <= max_pages):
+                    pending.append((next_page, executor.submit(fetch, next_page)))
+                    next_page += 1
                 
-                if not results:
+                if not pending:
                     break
-                    
-                all_results.extend(results)
                 
-                if max_pages and page >= max_pages:
+                page, future = pending.popleft()
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"Error on page {page}: {e}")
                     break
-                    
-                page += 1
                 
-            except Exception as e:
-                logger.error(f"Error on page {page}: {e}")
-                break
-        
-        logger.info(f"Fetched {len(all_results)} total results across {page-1} pages")
-        return all_results
+                if not results:
+                    break
+                
+                yield results
+                
+                if len(results) < largest_page:
+                    logger.debug(f"Short page {page} ({len(results)} < {largest_page}), stopping")
+                    break
+                largest_page = max(largest_page, len(results))
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
     
     def get_available_endpoints(self) -> Dict[str, str]:
         """Return all available API endpoints."""
@@ -457,22 +812,20 @@ class TransparenciaAPIClient:
     
     def clear_cache(self) -> None:
         """Clear all cached data."""
-        cache_dir = Path("data/cache")
-        if cache_dir.exists():
-            for cache_file in cache_dir.glob("*.json"):
-                cache_file.unlink()
-            logger.info("Cache cleared successfully")
+        self.cache.clear()
     
     def get_stats(self) -> Dict[str, Any]:
         """Get client statistics."""
-        cache_dir = Path("data/cache")
-        cache_count = len(list(cache_dir.glob("*.json"))) if cache_dir.exists() else 0
+        cache_stats = self.cache.get_stats()
         
         return {
             "rate_limit": self.rate_limit,
             "timeout": self.timeout,
             "cache_ttl": self.cache_ttl,
             "cache_enabled": self.cache.enabled,
-            "cached_items": cache_count,
+            "cached_items": cache_stats["entries"],
+            "cache": cache_stats,
+            "requests": self.inflight.get_stats(),
+            "rate": self.rate_controller.get_stats() if self.rate_controller is not None else None,
             "endpoints_available": len(self.ENDPOINTS)
         }
\ No newline at end of file
@@ -3,15 +3,39 @@ Rate Limiter para controlar requisições à API.
 """
 
 import asyncio
+import hashlib
+import os
+import sqlite3
 import time
 from collections import deque
 from datetime import datetime, timedelta
+from pathlib import Path
 from threading import Lock
-from typing import Optional
+from typing import Callable, Optional, Union
 
 from loguru import logger
 
 
+def get_current_limit(now: Optional[datetime] = None) -> int:
+    """
+    Retorna o limite de requisições por minuto da API para o horário.
+    
+    - 700 requisições/minuto entre 00:00 e 06:00
+    - 400 requisições/minuto entre 06:00 e 24:00
+    """
+    current_hour = (now or datetime.now()).hour
+    if 0 <= current_hour < 6:
+        return 700
+    return 400
+
+
+def _apply_limit(current_limit: int, limit: Optional[Callable[[], float]]) -> int:
+    """Limita ``current_limit`` pela cota retornada por ``limit``, se houver."""
+    if limit is None:
+        return current_limit
+    return max(1, min(current_limit, int(limit())))
+
+
 class RateLimiter:
     """
     Implementa rate limiting com janela deslizante.
@@ -28,10 +52,7 @@ class RateLimiter:
         
     def get_current_limit(self) -> int:
         """Retorna o limite atual baseado no horário."""
-        current_hour = datetime.now().hour
-        if 0 <= current_hour < 6:
-            return 700
-        return 400
+        return get_current_limit()
     
     def _cleanup_old_requests(self):
         """Remove requisições antigas da fila."""
@@ -90,18 +111,21 @@ class RateLimiter:
 
 
 class AsyncRateLimiter:
-    """Versão assíncrona do Rate Limiter."""
+    """
+    Versão assíncrona do Rate Limiter.
     
-    def __init__(self):
+    ``limit`` opcionalmente retorna uma cota por minuto menor que a do
+    horário (por exemplo a cota adaptativa do cliente).
+    """
+    
+    def __init__(self, limit: Optional[Callable[[], float]] = None):
         self.requests = deque()
         self.lock = asyncio.Lock()
+        self.limit = limit
         
     def get_current_limit(self) -> int:
-        """Retorna o limite atual baseado no horário."""
-        current_hour = datetime.now().hour
-        if 0 <= current_hour < 6:
-            return 700
-        return 400
+        """Retorna o limite atual baseado no horário (e em ``limit``)."""
+        return _apply_limit(get_current_limit(), self.limit)
     
     async def _cleanup_old_requests(self):
         """Remove requisições antigas da fila."""
@@ -132,4 +156,171 @@ class AsyncRateLimiter:
                 await self._cleanup_old_requests()
                 self.requests.append(time.time())
                 
-            return wait_time
\ No newline at end of file
+            return wait_time
+
+
+class SharedRateLimiter:
+    """
+    Rate limiter com janela deslizante compartilhada entre processos.
+    
+    O estado fica em um banco SQLite local (``RATE_LIMIT_STATE_FILE``), de
+    modo que vários processos coletores usando o mesmo token respeitam juntos
+    os limites de 400/700 requisições/minuto. Cada reserva acontece numa
+    transação ``BEGIN IMMEDIATE``, que serializa os processos sem depender
+    de nenhum serviço externo.
+    
+    ``scope`` separa contadores de tokens diferentes no mesmo arquivo; use
+    ``scope_for_token`` para derivá-lo do token sem gravá-lo em disco.
+    ``limit`` opcionalmente retorna uma cota por minuto menor que a do
+    horário, como a cota adaptativa do cliente (``RateLimiter.calls_per_minute``
+    em src.api.client), para que este processo também desacelere aqui.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS requests (
+            scope TEXT NOT NULL,
+            ts REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_requests_scope_ts ON requests (scope, ts);
+    """
+    
+    def __init__(self, db_path: Optional[Union[str, Path]] = None, scope: str = "default",
+                 window_seconds: float = 60, limit: Optional[Callable[[], float]] = None):
+        self.db_path = Path(
+            db_path or os.getenv("RATE_LIMIT_STATE_FILE", "data/rate_limit.sqlite3")
+        )
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.scope = scope
+        self.window_seconds = window_seconds
+        self.limit = limit
+        
+        # Uma conexão por instância; transações controladas manualmente
+        self.lock = Lock()
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(self.SCHEMA)
+    
+    @staticmethod
+    def scope_for_token(api_token: str) -> str:
+        """Identificador estável do token para separar contadores."""
+        return hashlib.sha256(api_token.encode()).hexdigest()[:16]
+    
+    def get_current_limit(self) -> int:
+        """Retorna o limite atual baseado no horário (e em ``limit``)."""
+        return _apply_limit(get_current_limit(), self.limit)
+    
+    def _reserve(self) -> float:
+        """
+        Tenta registrar uma requisição.
+        
+        Retorna 0 se a requisição foi registrada ou o tempo em segundos até
+        a próxima vaga na janela.
+        """
+        current_limit = self.get_current_limit()
+        
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Lido só depois do lock de escrita do banco, que pode demorar:
+                # um instante anterior faria a requisição sair da janela antes da hora
+                now = time.time()
+                self.conn.execute(
+                    "DELETE FROM requests WHERE scope = ? AND ts < ?",
+                    (self.scope, now - self.window_seconds)
+                )
+                count, oldest = self.conn.execute(
+                    "SELECT COUNT(*), MIN(ts) FROM requests WHERE scope = ?", (self.scope,)
+                ).fetchone()
+                
+                if count < current_limit:
+                    self.conn.execute(
+                        "INSERT INTO requests (scope, ts) VALUES (?, ?)", (self.scope, now)
+                    )
+                    wait_time = 0.0
+                else:
+                    wait_time = max(oldest + self.window_seconds - now, 0.0) + 0.01
+                
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        
+        return wait_time
+    
+    def can_make_request(self) -> bool:
+        """Verifica se pode fazer uma requisição agora."""
+        return self.get_remaining_requests() > 0
+    
+    def wait_if_needed(self) -> float:
+        """
+        Aguarda se necessário e retorna tempo de espera em segundos.
+        """
+        waited = 0.0
+        while True:
+            wait_time = self._reserve()
+            if wait_time <= 0:
+                return waited
+            
+            logger.warning(
+                f"Rate limit compartilhado atingido ({self.get_current_limit()}/min). "
+                f"Aguardando {wait_time:.1f}s"
+            )
+            time.sleep(wait_time)
+            waited += wait_time
+    
+    def get_remaining_requests(self) -> int:
+        """Retorna número de requisições disponíveis."""
+        with self.lock:
+            count = self.conn.execute(
+                "SELECT COUNT(*) FROM requests WHERE scope = ? AND ts >= ?",
+                (self.scope, time.time() - self.window_seconds)
+            ).fetchone()[0]
+        return max(0, self.get_current_limit() - count)
+    
+    def reset(self):
+        """Reseta o rate limiter."""
+        with self.lock:
+            self.conn.execute("DELETE FROM requests WHERE scope = ?", (self.scope,))
+            logger.info("Rate limiter compartilhado resetado")
+    
+    def close(self):
+        """Fecha a conexão com o banco."""
+        with self.lock:
+            self.conn.close()
+
+
+class AsyncSharedRateLimiter:
+    """Versão assíncrona do SharedRateLimiter."""
+    
+    def __init__(self, db_path: Optional[Union[str, Path]] = None, scope: str = "default",
+                 window_seconds: float = 60, limit: Optional[Callable[[], float]] = None):
+        self.shared = SharedRateLimiter(db_path, scope=scope, window_seconds=window_seconds,
+                                        limit=limit)
+    
+    def get_current_limit(self) -> int:
+        """Retorna o limite atual baseado no horário."""
+        return self.shared.get_current_limit()
+    
+    async def wait_if_needed(self) -> float:
+        """Aguarda se necessário (versão assíncrona)."""
+        waited = 0.0
+        while True:
+            # A transação pode aguardar outro processo; não bloqueia o event loop
+            loop = asyncio.get_running_loop()
+            wait_time = await loop.run_in_executor(None, self.shared._reserve)
+            if wait_time <= 0:
+                return waited
+            
+            logger.warning(
+                f"Rate limit compartilhado atingido ({self.get_current_limit()}/min). "
+                f"Aguardando {wait_time:.1f}s"
+            )
+            await asyncio.sleep(wait_time)
+            waited += wait_time
+    
+    async def get_remaining_requests(self) -> int:
+        """Retorna número de requisições disponíveis."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.shared.get_remaining_requests)
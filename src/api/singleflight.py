@@ -0,0 +1,115 @@
+"""
+Request coalescing: concurrent identical calls share one in-flight execution.
+"""
+
+import json
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Callable, Awaitable, Hashable, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def request_key(url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+    """Build a hashable key identifying a GET request regardless of parameter order."""
+    return url, json.dumps(params or {}, sort_keys=True, default=str)
+
+
+class _Call:
+    """A call in flight and the outcome shared with its waiters."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Thread-safe single-flight group.
+
+    The first thread to call ``do`` with a key runs the function; threads
+    arriving with the same key while it runs block until it finishes and
+    receive the same result (or the same exception). Once the call returns
+    the key is released, so later calls run again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` unless an identical call is already in flight."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            logger.debug(f"Coalesced with in-flight request {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return executed/coalesced counters and calls currently in flight."""
+        with self.lock:
+            in_flight = len(self.calls)
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": in_flight}
+
+
+class AsyncSingleFlight:
+    """
+    Single-flight group for coroutines running on one event loop.
+
+    The shared call runs as a task, so a waiter being cancelled does not
+    cancel the request for the others.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await ``fn(*args, **kwargs)`` unless an identical call is already in flight."""
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.executed += 1
+        else:
+            logger.debug(f"Coalesced with in-flight request {key}")
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Future) -> None:
+        if self.calls.get(key) is task:
+            del self.calls[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return executed/coalesced counters and calls currently in flight."""
+        return {"executed": self.executed, "coalesced": self.coalesced,
+                "in_flight": len(self.calls)}
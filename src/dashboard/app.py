@@ -456,9 +456,10 @@ with st.sidebar:
     # Verificar conexão com API
     try:
         from src.api.client import TransparenciaAPIClient
-        client = TransparenciaAPIClient()
+        with TransparenciaAPIClient() as client:
+            conectada = client.test_connection()
         
-        if client.test_connection():
+        if conectada:
             st.success("✅ API Conectada")
         else:
             st.error("❌ API Desconectada")
@@ -4,6 +4,15 @@ import pandas as pd
 from datetime import datetime
 import json
 
+from src.api.cache import CacheManager
+
+
+@st.cache_resource
+def get_cache_manager() -> CacheManager:
+    """Cache de respostas da API compartilhado com o cliente e o coletor."""
+    return CacheManager()
+
+
 def render_configuracoes_page():
     # Header com card estilizado
     st.markdown("""
@@ -138,6 +147,8 @@ def render_configuracoes_page():
         # Configurações de cache
         st.markdown("### 💾 Cache e Performance")
         
+        cache = get_cache_manager()
+        
         col1, col2 = st.columns(2)
         
         with col1:
@@ -150,31 +161,56 @@ def render_configuracoes_page():
                     value="30 min"
                 )
                 
+                # Faixa ampliada para aceitar limites vindos de CACHE_MAX_SIZE_MB
+                tamanho_atual = max(int(cache.max_size_mb or 500), 1)
                 cache_size = st.number_input(
                     "Tamanho máximo do cache (MB)",
-                    min_value=100,
-                    max_value=5000,
-                    value=500,
+                    min_value=1,
+                    max_value=max(5000, tamanho_atual),
+                    value=tamanho_atual,
                     step=100
                 )
+                
+                politicas = cache.backend.eviction_policies
+                politica = st.selectbox(
+                    "Política de remoção",
+                    options=politicas,
+                    index=politicas.index(cache.eviction_policy),
+                    format_func=lambda p: {"lru": "LRU (menos usado recentemente)",
+                                           "lfu": "LFU (menos usado)"}[p]
+                )
+                
+                if cache_size != cache.max_size_mb or politica != cache.eviction_policy:
+                    removidos = cache.set_limits(max_size_mb=cache_size, eviction_policy=politica)
+                    if removidos:
+                        st.info(f"{removidos} entradas removidas para respeitar o novo limite")
         
         with col2:
             st.markdown("#### Status do Cache")
-            st.markdown("""
+            
+            cache_stats = cache.get_stats()
+            uso_mb = cache_stats["size_bytes"] / (1024 * 1024)
+            limite_mb = cache_stats["max_size_mb"] or 0
+            uso_pct = min(100, uso_mb / limite_mb * 100) if limite_mb else 0
+            
+            st.markdown(f"""
             <div style="background: #F3F4F6; padding: 15px; border-radius: 8px;">
                 <div style="margin-bottom: 10px;">
                     <span style="color: #6B7280;">Uso atual:</span>
-                    <strong style="color: #047857; float: right;">234 MB / 500 MB</strong>
+                    <strong style="color: #047857; float: right;">{uso_mb:.0f} MB / {limite_mb:.0f} MB</strong>
                 </div>
                 <div style="background: #E5E7EB; height: 8px; border-radius: 4px;">
-                    <div style="background: #10B981; height: 8px; width: 47%; border-radius: 4px;"></div>
+                    <div style="background: #10B981; height: 8px; width: {uso_pct:.0f}%; border-radius: 4px;"></div>
+                </div>
+                <div style="margin-top: 10px; color: #6B7280; font-size: 13px;">
+                    {cache_stats["entries"]} entradas · {cache_stats["evictions"]} removidas por limite
                 </div>
-                <button style="margin-top: 10px; padding: 5px 15px; background: #EF4444; 
-                              color: white; border: none; border-radius: 6px; cursor: pointer;">
-                    🗑️ Limpar Cache
-                </button>
             </div>
             """, unsafe_allow_html=True)
+            
+            if st.button("🗑️ Limpar Cache"):
+                cache.clear()
+                st.success("Cache limpo com sucesso!")
         
         # API Settings
         st.markdown("### 🔌 Configurações da API")
@@ -1,6 +1,16 @@
 """Data processing module for TransparenciaBR-Analytics."""
 
 from .collector import DataCollector
+from .dataset import PartitionedDatasetWriter, read_dataset
 from .processor import DataProcessor
+from .upsert import UpsertTable
+from .writer import StreamingParquetWriter
 
-__all__ = ["DataCollector", "DataProcessor"]
\ No newline at end of file
+__all__ = [
+    "DataCollector",
+    "DataProcessor",
+    "PartitionedDatasetWriter",
+    "StreamingParquetWriter",
+    "UpsertTable",
+    "read_dataset"
+]
\ No newline at end of file
@@ -3,17 +3,70 @@ Data collection module for automated and incremental data fetching.
 """
 
 import os
+import gzip
 import json
+import queue
 import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Callable, Union
-import pandas as pd
+from typing import Dict, List, Any, Optional, Callable, Union, Iterable, Iterator
 import pyarrow as pa
-import pyarrow.parquet as pq
 from tqdm import tqdm
 
+from config.constants import (
+    DATE_FORMAT_BR, DEFAULT_END_DATE, DEFAULT_START_DATE, MAX_PARALLEL_REQUESTS
+)
 from src.api.client import TransparenciaAPIClient
+from src.data.dataset import (
+    PARTITION_DATE_FIELDS, PartitionedDatasetWriter, compact_dataset, dataset_files
+)
+
+
+# Pages spooled between durable checkpoints (each one rewrites the state file)
+CHECKPOINT_PAGES = max(1, int(os.getenv("COLLECTOR_CHECKPOINT_PAGES", "10")))
+
+
+class CollectionProgress:
+    """
+    Single progress bar shared by endpoints collected in parallel.
+    
+    The bar counts records across every endpoint; its postfix shows the
+    per-endpoint totals, with a check mark once an endpoint is finished.
+    """
+    
+    def __init__(self, endpoints: List[str]):
+        self.lock = threading.Lock()
+        self.counts = {name: 0 for name in endpoints}
+        self.finished = {}
+        self.bar = tqdm(desc=f"Collecting {len(endpoints)} endpoints", unit=" records")
+    
+    def _postfix(self) -> str:
+        parts = []
+        for name, count in self.counts.items():
+            mark = {"completed": " ✓", "failed": " ✗"}.get(self.finished.get(name), "")
+            parts.append(f"{name}={count}{mark}")
+        return ", ".join(parts)
+    
+    def update(self, endpoint_name: str, records: int) -> None:
+        """Record a page of ``records`` for ``endpoint_name``."""
+        with self.lock:
+            self.counts[endpoint_name] = self.counts.get(endpoint_name, 0) + records
+            self.bar.update(records)
+            self.bar.set_postfix_str(self._postfix())
+    
+    def finish(self, endpoint_name: str, status: str) -> None:
+        """Mark ``endpoint_name`` as done with ``status``."""
+        with self.lock:
+            self.finished[endpoint_name] = status
+            self.bar.set_postfix_str(self._postfix())
+    
+    def close(self) -> None:
+        """Close the progress bar."""
+        self.bar.close()
 
 
 class DataCollector:
@@ -22,6 +75,7 @@ class DataCollector:
     
     Features:
     - Incremental data collection
+    - Concurrent, prioritized collection of independent endpoints
     - Progress tracking and resumption
     - Efficient storage in Parquet format
     - Comprehensive logging
@@ -42,8 +96,9 @@ class DataCollector:
         # Setup logging
         self.logger = logging.getLogger(__name__)
         
-        # Collection state management
+        # Collection state management (shared by parallel collections)
         self.state_file = self.output_dir / ".collection_state.json"
+        self.state_lock = threading.RLock()
         self.state = self._load_state()
     
     def _load_state(self) -> Dict[str, Any]:
@@ -63,11 +118,58 @@ class DataCollector:
     def _save_state(self) -> None:
         """Save collection state to file."""
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(self.state, f, indent=2, default=str)
+            with self.state_lock:
+                tmp_file = self.state_file.with_suffix(".tmp")
+                with open(tmp_file, 'w') as f:
+                    json.dump(self.state, f, indent=2, default=str)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.state_file)
         except Exception as e:
             self.logger.error(f"Error saving state: {e}")
     
+    def _get_checkpoint(self, slot: str) -> Optional[Dict[str, Any]]:
+        """Return the page checkpoint recorded for ``slot``, if any."""
+        with self.state_lock:
+            checkpoint = self.state.get("checkpoints", {}).get(slot)
+            return dict(checkpoint) if checkpoint else None
+    
+    def _set_checkpoint(self, slot: str, checkpoint: Optional[Dict[str, Any]]) -> None:
+        """Durably record (or clear, when ``checkpoint`` is None) the checkpoint for ``slot``."""
+        with self.state_lock:
+            checkpoints = self.state.setdefault("checkpoints", {})
+            if checkpoint is None:
+                if checkpoints.pop(slot, None) is None:
+                    return
+            else:
+                checkpoints[slot] = checkpoint
+            self._save_state()
+    
+    def _checkpoint_spool(self, slot: str, spool, stats: Dict[str, Any], page: int,
+                          fingerprint: str, complete: bool = False) -> Dict[str, Any]:
+        """Sync ``spool`` to disk, then durably record that it holds pages up to ``page``."""
+        spool.flush()
+        os.fsync(spool.fileno())
+        checkpoint = {
+            "page": page,
+            "records_collected": stats["records_collected"],
+            "pages_collected": stats["pages_collected"],
+            "spool_bytes": spool.tell(),
+            "params": fingerprint,
+            "updated_at": datetime.now().isoformat()
+        }
+        if complete:
+            checkpoint["complete"] = True
+        self._set_checkpoint(slot, checkpoint)
+        return checkpoint
+    
+    @staticmethod
+    def _params_fingerprint(params: Dict[str, Any], page_size: int) -> str:
+        """Identify a pagination sequence; a checkpoint only resumes the same sequence."""
+        query = {k: v for k, v in params.items() if k not in ("pagina", "quantidade")}
+        query["quantidade"] = page_size
+        return json.dumps(query, sort_keys=True, default=str)
+    
     def collect_endpoint(
         self,
         endpoint_name: str,
@@ -76,11 +178,20 @@ class DataCollector:
         max_pages: Optional[int] = None,
         page_size: int = 500,
         incremental: bool = True,
-        date_field: Optional[str] = None
+        date_field: Optional[str] = None,
+        progress: Optional[CollectionProgress] = None,
+        resume: bool = True,
+        replace: Optional[bool] = None
     ) -> Dict[str, Any]:
         """
         Collect data from a specific endpoint.
         
+        Every page is flushed to an on-disk spool and checkpointed in the
+        collection state as it arrives. If the run crashes or gives up after
+        too many errors, the spool and checkpoint are kept and the next run
+        with the same parameters continues from the page after the last one
+        completed.
+        
         Args:
             endpoint_name: Name of the endpoint for tracking
             fetch_method: API client method to fetch data
@@ -89,6 +200,12 @@ class DataCollector:
             page_size: Number of records per page
             incremental: Whether to perform incremental collection
             date_field: Field to use for incremental updates
+            progress: Shared progress display (a dedicated bar is shown if omitted)
+            resume: Continue from a previous run's checkpoint (False starts over)
+            replace: Replace the dataset partitions this run touches instead of
+                adding files to them (default: only for complete crawls without
+                an incremental date filter; pass False when ``params`` narrow
+                the query)
             
         Returns:
             Collection statistics
@@ -105,23 +222,172 @@ class DataCollector:
             "status": "in_progress"
         }
         
-        # Prepare parameters
-        params = params or {}
+        # Prepare parameters (copied: pagination mutates them)
+        params = dict(params or {})
         
         # Check for incremental collection
-        if incremental and endpoint_name in self.state.get("collections", {}):
-            last_collection = self.state["collections"][endpoint_name]
+        with self.state_lock:
+            last_collection = self.state.get("collections", {}).get(endpoint_name)
+        if incremental and last_collection is not None:
             if date_field and "last_date" in last_collection:
                 # Add date filter for incremental collection
                 params[f"{date_field}Inicial"] = last_collection["last_date"]
                 self.logger.info(f"Incremental collection from {last_collection['last_date']}")
         
-        # Collect data with pagination
-        all_records = []
-        page = 1
+        # A complete, unfiltered crawl supersedes the partitions it touches;
+        # anything narrower is added next to the existing files
+        if replace is None:
+            replace = max_pages is None and not (date_field and f"{date_field}Inicial" in params)
+        
+        # Collect data with pagination. Pages are spooled to disk as they
+        # arrive so memory stays proportional to a single page.
+        spool_path = self._get_spool_path(endpoint_name)
+        spool_path.parent.mkdir(parents=True, exist_ok=True)
         
         try:
-            with tqdm(desc=f"Collecting {endpoint_name}") as pbar:
+            with tqdm(desc=f"Collecting {endpoint_name}", disable=progress is not None) as pbar:
+                schema, last_date, page = self._crawl_pages(
+                    endpoint_name, fetch_method, params, spool_path, stats,
+                    max_pages=max_pages, page_size=page_size, date_field=date_field,
+                    progress=progress, pbar=pbar, checkpoint_slot=endpoint_name, resume=resume
+                )
+            
+            # Save collected data; a failed crawl keeps its checkpoint for the next run
+            if stats["status"] == "failed":
+                self.logger.warning(
+                    f"Collection of {endpoint_name} stopped after page {page}; "
+                    f"rerun to resume from the checkpoint"
+                )
+            elif stats["records_collected"] > 0:
+                output_files = self._save_data(
+                    endpoint_name, self._read_spool(spool_path), schema=schema,
+                    date_field=date_field, replace=replace
+                )
+                stats["output_files"] = [str(f) for f in output_files]
+                stats["status"] = "completed"
+                
+                # Update state
+                with self.state_lock:
+                    # Keep per-window records written by collect_windowed
+                    collection = self.state["collections"].setdefault(endpoint_name, {})
+                    collection.update({
+                        "last_collection": datetime.now().isoformat(),
+                        "records_collected": stats["records_collected"],
+                        "last_page": page
+                    })
+                    
+                    # Track last date if available
+                    if last_date is not None:
+                        collection["last_date"] = str(last_date)
+                    
+                    self.state["last_update"] = datetime.now().isoformat()
+                    self.state.get("checkpoints", {}).pop(endpoint_name, None)
+                    self._save_state()
+                spool_path.unlink(missing_ok=True)
+            else:
+                self._set_checkpoint(endpoint_name, None)
+                spool_path.unlink(missing_ok=True)
+                
+        except Exception as e:
+            # Spool and checkpoint are left in place for resumption
+            self.logger.error(f"Fatal error during collection: {e}")
+            stats["status"] = "failed"
+            stats["error_message"] = str(e)
+        
+        # Calculate duration
+        stats["end_time"] = datetime.now()
+        stats["duration"] = (stats["end_time"] - stats["start_time"]).total_seconds()
+        
+        self.logger.info(
+            f"Collection completed: {stats['records_collected']} records "
+            f"in {stats['duration']:.2f} seconds"
+        )
+        
+        return stats
+    
+    def _crawl_pages(
+        self,
+        endpoint_name: str,
+        fetch_method: Callable,
+        params: Dict[str, Any],
+        spool_path: Path,
+        stats: Dict[str, Any],
+        max_pages: Optional[int] = None,
+        page_size: int = 500,
+        date_field: Optional[str] = None,
+        progress: Optional[CollectionProgress] = None,
+        pbar: Optional[tqdm] = None,
+        checkpoint_slot: Optional[str] = None,
+        resume: bool = True
+    ) -> tuple:
+        """
+        Walk one pagination sequence, spooling each page to ``spool_path``.
+        
+        A failed page is retried rather than skipped, so a crawl never ends
+        with gaps; after more than 5 errors it stops at the failing page and
+        ``stats["status"]`` is set to "failed" (callers must not save it).
+        Record, page and error counts are accumulated in ``stats``.
+        
+        Each page is appended to the spool as its own gzip member. With
+        ``checkpoint_slot``, every CHECKPOINT_PAGES pages (and when the crawl
+        ends, fails or is interrupted) the spool is synced to disk and the last
+        page and spool size are recorded in the state, so a later call with
+        ``resume`` truncates anything written after that and continues from
+        the next page. Only pages that were fetched successfully are ever
+        checkpointed.
+        
+        Returns:
+            Tuple of (merged schema, largest ``date_field`` value, last page fetched)
+        """
+        schema = None
+        last_date = None
+        page = 1
+        fingerprint = self._params_fingerprint(params, page_size)
+        
+        checkpoint = self._get_checkpoint(checkpoint_slot) if checkpoint_slot else None
+        if checkpoint is not None and not (
+            resume
+            and checkpoint.get("params") == fingerprint
+            and spool_path.exists()
+            and spool_path.stat().st_size >= checkpoint["spool_bytes"]
+        ):
+            self.logger.info(f"Discarding checkpoint for {checkpoint_slot}")
+            checkpoint = None
+        
+        if checkpoint is not None:
+            # Drop whatever was written after the last checkpointed page
+            with open(spool_path, 'r+b') as f:
+                f.truncate(checkpoint["spool_bytes"])
+            for records in self._read_spool(spool_path):
+                schema = self._merge_schema(schema, records)
+                if date_field:
+                    last_date = self._max_date(last_date, records, date_field)
+            
+            page = checkpoint["page"] + 1
+            stats["records_collected"] += checkpoint["records_collected"]
+            stats["pages_collected"] += checkpoint["pages_collected"]
+            stats["resumed_from_page"] = page
+            if progress is not None:
+                progress.update(endpoint_name, checkpoint["records_collected"])
+            if pbar is not None:
+                pbar.update(checkpoint["records_collected"])
+            
+            if checkpoint.get("complete"):
+                self.logger.info(f"Resuming {checkpoint_slot}: all pages already spooled")
+                return schema, last_date, checkpoint["page"]
+            self.logger.info(
+                f"Resuming {checkpoint_slot} at page {page} "
+                f"({checkpoint['records_collected']} records already spooled)"
+            )
+        else:
+            spool_path.unlink(missing_ok=True)
+        
+        # Pages are synced and checkpointed every CHECKPOINT_PAGES pages (and
+        # whenever the crawl stops) rather than one state write per page
+        spooled_page = checkpoint["page"] if checkpoint is not None else 0
+        unsynced_pages = 0
+        with open(spool_path, 'ab') as spool:
+            try:
                 while True:
                     try:
                         # Set pagination parameters
@@ -136,20 +402,36 @@ class DataCollector:
                             self.logger.info(f"No more records at page {page}")
                             break
                         
-                        all_records.extend(records)
+                        line = json.dumps(records, ensure_ascii=False, default=str) + "\n"
+                        spool.write(gzip.compress(line.encode('utf-8')))
+                        schema = self._merge_schema(schema, records)
+                        if date_field:
+                            last_date = self._max_date(last_date, records, date_field)
+                        
                         stats["records_collected"] += len(records)
                         stats["pages_collected"] += 1
                         
+                        spooled_page = page
+                        unsynced_pages += 1
+                        if checkpoint_slot and unsynced_pages >= CHECKPOINT_PAGES:
+                            self._checkpoint_spool(checkpoint_slot, spool, stats, spooled_page,
+                                                   fingerprint)
+                            unsynced_pages = 0
+                        
                         # Update progress
-                        pbar.update(len(records))
-                        pbar.set_postfix({
-                            "page": page,
-                            "total": stats["records_collected"]
-                        })
+                        if progress is not None:
+                            progress.update(endpoint_name, len(records))
+                        if pbar is not None:
+                            pbar.update(len(records))
+                            pbar.set_postfix({
+                                "page": page,
+                                "total": stats["records_collected"]
+                            })
                         
                         # Check if we've reached max pages
                         if max_pages and page >= max_pages:
                             self.logger.info(f"Reached maximum pages ({max_pages})")
+                            page += 1
                             break
                         
                         page += 1
@@ -158,146 +440,468 @@ class DataCollector:
                         self.logger.error(f"Error on page {page}: {e}")
                         stats["errors"] += 1
                         
-                        # Skip to next page on error
+                        # Retry the same page; skipping it would leave a gap in the data
                         if stats["errors"] > 5:
-                            self.logger.error("Too many errors, stopping collection")
+                            self.logger.error(
+                                f"Too many errors, stopping collection at page {page}"
+                            )
                             stats["status"] = "failed"
                             break
-                        
-                        page += 1
             
-            # Save collected data
-            if all_records:
-                output_file = self._save_data(endpoint_name, all_records)
-                stats["output_file"] = str(output_file)
-                stats["status"] = "completed"
+            except BaseException:
+                # Interrupted: keep the pages spooled so far for the next run
+                if checkpoint_slot and unsynced_pages:
+                    self._checkpoint_spool(checkpoint_slot, spool, stats, spooled_page,
+                                           fingerprint)
+                raise
+            
+            # Pagination finished: a crash while saving resumes without refetching.
+            # A failed crawl records the pages it got and is resumed, never saved.
+            complete = stats["status"] != "failed"
+            if checkpoint_slot and spooled_page and (complete or unsynced_pages):
+                self._checkpoint_spool(checkpoint_slot, spool, stats, spooled_page,
+                                       fingerprint, complete=complete)
+        
+        return schema, last_date, page - 1
+    
+    def _get_spool_path(self, endpoint_name: str, suffix: str = "") -> Path:
+        """Return the temporary file where pages are spooled during collection."""
+        name = f"{endpoint_name}.{suffix}" if suffix else endpoint_name
+        return self.output_dir / endpoint_name / f".{name}.spool.jsonl.gz"
+    
+    def _read_spool(self, spool_path: Path) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the pages stored in a spool file, one page at a time."""
+        with gzip.open(spool_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+    
+    @staticmethod
+    def _merge_schema(schema: Optional[pa.Schema], records: List[Dict[str, Any]]) -> pa.Schema:
+        """Unify the schema seen so far with the schema of a new page."""
+        page_schema = pa.Table.from_pylist(records).schema
+        if schema is None:
+            return page_schema
+        return pa.unify_schemas([schema, page_schema], promote_options="permissive")
+    
+    @staticmethod
+    def _max_date(current: Any, records: List[Dict[str, Any]], date_field: str) -> Any:
+        """Return the largest value of ``date_field`` seen so far."""
+        values = [r[date_field] for r in records if r.get(date_field) is not None]
+        if current is not None:
+            values.append(current)
+        return max(values) if values else None
+    
+    def _save_data(
+        self,
+        endpoint_name: str,
+        pages: Iterable[List[Dict[str, Any]]],
+        schema: Optional[pa.Schema] = None,
+        filename: Optional[str] = None,
+        date_field: Optional[str] = None,
+        replace: bool = False
+    ) -> List[Path]:
+        """
+        Save collected data to the endpoint's Parquet dataset, one page at a time.
+        
+        Records are partitioned by year/month of ``date_field`` and by órgão
+        (see src.data.dataset); endpoints without a date field are written
+        unpartitioned.
+        
+        Args:
+            endpoint_name: Name of the endpoint
+            pages: Iterable of pages (lists of records) to save
+            schema: Schema covering every page (inferred from the first pages and
+                widened as new columns appear if omitted)
+            filename: File name written in each partition (timestamped by default)
+            date_field: Field partitioned by year/month
+            replace: Replace the touched partitions instead of adding to them
+            
+        Returns:
+            Paths to the saved files
+        """
+        collected_at = datetime.now()
+        
+        # Generate filename with timestamp
+        if filename is None:
+            timestamp = collected_at.strftime("%Y%m%d_%H%M%S")
+            filename = f"{endpoint_name}_{timestamp}.parquet"
+        dataset_dir = self.output_dir / endpoint_name
+        
+        # Create directory if needed
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+        
+        sample = []
+        total_records = 0
+        
+        # Pages stream into row groups of temporary files renamed on success
+        constants = {
+            "_collected_at": pa.scalar(collected_at, type=pa.timestamp('us')),
+            "_endpoint": pa.scalar(endpoint_name, type=pa.string())
+        }
+        with PartitionedDatasetWriter(dataset_dir, filename, date_field=date_field,
+                                      schema=schema, replace=replace,
+                                      constants=constants) as writer:
+            for records in pages:
+                if not records:
+                    continue
                 
-                # Update state
-                self.state["collections"][endpoint_name] = {
-                    "last_collection": datetime.now().isoformat(),
+                writer.write(records)
+                
+                if len(sample) < 5:
+                    sample.extend(records[:5 - len(sample)])
+                total_records += len(records)
+        
+        self.logger.info(
+            f"Saved {total_records} records to {len(writer.written)} files in {dataset_dir}"
+        )
+        
+        # Also save a sample as JSON for easy inspection (hidden, so dataset
+        # readers only see Parquet files)
+        sample_path = dataset_dir / f".{Path(filename).stem}.sample.json"
+        with open(sample_path, 'w', encoding='utf-8') as f:
+            json.dump(sample, f, ensure_ascii=False, indent=2, default=str)
+        
+        return writer.written
+    
+    @staticmethod
+    def _date_windows(start_date: datetime, end_date: datetime,
+                      window: str = "month") -> List[tuple]:
+        """
+        Split ``start_date``..``end_date`` (inclusive) into consecutive windows.
+        
+        Month windows follow calendar months; week windows span 7 days from
+        ``start_date``. The first and last windows are clipped to the range.
+        """
+        if window not in ("month", "week"):
+            raise ValueError(f"Unknown window: {window}")
+        
+        start = datetime(start_date.year, start_date.month, start_date.day)
+        end = datetime(end_date.year, end_date.month, end_date.day)
+        windows = []
+        
+        while start <= end:
+            if window == "month":
+                if start.month == 12:
+                    next_start = datetime(start.year + 1, 1, 1)
+                else:
+                    next_start = datetime(start.year, start.month + 1, 1)
+            else:
+                next_start = start + timedelta(days=7)
+            
+            windows.append((start, min(next_start - timedelta(days=1), end)))
+            start = next_start
+        
+        return windows
+    
+    @staticmethod
+    def _window_key(window: tuple) -> str:
+        """State key identifying a date window."""
+        return f"{window[0]:%Y-%m-%d}_{window[1]:%Y-%m-%d}"
+    
+    @staticmethod
+    def _window_done(record: Optional[Dict[str, Any]]) -> bool:
+        """Whether a window's state record is complete and its output still on disk."""
+        if not record or record.get("status") != "completed":
+            return False
+        return all(Path(f).exists() for f in record.get("output_files", []))
+    
+    @staticmethod
+    def _owned_partitions(window: tuple) -> Callable[[tuple], bool]:
+        """
+        Partitions a window replaces: those of its month if it covers the whole
+        calendar month. Partial windows and rows without a date share
+        partitions with other windows, so they only add files.
+        """
+        full_month = window[0].day == 1 and (window[1] + timedelta(days=1)).day == 1
+        return lambda key: full_month and key[:2] == (window[0].year, window[0].month)
+    
+    def _collect_window(
+        self,
+        endpoint_name: str,
+        fetch_method: Callable,
+        window: tuple,
+        date_field: str,
+        params: Dict[str, Any],
+        max_pages: Optional[int],
+        page_size: int,
+        progress: Optional[CollectionProgress],
+        resume: bool = True
+    ) -> Dict[str, Any]:
+        """Crawl one date window into its own Parquet file and record it in the state."""
+        key = self._window_key(window)
+        slot = f"{endpoint_name}/{key}"
+        window_params = dict(params)
+        window_params[f"{date_field}Inicial"] = window[0].strftime(DATE_FORMAT_BR)
+        window_params[f"{date_field}Final"] = window[1].strftime(DATE_FORMAT_BR)
+        
+        stats = {"records_collected": 0, "pages_collected": 0, "errors": 0,
+                 "status": "in_progress"}
+        spool_path = self._get_spool_path(endpoint_name, suffix=key)
+        spool_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            schema, _, last_page = self._crawl_pages(
+                endpoint_name, fetch_method, window_params, spool_path, stats,
+                max_pages=max_pages, page_size=page_size, progress=progress,
+                checkpoint_slot=slot, resume=resume
+            )
+            
+            # A window that hit the error limit is left (with its checkpoint) for the next run
+            if stats["status"] == "failed":
+                return stats
+            
+            output_files = []
+            if stats["records_collected"] > 0:
+                output_files = self._save_data(
+                    endpoint_name, self._read_spool(spool_path), schema=schema,
+                    filename=f"{endpoint_name}_window_{key}.parquet",
+                    date_field=date_field, replace=self._owned_partitions(window)
+                )
+            stats["status"] = "completed"
+            stats["output_files"] = [str(f) for f in output_files]
+            
+            with self.state_lock:
+                collection = self.state["collections"].setdefault(endpoint_name, {})
+                collection.setdefault("windows", {})[key] = {
+                    "status": "completed",
+                    "completed_at": datetime.now().isoformat(),
                     "records_collected": stats["records_collected"],
-                    "last_page": page - 1
+                    "last_page": last_page,
+                    "output_files": stats["output_files"]
                 }
-                
-                # Track last date if available
-                if date_field and all_records:
-                    df = pd.DataFrame(all_records)
-                    if date_field in df.columns:
-                        last_date = df[date_field].max()
-                        self.state["collections"][endpoint_name]["last_date"] = str(last_date)
-                
                 self.state["last_update"] = datetime.now().isoformat()
+                self.state.get("checkpoints", {}).pop(slot, None)
                 self._save_state()
-                
+            spool_path.unlink(missing_ok=True)
         except Exception as e:
-            self.logger.error(f"Fatal error during collection: {e}")
+            self.logger.error(f"Error collecting {endpoint_name} window {key}: {e}")
             stats["status"] = "failed"
             stats["error_message"] = str(e)
         
-        # Calculate duration
-        stats["end_time"] = datetime.now()
-        stats["duration"] = (stats["end_time"] - stats["start_time"]).total_seconds()
-        
-        self.logger.info(
-            f"Collection completed: {stats['records_collected']} records "
-            f"in {stats['duration']:.2f} seconds"
-        )
-        
         return stats
     
-    def _save_data(self, endpoint_name: str, records: List[Dict[str, Any]]) -> Path:
+    def collect_windowed(
+        self,
+        endpoint_name: str,
+        fetch_method: Callable,
+        date_field: str,
+        start_date: datetime = DEFAULT_START_DATE,
+        end_date: datetime = DEFAULT_END_DATE,
+        window: str = "month",
+        params: Optional[Dict[str, Any]] = None,
+        max_pages: Optional[int] = None,
+        page_size: int = 500,
+        max_workers: Optional[int] = None,
+        progress: Optional[CollectionProgress] = None,
+        resume: bool = True
+    ) -> Dict[str, Any]:
         """
-        Save collected data to Parquet format.
+        Collect an endpoint by date windows crawled in parallel.
+        
+        The range is split into month or week windows filtered through
+        ``{date_field}Inicial``/``{date_field}Final`` (dd/mm/yyyy). Each window
+        is an independent pagination sequence written to its own file in each
+        partition it touches (a full month window replaces its partitions),
+        and its completion is recorded in the collection state, so a rerun
+        only crawls the windows that are missing or failed. Unfinished
+        windows resume from their page checkpoint (see collect_endpoint).
         
         Args:
-            endpoint_name: Name of the endpoint
-            records: List of records to save
+            endpoint_name: Name of the endpoint for tracking
+            fetch_method: API client method to fetch data
+            date_field: Date field used to filter windows
+            start_date: First day of the range
+            end_date: Last day of the range
+            window: "month" or "week"
+            params: Additional parameters for the API call
+            max_pages: Maximum number of pages per window
+            page_size: Number of records per page
+            max_workers: Windows crawled at once (defaults to
+                COLLECTOR_MAX_WORKERS or MAX_PARALLEL_REQUESTS)
+            progress: Shared progress display (a dedicated bar is shown if omitted)
+            resume: Continue unfinished windows from their checkpoints
             
         Returns:
-            Path to saved file
+            Collection statistics
         """
-        # Convert to DataFrame
-        df = pd.DataFrame(records)
+        stats, pending = self._start_windowed(endpoint_name, start_date, end_date, window)
         
-        # Add metadata columns
-        df['_collected_at'] = datetime.now()
-        df['_endpoint'] = endpoint_name
+        max_workers = max_workers or int(
+            os.getenv("COLLECTOR_MAX_WORKERS", str(MAX_PARALLEL_REQUESTS))
+        )
+        own_progress = progress is None
+        if own_progress:
+            progress = CollectionProgress([endpoint_name])
         
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{endpoint_name}_{timestamp}.parquet"
-        output_path = self.output_dir / endpoint_name / filename
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers,
+                                    thread_name_prefix=f"{endpoint_name}-window") as executor:
+                futures = [
+                    executor.submit(self._collect_window, endpoint_name, fetch_method, w,
+                                    date_field, params or {}, max_pages, page_size, progress,
+                                    resume)
+                    for w in pending
+                ]
+                for future in as_completed(futures):
+                    self._add_window_stats(stats, future.result())
+        finally:
+            if own_progress:
+                progress.close()
         
-        # Create directory if needed
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Save to Parquet with compression
-        df.to_parquet(
-            output_path,
-            engine='pyarrow',
-            compression='snappy',
-            index=False
+        return self._finish_windowed(endpoint_name, stats)
+    
+    def _start_windowed(self, endpoint_name: str, start_date: datetime, end_date: datetime,
+                        window: str) -> tuple:
+        """
+        Plan a windowed collection.
+        
+        Returns:
+            Tuple of (initial statistics, windows still to crawl)
+        """
+        windows = self._date_windows(start_date, end_date, window)
+        with self.state_lock:
+            done = dict(self.state["collections"].get(endpoint_name, {}).get("windows", {}))
+        pending = [w for w in windows if not self._window_done(done.get(self._window_key(w)))]
+        
+        self.logger.info(
+            f"Collecting {endpoint_name} in {len(windows)} {window} windows "
+            f"({len(windows) - len(pending)} already complete)"
         )
         
-        self.logger.info(f"Saved {len(records)} records to {output_path}")
+        stats = {
+            "endpoint": endpoint_name,
+            "start_time": datetime.now(),
+            "records_collected": 0,
+            "pages_collected": 0,
+            "errors": 0,
+            "windows_total": len(windows),
+            "windows_skipped": len(windows) - len(pending),
+            "windows_completed": 0,
+            "windows_failed": 0,
+            "output_files": [],
+            "status": "in_progress"
+        }
+        return stats, pending
+    
+    @staticmethod
+    def _add_window_stats(stats: Dict[str, Any], window_stats: Dict[str, Any]) -> None:
+        """Accumulate one window's result into the windowed collection's statistics."""
+        stats["records_collected"] += window_stats.get("records_collected", 0)
+        stats["pages_collected"] += window_stats.get("pages_collected", 0)
+        stats["errors"] += window_stats.get("errors", 0)
+        if window_stats["status"] == "completed":
+            stats["windows_completed"] += 1
+            stats["output_files"].extend(window_stats["output_files"])
+        else:
+            stats["windows_failed"] += 1
+    
+    def _finish_windowed(self, endpoint_name: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Settle a windowed collection once all of its windows have run."""
+        stats["output_files"].sort()
+        stats["status"] = "failed" if stats["windows_failed"] else "completed"
+        if stats["status"] == "completed":
+            with self.state_lock:
+                collection = self.state["collections"].setdefault(endpoint_name, {})
+                collection["last_collection"] = datetime.now().isoformat()
+                collection["records_collected"] = sum(
+                    w.get("records_collected", 0) for w in collection.get("windows", {}).values()
+                )
+                self._save_state()
         
-        # Also save a sample as JSON for easy inspection
-        sample_path = output_path.with_suffix('.sample.json')
-        with open(sample_path, 'w', encoding='utf-8') as f:
-            json.dump(records[:5], f, ensure_ascii=False, indent=2, default=str)
+        stats["end_time"] = datetime.now()
+        stats["duration"] = (stats["end_time"] - stats["start_time"]).total_seconds()
+        
+        self.logger.info(
+            f"Windowed collection of {endpoint_name}: {stats['windows_completed']} windows, "
+            f"{stats['records_collected']} records in {stats['duration']:.2f} seconds"
+        )
         
-        return output_path
+        return stats
     
-    def collect_all(
-        self,
-        endpoints: Optional[List[str]] = None,
-        incremental: bool = True,
-        max_pages_per_endpoint: Optional[int] = None
-    ) -> Dict[str, Any]:
+    def _get_collections(self) -> Dict[str, Dict[str, Any]]:
         """
-        Collect data from multiple endpoints.
+        Endpoints known to ``collect_all``.
         
-        Args:
-            endpoints: List of endpoint names to collect (None for all)
-            incremental: Whether to perform incremental collection
-            max_pages_per_endpoint: Maximum pages per endpoint
-            
-        Returns:
-            Collection statistics for all endpoints
+        ``priority`` orders the work queue (lower first), so small reference
+        tables are scheduled before the large transactional endpoints.
         """
-        # Define available collections
-        available_collections = {
+        return {
             "orgaos": {
                 "method": self.client.get_orgaos,
                 "params": {"sistema": "siafi"},
-                "date_field": None
+                "date_field": None,
+                "priority": 0
             },
-            "contratos": {
-                "method": self.client.get_contratos,
+            "fornecedores": {
+                "method": self.client.get_fornecedores,
                 "params": {},
-                "date_field": "dataAssinatura"
+                "date_field": None,
+                "priority": 1
             },
-            "convenios": {
-                "method": self.client.get_convenios,
+            "licitacoes": {
+                "method": self.client.get_licitacoes,
                 "params": {},
-                "date_field": "dataAssinatura"
+                "date_field": "dataAbertura",
+                "priority": 2
             },
-            "pagamentos": {
-                "method": self.client.get_pagamentos,
+            "convenios": {
+                "method": self.client.get_convenios,
                 "params": {},
-                "date_field": "data"
+                "date_field": "dataAssinatura",
+                "priority": 2
             },
-            "licitacoes": {
-                "method": self.client.get_licitacoes,
+            "contratos": {
+                "method": self.client.get_contratos,
                 "params": {},
-                "date_field": "dataAbertura"
+                "date_field": "dataAssinatura",
+                "priority": 3
             },
-            "fornecedores": {
-                "method": self.client.get_fornecedores,
+            "pagamentos": {
+                "method": self.client.get_pagamentos,
                 "params": {},
-                "date_field": None
+                "date_field": "data",
+                "priority": 4
             }
         }
+    
+    def collect_all(
+        self,
+        endpoints: Optional[List[str]] = None,
+        incremental: bool = True,
+        max_pages_per_endpoint: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        window: Optional[str] = None,
+        start_date: datetime = DEFAULT_START_DATE,
+        end_date: datetime = DEFAULT_END_DATE,
+        resume: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Collect data from multiple endpoints concurrently.
+        
+        Work is split into units (an endpoint, or one date window of an
+        endpoint collected by ``window``) and put on a single priority queue
+        drained by ``max_workers`` threads, so higher-priority units always
+        start first and at most ``max_workers`` units run at once across all
+        endpoints. All workers share this collector's API client, so they
+        draw from one rate budget, and report to a single progress bar.
+        
+        Args:
+            endpoints: List of endpoint names to collect (None for all)
+            incremental: Whether to perform incremental collection
+            max_pages_per_endpoint: Maximum pages per endpoint
+            max_workers: Endpoints or windows collected at once (defaults to
+                COLLECTOR_MAX_WORKERS or MAX_PARALLEL_REQUESTS)
+            window: Shard endpoints that have a date field into "month" or
+                "week" windows over ``start_date``..``end_date`` (see
+                collect_windowed); None walks each endpoint in one sequence
+            start_date: First day of the windowed range
+            end_date: Last day of the windowed range
+            resume: Continue interrupted collections from their page checkpoints
+            
+        Returns:
+            Collection statistics for all endpoints
+        """
+        available_collections = self._get_collections()
         
         # Select endpoints to collect
         if endpoints:
@@ -308,29 +912,95 @@ class DataCollector:
         else:
             collections_to_run = available_collections
         
+        # Smallest priority first; ties keep their declaration order
+        ordered = sorted(collections_to_run.items(), key=lambda item: item[1]["priority"])
+        max_workers = max_workers or int(
+            os.getenv("COLLECTOR_MAX_WORKERS", str(MAX_PARALLEL_REQUESTS))
+        )
+        
         # Run collections
         results = {}
+        windowed = set()
+        remaining = {}
+        work = queue.PriorityQueue()
+        order = itertools.count()
+        results_lock = threading.Lock()
+        progress = CollectionProgress([name for name, _ in ordered])
         
-        for endpoint_name, config in collections_to_run.items():
-            self.logger.info(f"\nCollecting {endpoint_name}...")
-            
-            try:
-                stats = self.collect_endpoint(
+        for endpoint_name, config in ordered:
+            self.logger.info(f"Queueing {endpoint_name} (priority {config['priority']})")
+            if window and config["date_field"]:
+                # Each window is its own unit, scheduled at the endpoint's priority
+                windowed.add(endpoint_name)
+                results[endpoint_name], pending = self._start_windowed(
+                    endpoint_name, start_date, end_date, window
+                )
+                units = [
+                    partial(self._collect_window, endpoint_name, config["method"], w,
+                            config["date_field"], config["params"], max_pages_per_endpoint,
+                            500, progress, resume)
+                    for w in pending
+                ]
+            else:
+                units = [partial(
+                    self.collect_endpoint,
                     endpoint_name=endpoint_name,
                     fetch_method=config["method"],
                     params=config["params"],
                     max_pages=max_pages_per_endpoint,
                     incremental=incremental,
-                    date_field=config["date_field"]
-                )
-                results[endpoint_name] = stats
+                    date_field=config["date_field"],
+                    progress=progress,
+                    resume=resume
+                )]
+            
+            remaining[endpoint_name] = len(units)
+            for unit in units:
+                work.put((config["priority"], next(order), endpoint_name, unit))
+            if not units:
+                results[endpoint_name] = self._finish_windowed(endpoint_name,
+                                                               results[endpoint_name])
+                progress.finish(endpoint_name, results[endpoint_name]["status"])
+        
+        def drain() -> None:
+            """Run queued units, highest priority first, until the queue is empty."""
+            while True:
+                try:
+                    _, _, endpoint_name, unit = work.get_nowait()
+                except queue.Empty:
+                    return
                 
-            except Exception as e:
-                self.logger.error(f"Failed to collect {endpoint_name}: {e}")
-                results[endpoint_name] = {
-                    "status": "failed",
-                    "error": str(e)
-                }
+                try:
+                    unit_stats = unit()
+                except Exception as e:
+                    self.logger.error(f"Failed to collect {endpoint_name}: {e}")
+                    unit_stats = {"status": "failed", "error": str(e)}
+                
+                with results_lock:
+                    if endpoint_name in windowed:
+                        self._add_window_stats(results[endpoint_name], unit_stats)
+                    else:
+                        results[endpoint_name] = unit_stats
+                    remaining[endpoint_name] -= 1
+                    finished = remaining[endpoint_name] == 0
+                
+                if finished:
+                    if endpoint_name in windowed:
+                        results[endpoint_name] = self._finish_windowed(endpoint_name,
+                                                                       results[endpoint_name])
+                    progress.finish(endpoint_name, results[endpoint_name].get("status"))
+        
+        try:
+            workers = min(max_workers, work.qsize())
+            with ThreadPoolExecutor(max_workers=max(workers, 1),
+                                    thread_name_prefix="collector") as executor:
+                for future in [executor.submit(drain) for _ in range(workers)]:
+                    future.result()
+        finally:
+            progress.close()
+        
+        # Report in priority order regardless of completion order
+        results = {name: results[name] for name, _ in ordered}
         
         # Generate summary
         summary = {
@@ -359,7 +1029,7 @@ class DataCollector:
         for endpoint, info in self.state.get("collections", {}).items():
             # Check for existing files
             endpoint_dir = self.output_dir / endpoint
-            files = list(endpoint_dir.glob("*.parquet")) if endpoint_dir.exists() else []
+            files = dataset_files(endpoint_dir)
             
             status["endpoints"][endpoint] = {
                 "last_collection": info.get("last_collection"),
@@ -368,6 +1038,12 @@ class DataCollector:
                 "total_size_mb": sum(f.stat().st_size for f in files) / (1024 * 1024) if files else 0
             }
         
+        # Interrupted collections that the next run will resume
+        status["checkpoints"] = {
+            slot: {"page": cp["page"], "records_collected": cp["records_collected"]}
+            for slot, cp in self.state.get("checkpoints", {}).items()
+        }
+        
         return status
     
     def clean_old_data(self, days_to_keep: int = 30) -> Dict[str, int]:
@@ -390,7 +1066,7 @@ class DataCollector:
             deleted_count = 0
             deleted_size = 0
             
-            for file in endpoint_dir.glob("*.parquet"):
+            for file in dataset_files(endpoint_dir):
                 # Check file age
                 file_time = datetime.fromtimestamp(file.stat().st_mtime)
                 
@@ -398,10 +1074,16 @@ class DataCollector:
                     file_size = file.stat().st_size
                     file.unlink()
                     
-                    # Also remove sample file if exists
-                    sample_file = file.with_suffix('.sample.json')
-                    if sample_file.exists():
-                        sample_file.unlink()
+                    # Also remove sample file if exists (hidden at the dataset root)
+                    for sample_file in (endpoint_dir / f".{file.stem}.sample.json",
+                                        file.with_suffix('.sample.json')):
+                        sample_file.unlink(missing_ok=True)
+                    
+                    # Drop partition directories left empty
+                    parent = file.parent
+                    while parent != endpoint_dir and not any(parent.iterdir()):
+                        parent.rmdir()
+                        parent = parent.parent
                     
                     deleted_count += 1
                     deleted_size += file_size
@@ -413,4 +1095,55 @@ class DataCollector:
                 }
         
         self.logger.info(f"Cleanup completed: {cleanup_stats}")
-        return cleanup_stats
\ No newline at end of file
+        return cleanup_stats
+    
+    def _repoint_windows(self, endpoint_name: str, replaced: Dict[Path, List[Path]]) -> None:
+        """Durably swap compacted files for their replacements in the endpoint's window records."""
+        replaced = {str(old.resolve()): [str(f) for f in new] for old, new in replaced.items()}
+        with self.state_lock:
+            windows = self.state["collections"].get(endpoint_name, {}).get("windows", {})
+            for record in windows.values():
+                output_files = []
+                for f in record.get("output_files", []):
+                    for path in replaced.get(str(Path(f).resolve()), [f]):
+                        if path not in output_files:
+                            output_files.append(path)
+                record["output_files"] = output_files
+            self._save_state()
+    
+    def compact_data(self, target_rows: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Merge the small files left by repeated collections.
+        
+        Each endpoint's partitions are compacted into files of ``target_rows``
+        rows sorted by the endpoint's date field (see ``compact_dataset``), and
+        only the newest sample JSON is kept. Completed windows are repointed at
+        the compacted files so later runs still skip them.
+        
+        Args:
+            target_rows: Rows per compacted file (COMPACT_TARGET_ROWS by default)
+        
+        Returns:
+            Compaction statistics per endpoint
+        """
+        compaction_stats = {}
+        
+        for endpoint_dir in sorted(self.output_dir.iterdir()):
+            if not endpoint_dir.is_dir() or endpoint_dir.name.startswith('.'):
+                continue
+            
+            date_field = PARTITION_DATE_FIELDS.get(endpoint_dir.name)
+            stats = compact_dataset(endpoint_dir, sort_by=[date_field] if date_field else None,
+                                    target_rows=target_rows,
+                                    on_commit=partial(self._repoint_windows, endpoint_dir.name))
+            
+            samples = sorted(endpoint_dir.glob(".*.sample.json"), key=lambda p: p.stat().st_mtime)
+            for sample_file in samples[:-1]:
+                sample_file.unlink()
+            stats["samples_removed"] = max(len(samples) - 1, 0)
+            
+            if stats["partitions"] or stats["samples_removed"]:
+                compaction_stats[endpoint_dir.name] = stats
+        
+        self.logger.info(f"Compaction completed: {compaction_stats}")
+        return compaction_stats
\ No newline at end of file
@@ -0,0 +1,610 @@
+"""
+Hive-partitioned Parquet datasets for raw and processed data.
+
+Transactional datasets are laid out as
+``<dataset>/year=YYYY/month=M/orgao_codigo=XXXXX/<run>.parquet``, partitioned
+by the year/month of the dataset's date field and by the órgão code. Rows
+without a date or órgão go to the ``__HIVE_DEFAULT_PARTITION__`` directory.
+Reference tables without a date field are written unpartitioned.
+
+Repeated runs add a file per partition; ``compact_dataset`` merges them back
+into a few right-sized files.
+"""
+
+import os
+import json
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple, Union
+from urllib.parse import quote
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config.constants import DATE_FORMAT_BR
+from src.data.writer import DEFAULT_ROW_GROUP_SIZE, StreamingParquetWriter, conform_table
+
+
+PARTITION_SCHEMA = pa.schema([
+    ("year", pa.int16()),
+    ("month", pa.int8()),
+    ("orgao_codigo", pa.string())
+])
+PARTITION_COLUMNS = PARTITION_SCHEMA.names
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Date field that drives the year/month partitions of each dataset
+PARTITION_DATE_FIELDS = {
+    "contratos": "dataAssinatura",
+    "convenios": "dataAssinatura",
+    "licitacoes": "dataAbertura",
+    "pagamentos": "data"
+}
+
+# Where the órgão code is found in the API's records, tried in order
+ORGAO_FIELDS = (
+    "codigoOrgao",
+    "orgao.codigo",
+    "orgao.codigoSIAFI",
+    "unidadeGestora.orgaoVinculado.codigoSIAFI",
+    "orgaoVinculado.codigoSIAFI"
+)
+
+# Rows per file written by compaction
+DEFAULT_COMPACT_ROWS = int(os.getenv("COMPACT_TARGET_ROWS", "1000000"))
+
+# Journal of a compaction in progress, one per partition directory
+COMPACTION_JOURNAL = ".compaction.json"
+
+# File metadata key listing the original files a compacted file was merged from
+COMPACTED_FROM_KEY = "compacted_from"
+
+PartitionKey = Tuple[Optional[int], Optional[int], Optional[str]]
+
+logger = logging.getLogger(__name__)
+
+
+def parse_partition_date(value: Any) -> Optional[Tuple[int, int]]:
+    """Return (year, month) of a date, datetime or dd/mm/yyyy / ISO string."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.year, value.month
+    
+    text = str(value).strip()
+    for fmt, length in ((DATE_FORMAT_BR, 10), ("%Y-%m-%d", 10)):
+        try:
+            parsed = datetime.strptime(text[:length], fmt)
+            return parsed.year, parsed.month
+        except ValueError:
+            continue
+    return None
+
+
+def _lookup(record: Dict[str, Any], path: str) -> Any:
+    """Follow a dotted path through nested dicts."""
+    value = record
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def partition_key(record: Dict[str, Any], date_field: str) -> PartitionKey:
+    """Partition (year, month, órgão code) of a raw record."""
+    year, month = parse_partition_date(record.get(date_field)) or (None, None)
+    for path in ORGAO_FIELDS:
+        orgao = _lookup(record, path)
+        if orgao not in (None, ""):
+            return year, month, str(orgao)
+    return year, month, None
+
+
+def _struct_field(values: pd.Series, name: str) -> pd.Series:
+    """Field of a column of records (dicts, or an Arrow struct column)."""
+    dtype = values.dtype
+    if isinstance(dtype, pd.ArrowDtype) and pa.types.is_struct(dtype.pyarrow_dtype):
+        if dtype.pyarrow_dtype.get_field_index(name) < 0:
+            return pd.Series(None, index=values.index, dtype="object")
+        field = pc.struct_field(pa.array(values), name)
+        return pd.Series(field, index=values.index, dtype=pd.ArrowDtype(field.type))
+    return values.map(lambda v: v.get(name) if isinstance(v, dict) else None)
+
+
+def partition_frame(df: pd.DataFrame, date_field: str) -> pd.DataFrame:
+    """Vectorized ``partition_key`` for every row of a DataFrame."""
+    dates = df[date_field] if date_field in df.columns else pd.Series(pd.NaT, index=df.index)
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        text = dates.astype("string").str.strip()
+        dates = pd.to_datetime(text.str[:10], format=DATE_FORMAT_BR, errors="coerce").fillna(
+            pd.to_datetime(text.str[:10], format="%Y-%m-%d", errors="coerce")
+        )
+    
+    orgao = pd.Series(None, index=df.index, dtype="object")
+    for path in ORGAO_FIELDS:
+        head, *rest = path.split(".")
+        if head not in df.columns:
+            continue
+        values = df[head]
+        for part in rest:
+            values = _struct_field(values, part)
+        values = values.where(values.notna() & (values.astype(str) != ""), None)
+        orgao = orgao.where(orgao.notna(), values)
+    
+    return pd.DataFrame({
+        "year": dates.dt.year.astype("Int16"),
+        "month": dates.dt.month.astype("Int8"),
+        "orgao_codigo": orgao.map(lambda v: None if pd.isna(v) else str(v))
+    }, index=df.index)
+
+
+def _frame_key(values: Tuple[Any, ...]) -> PartitionKey:
+    """Partition key from a row of ``partition_frame`` (nullable dtypes to Python values)."""
+    key = tuple(None if pd.isna(v) else v for v in values)
+    return (None if key[0] is None else int(key[0]),
+            None if key[1] is None else int(key[1]), key[2])
+
+
+def partition_keys(df: pd.DataFrame, date_field: str) -> List[PartitionKey]:
+    """Distinct partition keys of a DataFrame's rows."""
+    keys = partition_frame(df, date_field).drop_duplicates()
+    return [_frame_key(values) for values in keys.itertuples(index=False)]
+
+
+def partition_path(key: PartitionKey) -> str:
+    """Relative Hive directory of a partition key."""
+    return "/".join(
+        f"{name}={NULL_PARTITION if value is None else quote(str(value), safe='')}"
+        for name, value in zip(PARTITION_COLUMNS, key)
+    )
+
+
+class PartitionedDatasetWriter:
+    """
+    Stream records into a Hive-partitioned Parquet dataset.
+    
+    Each partition gets one ``basename`` file written through a
+    StreamingParquetWriter, so a run adds a file per touched partition.
+    With ``replace``, once every file is in place the other Parquet files in
+    the touched partitions are removed: the run replaces exactly the
+    partitions it wrote and leaves the rest of the dataset alone. ``replace``
+    may also be a predicate on the partition key, for runs that own only
+    some of the partitions they write to.
+    
+    Without ``date_field`` the dataset is unpartitioned and ``basename`` is
+    written directly under ``base_dir``.
+    """
+    
+    def __init__(
+        self,
+        base_dir: Union[str, Path],
+        basename: str,
+        date_field: Optional[str] = None,
+        schema: Optional[pa.Schema] = None,
+        replace: Union[bool, Callable[[PartitionKey], bool]] = False,
+        row_group_size: Optional[int] = None,
+        max_buffered_rows: Optional[int] = None,
+        constants: Optional[Dict[str, pa.Scalar]] = None
+    ):
+        """
+        Initialize writer.
+        
+        Args:
+            base_dir: Dataset root directory
+            basename: File name written inside each partition
+            date_field: Field partitioned by year/month (None for no partitioning)
+            schema: Record schema shared by every partition file
+            replace: Replace the touched partitions instead of adding to them
+                (or a predicate selecting the partitions to replace)
+            row_group_size: Rows per row group
+            max_buffered_rows: Rows buffered across all partitions before the
+                largest buffer is flushed (defaults to ``row_group_size``)
+            constants: Columns appended to every row with a fixed value
+        """
+        self.base_dir = Path(base_dir)
+        self.basename = basename
+        self.date_field = date_field
+        self.schema = schema
+        self.replace = replace
+        self.row_group_size = row_group_size or DEFAULT_ROW_GROUP_SIZE
+        self.max_buffered_rows = max_buffered_rows or self.row_group_size
+        self.constants = constants
+        self.writers: Dict[PartitionKey, StreamingParquetWriter] = {}
+        self.written: List[Path] = []
+    
+    def __enter__(self) -> "PartitionedDatasetWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+    
+    def _writer(self, key: PartitionKey) -> StreamingParquetWriter:
+        writer = self.writers.get(key)
+        if writer is None:
+            directory = self.base_dir / partition_path(key) if self.date_field else self.base_dir
+            writer = StreamingParquetWriter(
+                directory / self.basename, schema=self.schema,
+                row_group_size=self.row_group_size, constants=self.constants
+            )
+            self.writers[key] = writer
+        return writer
+    
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        """Append a page of records, routing each to its partition."""
+        if not self.date_field:
+            self._writer((None, None, None)).write(records)
+        else:
+            groups = defaultdict(list)
+            for record in records:
+                groups[partition_key(record, self.date_field)].append(record)
+            for key, group in groups.items():
+                self._writer(key).write(group)
+        self._limit_buffers()
+    
+    def write_frame(self, df: pd.DataFrame) -> None:
+        """Append a DataFrame, routing each row to its partition."""
+        df = df.drop(columns=[c for c in PARTITION_COLUMNS if c in df.columns])
+        
+        # Convert once; partitions are then sliced out of the Arrow table.
+        # Without an explicit schema each frame keeps its own and partition
+        # files widen as needed, so frames of one stream may differ in types
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        if not self.date_field:
+            self._writer((None, None, None)).write_table(table)
+        else:
+            keys = partition_frame(df, self.date_field)
+            for key, positions in keys.groupby(PARTITION_COLUMNS, dropna=False).indices.items():
+                self._writer(_frame_key(key)).write_table(table.take(pa.array(positions)))
+        self._limit_buffers()
+    
+    def _limit_buffers(self) -> None:
+        """Keep rows buffered across partitions bounded."""
+        while sum(w.buffered_rows for w in self.writers.values()) > self.max_buffered_rows:
+            max(self.writers.values(), key=lambda w: w.buffered_rows).flush()
+    
+    def close(self) -> List[Path]:
+        """
+        Finalize every partition file.
+        
+        Returns:
+            Paths of the files written
+        """
+        written = {key: w.close() for key, w in self.writers.items()}
+        written = {key: path for key, path in written.items() if path}
+        
+        for key, path in written.items():
+            replace = self.replace(key) if callable(self.replace) else self.replace
+            if not replace:
+                continue
+            for old in path.parent.glob("*.parquet"):
+                if old != path:
+                    logger.info(f"Replacing {old}")
+                    old.unlink()
+        
+        self.written = sorted(written.values())
+        return self.written
+    
+    def abort(self) -> None:
+        """Discard every partition file being written."""
+        for writer in self.writers.values():
+            writer.abort()
+
+
+def dataset_files(base_dir: Union[str, Path]) -> List[Path]:
+    """
+    Parquet files of a dataset, skipping hidden and temporary files.
+    
+    Partitions being compacted show either their original files or the
+    compacted ones, never both (see ``compact_dataset``).
+    """
+    base_dir = Path(base_dir)
+    if not base_dir.exists():
+        return []
+    
+    files = [
+        path for path in base_dir.rglob("*.parquet")
+        if not any(part.startswith((".", "_")) for part in path.relative_to(base_dir).parts)
+    ]
+    hidden = set()
+    for directory in {path.parent for path in files}:
+        journal = _read_journal(directory)
+        if journal:
+            # Until the journal is committed the new files do not exist yet
+            names = journal["old"] if journal["state"] == "committed" else journal["new"]
+            hidden.update(directory / name for name in names)
+    return sorted(path for path in files if path not in hidden)
+
+
+def compacted_from(path: Union[str, Path]) -> List[str]:
+    """
+    Names of the files, in the same directory, whose rows a compacted file holds.
+    
+    Files compacted again list the files the earlier compaction merged, so
+    the names always refer to the files originally written. Files that were
+    never compacted return an empty list.
+    """
+    metadata = pq.read_schema(path).metadata or {}
+    value = metadata.get(COMPACTED_FROM_KEY.encode())
+    return json.loads(value) if value else []
+
+
+def _read_journal(directory: Path) -> Optional[Dict[str, Any]]:
+    """Compaction journal of a partition directory, if any."""
+    path = directory / COMPACTION_JOURNAL
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_journal(directory: Path, journal: Dict[str, Any]) -> None:
+    """Atomically (re)write a partition's compaction journal."""
+    path = directory / COMPACTION_JOURNAL
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def recover_compaction(directory: Union[str, Path]) -> None:
+    """
+    Finish or roll back an interrupted compaction of a partition directory.
+    
+    A committed compaction has its original files removed; one interrupted
+    while writing has its partial output removed.
+    """
+    directory = Path(directory)
+    journal = _read_journal(directory)
+    if journal is None:
+        return
+    
+    names = journal["old"] if journal["state"] == "committed" else journal["new"]
+    for name in names:
+        (directory / name).unlink(missing_ok=True)
+        (directory / f".{name}.tmp").unlink(missing_ok=True)
+    (directory / COMPACTION_JOURNAL).unlink()
+    logger.info(f"Recovered {journal['state']} compaction in {directory}")
+
+
+def compact_dataset(
+    base_dir: Union[str, Path],
+    sort_by: Optional[List[str]] = None,
+    target_rows: Optional[int] = None,
+    min_files: int = 2,
+    on_commit: Optional[Callable[[Dict[Path, List[Path]]], None]] = None
+) -> Dict[str, int]:
+    """
+    Merge the small files of each partition into right-sized ones.
+    
+    In every partition holding at least ``min_files`` files smaller than
+    ``target_rows``, those files are rewritten as files of ``target_rows``
+    rows under the schema unified across the whole dataset, sorted by the
+    ``sort_by`` columns present. Larger files are left alone.
+    
+    Each partition is switched over through a journal: readers going
+    through ``dataset_files`` see the original files until the compacted
+    ones are complete, then only the compacted ones, and an interrupted
+    compaction is finished or rolled back by the next one.
+    
+    Compacted files record the original files they replace (see
+    ``compacted_from``), so consumers tracking those can recognize rows they
+    have already seen.
+    
+    ``on_commit`` is called once a partition's switch-over is committed,
+    before its original files are removed, with each removed file mapped to
+    the compacted files that now hold its rows, so callers can repoint any
+    record of those paths.
+    
+    Args:
+        base_dir: Dataset root directory
+        sort_by: Columns to sort rows by (e.g. date and id columns)
+        target_rows: Rows per compacted file (COMPACT_TARGET_ROWS by default)
+        min_files: Small files a partition needs to be compacted
+        on_commit: Called with the old-to-new file mapping of each partition
+    
+    Returns:
+        Counts of partitions compacted, files removed and written, and rows
+    """
+    base_dir = Path(base_dir)
+    target_rows = target_rows or DEFAULT_COMPACT_ROWS
+    stats = {"partitions": 0, "files_removed": 0, "files_written": 0, "rows": 0}
+    if not base_dir.exists():
+        return stats
+    
+    for journal in base_dir.rglob(COMPACTION_JOURNAL):
+        recover_compaction(journal.parent)
+    
+    files = dataset_files(base_dir)
+    if not files:
+        return stats
+    schema = pa.unify_schemas([pq.read_schema(path) for path in files],
+                              promote_options="permissive")
+    sort_keys = [(col, "ascending") for col in (sort_by or []) if col in schema.names]
+    
+    partitions = defaultdict(list)
+    for path in files:
+        if pq.read_metadata(path).num_rows < target_rows:
+            partitions[path.parent].append(path)
+    
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    for directory, small in sorted(partitions.items()):
+        if len(small) < min_files:
+            continue
+        
+        table = pa.concat_tables(
+            conform_table(pq.read_table(path), schema) for path in small
+        )
+        if sort_keys:
+            table = table.sort_by(sort_keys)
+        
+        sources = [name for path in small for name in compacted_from(path) or [path.name]]
+        metadata = {COMPACTED_FROM_KEY: json.dumps(sources)}
+        chunks = range(0, len(table), target_rows)
+        new = [f"compacted_{stamp}_{i:03d}.parquet" for i in range(len(chunks))]
+        _write_journal(directory, {"state": "writing", "old": [p.name for p in small],
+                                   "new": new})
+        try:
+            for name, offset in zip(new, chunks):
+                with StreamingParquetWriter(directory / name, schema=schema,
+                                            metadata=metadata) as writer:
+                    writer.write_table(table.slice(offset, target_rows))
+        except BaseException:
+            recover_compaction(directory)
+            raise
+        
+        _write_journal(directory, {"state": "committed", "old": [p.name for p in small],
+                                   "new": new})
+        if on_commit:
+            on_commit({path: [directory / name for name in new] for path in small})
+        recover_compaction(directory)
+        
+        logger.info(f"Compacted {len(small)} files into {len(new)} in {directory}")
+        stats["partitions"] += 1
+        stats["files_removed"] += len(small)
+        stats["files_written"] += len(new)
+        stats["rows"] += len(table)
+    
+    return stats
+
+
+def open_dataset(
+    base_dir: Union[str, Path],
+    files: Optional[List[Path]] = None
+) -> Optional[ds.Dataset]:
+    """
+    Open a (possibly partitioned) dataset directory.
+    
+    The schema is unified across every file so datasets written by runs with
+    different columns read back together.
+    
+    Args:
+        base_dir: Dataset root directory
+        files: Files to open (every Parquet file under ``base_dir`` if omitted)
+    
+    Returns:
+        The dataset, or None if it has no files
+    """
+    if files is None:
+        files = dataset_files(base_dir)
+    if not files:
+        return None
+    
+    schemas = [pq.read_schema(path) for path in files]
+    schema = pa.unify_schemas(schemas + [PARTITION_SCHEMA], promote_options="permissive")
+    return ds.dataset(
+        [str(path) for path in files], schema=schema, format="parquet",
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+        partition_base_dir=str(base_dir)
+    )
+
+
+def read_dataset(
+    base_dir: Union[str, Path],
+    filters: Optional[Union[List[Tuple[str, str, Any]], ds.Expression]] = None,
+    columns: Optional[List[str]] = None,
+    files: Optional[List[Path]] = None,
+    dtype_backend: Optional[str] = None
+) -> Optional[pd.DataFrame]:
+    """
+    Read a dataset into a DataFrame.
+    
+    Filters on ``year``, ``month`` and ``orgao_codigo`` prune whole
+    partitions without opening their files.
+    
+    Args:
+        base_dir: Dataset root directory
+        filters: Row filters in ``pyarrow.parquet`` DNF form,
+            e.g. ``[("year", "=", 2024), ("month", "in", [1, 2])]``, or a
+            ``pyarrow.dataset`` expression
+        columns: Columns to load (all if omitted)
+        files: Files to read (every Parquet file under ``base_dir`` if omitted)
+        dtype_backend: ``"pyarrow"`` for Arrow-backed columns (``pd.ArrowDtype``)
+            instead of NumPy/object ones, as in ``pd.read_parquet``
+    
+    Returns:
+        DataFrame, or None if the dataset has no files
+    """
+    dataset = open_dataset(base_dir, files=files)
+    if dataset is None:
+        return None
+    
+    expression = _filter_expression(filters)
+    table = dataset.to_table(columns=columns, filter=expression)
+    
+    # Partition columns that are null everywhere (unpartitioned data) add nothing
+    for name in PARTITION_COLUMNS:
+        if name in table.column_names and table[name].null_count == len(table):
+            if columns is None or name not in columns:
+                table = table.drop_columns([name])
+    
+    return _to_pandas(table, dtype_backend)
+
+
+def iter_dataset(
+    base_dir: Union[str, Path],
+    filters: Optional[Union[List[Tuple[str, str, Any]], ds.Expression]] = None,
+    columns: Optional[List[str]] = None,
+    files: Optional[List[Path]] = None,
+    batch_size: Optional[int] = None,
+    dtype_backend: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Read a dataset as a stream of DataFrames of at most ``batch_size`` rows.
+    
+    Only a few batches are held in memory at a time, so datasets larger
+    than memory can be processed. The small batches of small partition files
+    are combined, so batches have ``batch_size`` rows except the last one.
+    Arguments are as in ``read_dataset``; ``batch_size`` defaults to
+    PARQUET_ROW_GROUP_SIZE.
+    """
+    base_dir = Path(base_dir)
+    dataset = open_dataset(base_dir, files=files)
+    if dataset is None:
+        return
+    
+    # Unpartitioned datasets get no (all-null) partition columns, as in read_dataset
+    partitioned = any(
+        "=" in part for path in dataset.files for part in Path(path).relative_to(base_dir).parts
+    )
+    if columns is None and not partitioned:
+        columns = [name for name in dataset.schema.names if name not in PARTITION_COLUMNS]
+    
+    batch_size = batch_size or DEFAULT_ROW_GROUP_SIZE
+    expression = _filter_expression(filters)
+    batches = dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size,
+                                 batch_readahead=1, fragment_readahead=1)
+    
+    pending: List[pa.RecordBatch] = []
+    pending_rows = 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= batch_size:
+            table = pa.Table.from_batches(pending)
+            yield _to_pandas(table.slice(0, batch_size), dtype_backend)
+            pending = table.slice(batch_size).to_batches()
+            pending_rows -= batch_size
+    if pending_rows:
+        yield _to_pandas(pa.Table.from_batches(pending), dtype_backend)
+
+
+def _filter_expression(filters: Any) -> Optional[ds.Expression]:
+    if isinstance(filters, ds.Expression):
+        return filters
+    return pq.filters_to_expression(filters) if filters else None
+
+
+def _to_pandas(table: pa.Table, dtype_backend: Optional[str]) -> pd.DataFrame:
+    if dtype_backend == "pyarrow":
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas()
@@ -0,0 +1,191 @@
+"""
+Vectorized parsers for the formats used by the Portal da Transparência API.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config.constants import DATE_FORMAT_BR, DATETIME_FORMAT_BR
+
+
+# Brazilian currency amounts: optional R$, "." thousands separators and ","
+# decimals, negative as a leading "-" or in parentheses
+_SPACE = r"[ \x{00a0}]*"
+_BR_NUMBER = r"(?:\d{1,3}(?:\.\d{3})+|\d+)(?:,\d+)?"
+# Plain numbers with a "." decimal point (e.g. floats serialized as text)
+_DOT_NUMBER = r"\d+\.\d+"
+
+# Everything around the digits of a valid amount
+_AMOUNT_AFFIXES = " \t\n\r\u00a0R$-()"
+
+
+def _amount_pattern(number: str) -> str:
+    sign = rf"(?:-{_SPACE}(?:R\${_SPACE})?|(?:R\${_SPACE})?(?:-{_SPACE})?)"
+    return rf"^\s*(?:\({_SPACE}(?:R\${_SPACE})?{number}{_SPACE}\)|{sign}{number})\s*$"
+
+
+CURRENCY_PATTERN = _amount_pattern(_BR_NUMBER)
+DECIMAL_PATTERN = _amount_pattern(_DOT_NUMBER)
+
+# Date formats of the API, preferred in this order when a sample fits several;
+# "ISO8601" covers dates and datetimes with or without fractions
+DATE_FORMATS = (DATE_FORMAT_BR, DATETIME_FORMAT_BR, f"{DATE_FORMAT_BR} %H:%M", "ISO8601")
+
+# Values sampled to detect the format of a date column
+DATE_SAMPLE_SIZE = 1000
+
+# UTC offset ("Z", "-03:00", "+0000") at the end of an ISO time of day
+_UTC_OFFSET = r"(\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)\s*(?:Z|[+-]\d{2}(?::?\d{2})?)$"
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+def parse_currency_array(values: pa.Array) -> pa.Array:
+    """
+    Parse an Arrow string array of currency amounts into float64.
+    
+    Values are validated with one regex pass; the digits are then isolated
+    with trim/replace kernels and cast once, so no Python objects are
+    created. Values that are not amounts become null.
+    """
+    is_br = pc.fill_null(pc.match_substring_regex(values, pattern=CURRENCY_PATTERN), False)
+    if pc.all(pc.or_(is_br, pc.is_null(values))).as_py() is not False:
+        is_decimal = None
+    else:
+        # Only columns with non-Brazilian values pay for the second pattern
+        is_decimal = pc.and_not(
+            pc.fill_null(pc.match_substring_regex(values, pattern=DECIMAL_PATTERN), False), is_br
+        )
+    
+    # In a valid amount, "-" and "(" can only be signs
+    negative = pc.or_(pc.match_substring(values, "-"), pc.match_substring(values, "("))
+    digits = pc.utf8_trim(values, characters=_AMOUNT_AFFIXES)
+    
+    br_digits = pc.replace_substring(
+        pc.replace_substring(digits, pattern=".", replacement=""), pattern=",", replacement="."
+    )
+    null = pa.scalar(None, pa.string())
+    if is_decimal is None:
+        digits = pc.if_else(is_br, br_digits, null)
+    else:
+        digits = pc.if_else(is_br, br_digits, pc.if_else(is_decimal, digits, null))
+    
+    number = pc.cast(digits, pa.float64())
+    return pc.if_else(negative, pc.negate(number), number)
+
+
+def parse_currency(values: pd.Series) -> pd.Series:
+    """
+    Parse Brazilian currency amounts (e.g. ``"R$ 1.234,56"``, ``"(10,00)"``).
+    
+    Numeric columns are returned as float64 without reparsing. Text is parsed
+    with ``parse_currency_array``; object columns mixing numbers and text keep
+    the numbers as they are.
+    
+    Args:
+        values: Column of amounts
+    
+    Returns:
+        float64 Series with the same index, NaN where a value is not an amount
+    """
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return values.astype("float64")
+    
+    numbers = None
+    try:
+        strings = pa.array(values, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        is_number = values.map(_is_number).astype(bool)
+        numbers = pd.to_numeric(values.where(is_number), errors="coerce")
+        text = values.where(~is_number, None).map(
+            lambda v: v if v is None or isinstance(v, str) else str(v)
+        )
+        strings = pa.array(text, type=pa.string(), from_pandas=True)
+    
+    parsed = parse_currency_array(strings).to_numpy(zero_copy_only=False)
+    result = pd.Series(parsed, index=values.index, name=values.name, dtype="float64")
+    if numbers is not None:
+        result = result.fillna(numbers.astype("float64"))
+    return result
+
+
+def _date_text(values: pd.Series) -> pd.Series:
+    """
+    Date strings stripped of whitespace and of UTC offsets.
+    
+    Offsets are dropped keeping the local time, so ISO datetimes from
+    different time zones parse to one naive datetime64 column next to the
+    API's (naive, local) dd/mm/yyyy dates instead of an object column.
+    """
+    text = values.astype(str).str.strip()
+    return text.str.replace(_UTC_OFFSET, r"\1", regex=True)
+
+
+def detect_date_format(values: pd.Series, sample_size: int = DATE_SAMPLE_SIZE) -> Optional[str]:
+    """
+    Detect the format of a column of date strings from a sample.
+    
+    Returns:
+        The entry of DATE_FORMATS that parses most of an evenly spaced sample
+        of the non-null values (the first one on ties), or None if none does
+    """
+    positions = np.flatnonzero(values.notna().to_numpy())
+    if len(positions) > sample_size:
+        positions = positions[np.linspace(0, len(positions) - 1, sample_size).astype(int)]
+    sample = _date_text(values.iloc[positions])
+    
+    best_format, best_count = None, 0
+    for date_format in DATE_FORMATS:
+        count = pd.to_datetime(sample, format=date_format, errors="coerce").notna().sum()
+        if count > best_count:
+            best_format, best_count = date_format, count
+    return best_format
+
+
+def parse_dates(values: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """
+    Parse a column of date strings with a fixed format.
+    
+    The format is detected with ``detect_date_format`` unless given, so
+    ``dd/mm/yyyy`` dates are never read month first. Each distinct string is
+    parsed once, as dates repeat a lot; strings not in the column's format
+    are retried with the other DATE_FORMATS, so columns mixing e.g. BR and
+    ISO dates parse fully. UTC offsets are dropped (see ``_date_text``), so
+    the result is always naive datetime64. Datetime columns are returned as
+    they are.
+    
+    Args:
+        values: Column of dates
+        date_format: strptime format (or "ISO8601") of the column
+    
+    Returns:
+        Datetime Series with the same index, NaT where a value is not a date
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return pd.to_datetime(values, errors="coerce")
+    
+    codes, uniques = pd.factorize(values)
+    text = _date_text(pd.Series(np.asarray(uniques, dtype=object)))
+    date_format = date_format or detect_date_format(text)
+    
+    formats = [f for f in DATE_FORMATS if f != date_format]
+    if date_format:
+        formats.insert(0, date_format)
+    
+    parsed = pd.to_datetime(text, format=formats[0], errors="coerce")
+    for candidate in formats[1:]:
+        failed = parsed.isna()
+        if not failed.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(text[failed], format=candidate, errors="coerce"))
+    
+    result = parsed.array.take(codes, allow_fill=True)
+    return pd.Series(result, index=values.index, name=values.name)
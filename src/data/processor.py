@@ -2,13 +2,57 @@
 Data processing module for cleaning, transforming, and preparing data for analysis.
 """
 
+import os
+import json
+import time
+import hashlib
 import logging
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from multiprocessing import Manager
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Union, Callable
+from typing import Dict, List, Any, Optional, Tuple, Union, Callable
+from urllib.parse import unquote
 import pandas as pd
 import numpy as np
 from datetime import datetime
 import re
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.data.dataset import (
+    NULL_PARTITION, PARTITION_COLUMNS, PARTITION_DATE_FIELDS, PartitionedDatasetWriter,
+    compact_dataset, compacted_from, dataset_files, iter_dataset, open_dataset, partition_keys,
+    partition_path, read_dataset
+)
+from src.data.writer import StreamingParquetWriter
+from src.data.parsers import parse_currency, parse_dates
+from src.data.upsert import UpsertTable, key_hashes, row_digests
+
+
+# "pandas" (NumPy/object columns) or "arrow" (Arrow-backed columns end to end)
+PROCESSING_ENGINES = ("pandas", "arrow")
+DEFAULT_ENGINE = os.getenv("PROCESSING_ENGINE", "pandas")
+
+ARROW_STRING = pd.ArrowDtype(pa.string())
+
+# Rows per batch of process_dataset_streaming
+DEFAULT_BATCH_SIZE = int(os.getenv("PROCESSING_BATCH_SIZE", "100000"))
+
+# Worker processes of process_all (1 processes the datasets one after another)
+DEFAULT_MAX_WORKERS = int(os.getenv("PROCESSING_MAX_WORKERS", "1"))
+
+# Memory process_all plans for across its workers
+DEFAULT_MEMORY_BUDGET_MB = int(os.getenv("PROCESSING_MEMORY_MB", "4096"))
+
+# Raw files already processed by process_incremental, per processed dataset
+MANIFEST_FILE = ".manifest.json"
+
+# Estimated processing memory per byte of raw Parquet: loaded frames take
+# about 10x their compressed size and the cleaning steps copy columns
+MEMORY_PER_RAW_BYTE = 20
 
 
 class DataProcessor:
@@ -22,19 +66,38 @@ class DataProcessor:
     - Currency value cleaning
     - Feature engineering
     - Data validation
+    - Current-state tables deduplicated across runs
     """
     
-    def __init__(self, input_dir: str = "data/raw", output_dir: str = "data/processed"):
+    def __init__(self, input_dir: str = "data/raw", output_dir: str = "data/processed",
+                 current_dir: str = "data/current", engine: Optional[str] = None):
         """
         Initialize data processor.
         
         Args:
             input_dir: Directory containing raw data
             output_dir: Directory to save processed data
+            current_dir: Directory of the current-state tables (one row per record id)
+            engine: "pandas" or "arrow" (PROCESSING_ENGINE by default); the
+                arrow engine keeps text and nested columns in Arrow memory
+                instead of Python objects, with the same cleaning rules
+        
+        Raises:
+            ValueError: If the engine is unknown
         """
+        self.engine = engine or DEFAULT_ENGINE
+        if self.engine not in PROCESSING_ENGINES:
+            raise ValueError(
+                f"Unknown engine {self.engine!r}; expected one of {PROCESSING_ENGINES}"
+            )
+        
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.current_dir = Path(current_dir)
+        
+        # Held while merging into current-state tables, shared by process_all workers
+        self.current_lock = None
         
         # Setup logging
         self.logger = logging.getLogger(__name__)
@@ -81,26 +144,34 @@ class DataProcessor:
         self,
         dataset_name: str,
         input_file: Optional[Union[str, Path]] = None,
-        custom_processing: Optional[Callable] = None
+        custom_processing: Optional[Callable] = None,
+        filters: Optional[List[Tuple[str, str, Any]]] = None
     ) -> pd.DataFrame:
         """
         Process a specific dataset.
         
+        Only the raw partitions matching ``filters`` are loaded, and only the
+        processed partitions they map to are rewritten, so an incremental run
+        can reprocess e.g. the current month without touching the rest.
+        
         Args:
             dataset_name: Name of the dataset to process
-            input_file: Specific input file (optional, uses latest if not provided)
+            input_file: Specific input file (optional, reads the raw dataset if not provided)
             custom_processing: Custom processing function to apply
+            filters: Partition/row filters for the raw dataset, e.g.
+                ``[("year", "=", 2024), ("month", "=", 3)]``
             
         Returns:
             Processed DataFrame
         """
-        self.logger.info(f"Processing dataset: {dataset_name}")
+        self.logger.info(f"Processing dataset: {dataset_name} ({self.engine} engine)")
+        started = time.perf_counter()
         
         # Load data
         if input_file:
-            df = pd.read_parquet(input_file)
+            df = pd.read_parquet(input_file, **self._read_options())
         else:
-            df = self._load_latest_data(dataset_name)
+            df = self._load_raw_data(dataset_name, filters=filters)
         
         if df is None or df.empty:
             self.logger.warning(f"No data found for {dataset_name}")
@@ -112,11 +183,9 @@ class DataProcessor:
         config = self.processing_configs.get(dataset_name, {})
         
         # Apply standard processing
-        df = self._standardize_data_types(df, config)
-        df = self._clean_text_fields(df, config.get("text_columns", []))
-        df = self._parse_dates(df, config.get("date_columns", []))
-        df = self._clean_values(df, config.get("value_columns", []))
-        df = self._handle_missing_values(df)
+        date_failures: Dict[str, int] = {}
+        df = self._clean_rows(df, config, date_failures=date_failures)
+        self._report_date_failures(date_failures)
         df = self._remove_duplicates(df, config.get("id_columns", []))
         
         # Apply custom processing if provided
@@ -132,44 +201,601 @@ class DataProcessor:
         
         if validation_results['is_valid']:
             # Save processed data
-            output_path = self._save_processed_data(dataset_name, df)
+            output_path = self._save_processed_data(
+                dataset_name, df, processing_seconds=time.perf_counter() - started,
+                date_failures=date_failures
+            )
             self.logger.info(f"Saved processed data to {output_path}")
+            
+            # Merge into the deduplicated current state
+            self.upsert_current(dataset_name, df, config)
         else:
             self.logger.error(f"Validation failed: {validation_results['issues']}")
         
         return df
     
-    def _load_latest_data(self, dataset_name: str) -> Optional[pd.DataFrame]:
-        """Load the latest raw data file for a dataset."""
+    def process_incremental(
+        self,
+        dataset_name: str,
+        custom_processing: Optional[Callable] = None
+    ) -> pd.DataFrame:
+        """
+        Process only the raw files added or changed since the last run.
+        
+        A manifest in the processed dataset (``.manifest.json``) records the
+        content hash of every raw file processed; files are only rehashed
+        when their size or modification time changed. The new rows are
+        cleaned, then merged into the processed partitions they fall in:
+        existing rows with the same ids are replaced and every other
+        partition is left alone, so a run costs in proportion to the new data.
+        Datasets without a date field are not partitioned; there only the
+        processed files holding replaced rows are rewritten and the new rows
+        are added as a file of their own.
+        
+        Raw files written by compaction count as processed when every file
+        they were merged from is in the manifest (see ``compacted_from``);
+        otherwise they are processed once more and the merge keeps them from
+        adding duplicates.
+        
+        Args:
+            dataset_name: Name of the dataset to process
+            custom_processing: Custom processing function applied to the new rows
+        
+        Returns:
+            The processed new rows (empty if there were none)
+        """
+        started = time.perf_counter()
         dataset_dir = self.input_dir / dataset_name
+        output_dir = self.output_dir / dataset_name
+        manifest = self._read_manifest(output_dir)
+        
+        files = {path.relative_to(dataset_dir).as_posix(): path
+                 for path in (dataset_files(dataset_dir) if dataset_dir.exists() else [])}
+        entries = {name: self._fingerprint(path, manifest.get(name))
+                   for name, path in files.items()}
+        delta = []
+        for name, path in files.items():
+            if manifest.get(name, {}).get("sha256") == entries[name]["sha256"]:
+                continue
+            sources = self._processed_sources(name, path, manifest)
+            if sources is None:
+                delta.append(path)
+            else:
+                entries[name]["processed_at"] = max(
+                    (s.get("processed_at") or "" for s in sources), default=""
+                ) or None
+        self.logger.info(
+            f"Processing {dataset_name} incrementally: {len(delta)} new or changed raw files, "
+            f"{len(files) - len(delta)} already processed, "
+            f"{len(set(manifest) - set(files))} removed"
+        )
         
-        if not dataset_dir.exists():
+        df = read_dataset(dataset_dir, files=delta, **self._read_options()) if delta else None
+        if df is None or df.empty:
+            self._write_manifest(output_dir, entries)
+            return pd.DataFrame()
+        
+        config = self.processing_configs.get(dataset_name, {})
+        date_failures: Dict[str, int] = {}
+        df = self._clean_rows(df, config, date_failures=date_failures)
+        self._report_date_failures(date_failures)
+        df = self._remove_duplicates(df, config.get("id_columns", []))
+        
+        if custom_processing:
+            df = custom_processing(df)
+        
+        df['_processed_at'] = datetime.now()
+        df['_processing_version'] = '1.0'
+        
+        validation_results = self._validate_data(df, config)
+        if not validation_results['is_valid']:
+            # The manifest is left as is, so the files are retried next run
+            self.logger.error(f"Validation failed: {validation_results['issues']}")
+            return df
+        
+        if PARTITION_DATE_FIELDS.get(dataset_name):
+            merged = self._merge_processed(dataset_name, df, config)
+            self._save_processed_data(dataset_name, merged,
+                                      processing_seconds=time.perf_counter() - started,
+                                      date_failures=date_failures)
+            self.logger.info(
+                f"Merged {len(df)} new records into {len(merged)} rows of {output_dir}"
+            )
+        else:
+            replaced = self._drop_replaced_rows(dataset_name, df, config)
+            self._save_processed_data(dataset_name, df,
+                                      processing_seconds=time.perf_counter() - started,
+                                      date_failures=date_failures, replace=False)
+            self.logger.info(
+                f"Added {len(df)} new records to {output_dir}, replacing {replaced} rows"
+            )
+        self.upsert_current(dataset_name, df, config)
+        
+        processed_at = datetime.now().isoformat()
+        for path in delta:
+            entries[path.relative_to(dataset_dir).as_posix()]["processed_at"] = processed_at
+        self._write_manifest(output_dir, entries)
+        
+        return df
+    
+    def _fingerprint(self, path: Path, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Manifest entry of a raw file, reusing the previous hash if size and mtime match."""
+        stat = path.stat()
+        if previous and previous["size"] == stat.st_size \
+                and previous["mtime_ns"] == stat.st_mtime_ns:
+            return previous
+        
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                 "sha256": digest.hexdigest()}
+        if previous and previous["sha256"] == entry["sha256"]:
+            entry["processed_at"] = previous.get("processed_at")
+        return entry
+    
+    def _processed_sources(
+        self,
+        name: str,
+        path: Path,
+        manifest: Dict[str, Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Manifest entries of the raw files ``path`` was compacted from, if all are there."""
+        if name in manifest:
             return None
+        parent = Path(name).parent
+        sources = [manifest.get((parent / source).as_posix())
+                   for source in compacted_from(path)]
+        return sources if sources and all(sources) else None
+    
+    def _read_manifest(self, output_dir: Path) -> Dict[str, Dict[str, Any]]:
+        """Raw files processed into a dataset, by path relative to the raw dataset."""
+        path = output_dir / MANIFEST_FILE
+        if not path.exists():
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)["files"]
+    
+    def _write_manifest(self, output_dir: Path, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Atomically replace the manifest of a processed dataset."""
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / MANIFEST_FILE
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"updated_at": datetime.now().isoformat(), "files": entries}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    
+    def _merge_processed(
+        self,
+        dataset_name: str,
+        df: pd.DataFrame,
+        config: Dict[str, Any]
+    ) -> pd.DataFrame:
+        """
+        New processed rows plus the existing rows of the partitions they touch.
+        
+        Existing rows whose ids (or, without id columns, whose content) match
+        a new row are dropped in favour of it.
+        """
+        output_dir = self.output_dir / dataset_name
+        date_field = PARTITION_DATE_FIELDS[dataset_name]
+        touched = {partition_path(key) for key in partition_keys(df, date_field)}
+        files = [path for path in dataset_files(output_dir)
+                 if path.parent.relative_to(output_dir).as_posix() in touched]
+        if not files:
+            return df
+        
+        existing = read_dataset(output_dir, files=files, **self._read_options())
+        existing = existing.drop(columns=[c for c in PARTITION_COLUMNS if c in existing.columns])
+        return pd.concat([existing[~self._replaced_rows(existing, df, config)], df],
+                         ignore_index=True)
+    
+    def _replaced_rows(self, existing: pd.DataFrame, df: pd.DataFrame,
+                       config: Dict[str, Any]) -> np.ndarray:
+        """Mask of the existing rows sharing a new row's ids (or, without id columns, content)."""
+        id_columns = [col for col in config.get("id_columns", [])
+                      if col in df.columns and col in existing.columns]
+        if id_columns:
+            return np.isin(key_hashes(existing, id_columns), key_hashes(df, id_columns))
+        
+        content = [col for col in df.columns if not col.startswith('_') and col in existing.columns]
+        return np.isin(row_digests(existing, content), row_digests(df, content))
+    
+    def _drop_replaced_rows(
+        self,
+        dataset_name: str,
+        df: pd.DataFrame,
+        config: Dict[str, Any]
+    ) -> int:
+        """
+        Remove the rows ``df`` replaces from an unpartitioned processed dataset.
+        
+        Each file is scanned, but only files holding replaced rows are
+        rewritten (atomically, or deleted once empty).
+        
+        Returns:
+            Number of rows removed
+        """
+        output_dir = self.output_dir / dataset_name
+        removed = 0
+        for path in dataset_files(output_dir):
+            existing = read_dataset(output_dir, files=[path], **self._read_options())
+            replaced = self._replaced_rows(existing, df, config)
+            if not replaced.any():
+                continue
+            
+            kept = pq.read_table(path).filter(pa.array(~replaced))
+            if len(kept):
+                with StreamingParquetWriter(path, schema=kept.schema) as writer:
+                    writer.write_table(kept)
+            else:
+                path.unlink()
+            removed += int(replaced.sum())
+        return removed
+    
+    def process_dataset_streaming(
+        self,
+        dataset_name: str,
+        filters: Optional[List[Tuple[str, str, Any]]] = None,
+        batch_size: Optional[int] = None,
+        custom_processing: Optional[Callable] = None
+    ) -> Dict[str, Any]:
+        """
+        Process a dataset batch by batch, for datasets larger than memory.
+        
+        Produces the same output as ``process_dataset`` while holding about
+        ``batch_size`` rows in memory at a time:
+        
+        1. A first pass reads only the id columns and marks the last
+           occurrence of every id (8 bytes of hash per row), so duplicates in
+           different batches are removed as in ``process_dataset``.
+        2. A second pass cleans each batch, drops the marked duplicates and
+           writes it to the processed partitions. Missing-value and
+           validation statistics are summed over the batches.
         
-        # Find latest parquet file
-        parquet_files = sorted(dataset_dir.glob("*.parquet"), 
-                               key=lambda x: x.stat().st_mtime, 
-                               reverse=True)
+        The partitions written only replace the previous ones once the whole
+        dataset validated; the current-state table is then updated from the
+        files written. ``custom_processing`` sees one batch at a time.
         
-        if not parquet_files:
+        Args:
+            dataset_name: Name of the dataset to process
+            filters: Partition/row filters for the raw dataset
+            batch_size: Rows per batch (PROCESSING_BATCH_SIZE by default)
+            custom_processing: Custom processing function applied to each batch
+        
+        Returns:
+            Processing statistics
+        """
+        self.logger.info(f"Processing dataset: {dataset_name} in batches ({self.engine} engine)")
+        started = time.perf_counter()
+        processed_at = datetime.now()
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        config = self.processing_configs.get(dataset_name, {})
+        dataset_dir = self.input_dir / dataset_name
+        stats = {"status": "empty", "rows_read": 0, "rows_written": 0,
+                 "duplicates_removed": 0, "batches": 0}
+        
+        dataset = open_dataset(dataset_dir) if dataset_dir.exists() else None
+        if dataset is None:
+            self.logger.warning(f"No data found for {dataset_name}")
+            return stats
+        
+        # Without configured ids complete duplicates are removed, as in _remove_duplicates
+        id_columns = [col for col in config.get("id_columns", []) if col in dataset.schema.names]
+        keep = self._last_occurrences(dataset_dir, filters, batch_size, id_columns)
+        seen = None if config.get("id_columns") else []
+        
+        output_dir = self.output_dir / dataset_name
+        output_dir.mkdir(parents=True, exist_ok=True)
+        filename = f"{dataset_name}_processed_{processed_at.strftime('%Y%m%d_%H%M%S_%f')}.parquet"
+        writer = PartitionedDatasetWriter(output_dir, filename,
+                                          date_field=PARTITION_DATE_FIELDS.get(dataset_name),
+                                          replace=True)
+        missing_counts: Dict[str, int] = {}
+        date_failures: Dict[str, int] = {}
+        validation_counts: Dict[str, int] = {}
+        dtypes: Dict[str, str] = {}
+        memory_mb = 0.0
+        
+        try:
+            for df in iter_dataset(dataset_dir, filters=filters, batch_size=batch_size,
+                                   **self._read_options()):
+                rows = len(df)
+                df = self._clean_rows(df, config, missing_counts, date_failures)
+                if keep is not None:
+                    df = df[keep[stats["rows_read"]:stats["rows_read"] + rows]]
+                elif seen is not None:
+                    df = self._drop_seen(df, seen)
+                stats["rows_read"] += rows
+                stats["duplicates_removed"] += rows - len(df)
+                
+                if custom_processing:
+                    df = custom_processing(df)
+                if df.empty:
+                    continue
+                
+                df['_processed_at'] = processed_at
+                df['_processing_version'] = '1.0'
+                for check, count in self._validation_counts(df, config).items():
+                    validation_counts[check] = validation_counts.get(check, 0) + count
+                for col, dtype in df.dtypes.astype(str).items():
+                    dtypes.setdefault(col, dtype)
+                memory_mb = max(memory_mb, df.memory_usage(deep=True).sum() / (1024 * 1024))
+                
+                writer.write_frame(df)
+                stats["rows_written"] += len(df)
+                stats["batches"] += 1
+        except Exception:
+            writer.abort()
+            raise
+        
+        if keep is not None and stats["rows_read"] != len(keep):
+            writer.abort()
+            raise RuntimeError(f"Raw data of {dataset_name} changed while it was processed")
+        if stats["rows_read"] == 0:
+            writer.abort()
+            self.logger.warning(f"No data found for {dataset_name}")
+            return stats
+        
+        for col, missing in missing_counts.items():
+            self.logger.info(
+                f"Column {col} has {missing / stats['rows_read'] * 100:.1f}% missing values"
+            )
+        self._report_date_failures(date_failures)
+        if stats["duplicates_removed"]:
+            self.logger.info(f"Removed {stats['duplicates_removed']} duplicates")
+        
+        validation = self._validation_results(list(dtypes), stats["rows_written"],
+                                              validation_counts, config)
+        stats.update(validation=validation, output_dir=str(output_dir), columns=list(dtypes))
+        if not validation["is_valid"]:
+            writer.abort()
+            self.logger.error(f"Validation failed: {validation['issues']}")
+            stats["status"] = "invalid"
+            return stats
+        
+        written = writer.close()
+        self.logger.info(f"Saved processed data to {output_dir}")
+        stats["status"] = "success"
+        stats["current"] = self._upsert_files(dataset_name, output_dir, written,
+                                              list(dtypes), batch_size, config)
+        
+        info = {
+            "dataset": dataset_name,
+            "processed_at": datetime.now().isoformat(),
+            "engine": self.engine,
+            "processing_seconds": time.perf_counter() - started,
+            "batch_size": batch_size,
+            "memory_mb": memory_mb,
+            "row_count": stats["rows_written"],
+            "column_count": len(dtypes),
+            "columns": list(dtypes),
+            "dtypes": dtypes,
+            "date_parse_failures": date_failures,
+            "files": [str(f) for f in written],
+            "file_size_mb": sum(f.stat().st_size for f in written) / (1024 * 1024)
+        }
+        with open(output_dir / f".{Path(filename).stem}.info.json", 'w') as f:
+            json.dump(info, f, indent=2)
+        
+        return stats
+    
+    def _last_occurrences(
+        self,
+        dataset_dir: Path,
+        filters: Optional[List[Tuple[str, str, Any]]],
+        batch_size: int,
+        id_columns: List[str]
+    ) -> Optional[np.ndarray]:
+        """
+        Mask of the rows that are the last occurrence of their id.
+        
+        Only the id columns are read. Returns None if there are none to
+        deduplicate on.
+        """
+        if not id_columns:
             return None
         
-        latest_file = parquet_files[0]
-        self.logger.info(f"Loading data from {latest_file}")
+        hashes = [
+            key_hashes(df.assign(**{col: self._to_text(df[col]) for col in id_columns}),
+                       id_columns)
+            for df in iter_dataset(dataset_dir, filters=filters, columns=id_columns,
+                                   batch_size=batch_size, **self._read_options())
+        ]
+        hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.int64)
+        
+        # First occurrence in reversed order = last occurrence
+        _, first = np.unique(hashes[::-1], return_index=True)
+        keep = np.zeros(len(hashes), dtype=bool)
+        keep[len(hashes) - 1 - first] = True
+        return keep
+    
+    def _drop_seen(self, df: pd.DataFrame, seen: List[np.ndarray]) -> pd.DataFrame:
+        """
+        Drop complete duplicates of rows in this or earlier batches.
+        
+        ``seen`` holds the digests kept so far as sorted runs of decreasing
+        size (at most half the previous one, like a binomial heap): lookups
+        binary-search each of the O(log n) runs and every digest is merged
+        O(log n) times, instead of rebuilding one array per batch.
+        """
+        digests = row_digests(df, list(df.columns))
+        new = ~pd.Series(digests).duplicated().to_numpy()
+        for run in seen:
+            positions = np.searchsorted(run, digests).clip(max=len(run) - 1)
+            new &= run[positions] != digests
         
-        return pd.read_parquet(latest_file)
+        if new.any():
+            seen.append(np.sort(digests[new]))
+        while len(seen) > 1 and len(seen[-2]) <= 2 * len(seen[-1]):
+            last = seen.pop()
+            seen[-1] = np.union1d(seen[-1], last)
+        return df[new]
+    
+    def _upsert_files(
+        self,
+        dataset_name: str,
+        output_dir: Path,
+        files: List[Path],
+        columns: List[str],
+        batch_size: int,
+        config: Dict[str, Any]
+    ) -> Optional[Dict[str, int]]:
+        """Merge processed files into the current-state table, batch by batch."""
+        id_columns = [col for col in config.get("id_columns", []) if col in columns]
+        if not id_columns:
+            self.logger.warning(f"No id columns for {dataset_name}; current state not updated")
+            return None
+        
+        stats: Dict[str, int] = {}
+        with self.current_lock or nullcontext(), \
+                UpsertTable(self.current_dir / dataset_name, id_columns) as table:
+            for df in iter_dataset(output_dir, files=files, batch_size=batch_size,
+                                   **self._read_options()):
+                for key, count in table.upsert(df).items():
+                    stats[key] = stats.get(key, 0) + count
+            stats.update(table.get_stats())
+        
+        self.logger.info(f"Current state of {dataset_name}: {stats}")
+        return stats
+    
+    def upsert_current(
+        self,
+        dataset_name: str,
+        df: pd.DataFrame,
+        config: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, int]]:
+        """
+        Merge processed records into the dataset's current-state table.
+        
+        Records are keyed on the configured ``id_columns`` present in the data;
+        re-collected records that did not change are skipped, changed ones
+        replace their previous version (see UpsertTable).
+        
+        Returns:
+            Upsert statistics, or None if the dataset has no id columns
+        """
+        config = config or self.processing_configs.get(dataset_name, {})
+        id_columns = [col for col in config.get("id_columns", []) if col in df.columns]
+        if not id_columns:
+            self.logger.warning(f"No id columns for {dataset_name}; current state not updated")
+            return None
+        
+        with self.current_lock or nullcontext(), \
+                UpsertTable(self.current_dir / dataset_name, id_columns) as table:
+            stats = table.upsert(df)
+            stats.update(table.get_stats())
+        
+        self.logger.info(f"Current state of {dataset_name}: {stats}")
+        return stats
+    
+    def load_current(
+        self,
+        dataset_name: str,
+        filters: Optional[List[Tuple[str, str, Any]]] = None
+    ) -> Optional[pd.DataFrame]:
+        """Load the current-state table of a dataset (one row per record id)."""
+        table_dir = self.current_dir / dataset_name
+        if not (table_dir / ".index.sqlite3").exists():
+            return None
+        
+        with UpsertTable(table_dir) as table:
+            return table.read(filters=filters)
+    
+    def compact_data(self, target_rows: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Merge the small files of the processed datasets and current-state tables.
+        
+        Processed partitions are compacted into files of ``target_rows`` rows
+        sorted by date and id columns, keeping only the newest info JSON;
+        current-state tables have the delta files of each bucket merged.
+        
+        Args:
+            target_rows: Rows per compacted file (COMPACT_TARGET_ROWS by default)
+        
+        Returns:
+            Compaction statistics per dataset
+        """
+        compaction_stats = {}
+        
+        for dataset_dir in sorted(self.output_dir.iterdir()):
+            if not dataset_dir.is_dir() or dataset_dir.name.startswith('.'):
+                continue
+            
+            config = self.processing_configs.get(dataset_dir.name, {})
+            date_field = PARTITION_DATE_FIELDS.get(dataset_dir.name)
+            sort_by = ([date_field] if date_field else []) + config.get("id_columns", [])
+            stats = compact_dataset(dataset_dir, sort_by=sort_by, target_rows=target_rows)
+            
+            infos = sorted(dataset_dir.glob(".*.info.json"), key=lambda p: p.stat().st_mtime)
+            for info_file in infos[:-1]:
+                info_file.unlink()
+            stats["infos_removed"] = max(len(infos) - 1, 0)
+            
+            if stats["partitions"] or stats["infos_removed"]:
+                compaction_stats[dataset_dir.name] = stats
+        
+        if self.current_dir.exists():
+            for table_dir in sorted(self.current_dir.iterdir()):
+                if not (table_dir / ".index.sqlite3").exists():
+                    continue
+                with UpsertTable(table_dir) as table:
+                    stats = table.compact()
+                if stats["buckets"]:
+                    compaction_stats[f"current/{table_dir.name}"] = stats
+        
+        self.logger.info(f"Compaction completed: {compaction_stats}")
+        return compaction_stats
+    
+    def _load_raw_data(
+        self,
+        dataset_name: str,
+        filters: Optional[List[Tuple[str, str, Any]]] = None
+    ) -> Optional[pd.DataFrame]:
+        """Load the raw partitioned dataset, pruned to the partitions matching ``filters``."""
+        dataset_dir = self.input_dir / dataset_name
+        self.logger.info(f"Loading data from {dataset_dir} (filters: {filters})")
+        
+        return read_dataset(dataset_dir, filters=filters, **self._read_options())
+    
+    def _read_options(self) -> Dict[str, Any]:
+        """Parquet read options of the engine."""
+        return {"dtype_backend": "pyarrow"} if self.engine == "arrow" else {}
+    
+    def _to_text(self, values: pd.Series) -> pd.Series:
+        """Convert a column to strings, missing values as ''."""
+        if self.engine == "arrow":
+            return values.astype(ARROW_STRING).fillna('')
+        return values.astype(str).replace('nan', '')
+    
+    def _clean_rows(
+        self,
+        df: pd.DataFrame,
+        config: Dict[str, Any],
+        missing_counts: Optional[Dict[str, int]] = None,
+        date_failures: Optional[Dict[str, int]] = None
+    ) -> pd.DataFrame:
+        """Cleaning steps that work row by row (and so batch by batch)."""
+        df = self._standardize_data_types(df, config)
+        df = self._clean_text_fields(df, config.get("text_columns", []))
+        df = self._parse_dates(df, config.get("date_columns", []), date_failures)
+        df = self._clean_values(df, config.get("value_columns", []))
+        return self._handle_missing_values(df, missing_counts)
     
     def _standardize_data_types(self, df: pd.DataFrame, config: Dict[str, Any]) -> pd.DataFrame:
         """Standardize data types based on configuration."""
         # Ensure ID columns are strings
         for col in config.get("id_columns", []):
             if col in df.columns:
-                df[col] = df[col].astype(str).replace('nan', '')
+                df[col] = self._to_text(df[col])
         
         # Ensure text columns are strings
         for col in config.get("text_columns", []):
             if col in df.columns:
-                df[col] = df[col].astype(str).replace('nan', '')
+                df[col] = self._to_text(df[col])
         
         return df
     
@@ -187,23 +813,34 @@ class DataProcessor:
         
         return df
     
-    def _parse_dates(self, df: pd.DataFrame, date_columns: List[str]) -> pd.DataFrame:
-        """Parse and standardize date columns."""
+    def _parse_dates(
+        self,
+        df: pd.DataFrame,
+        date_columns: List[str],
+        date_failures: Optional[Dict[str, int]] = None
+    ) -> pd.DataFrame:
+        """
+        Parse and standardize date columns.
+        
+        Each column's format is detected from a sample and parsed with that
+        fixed format (see ``parse_dates``). Values that are not dates are
+        counted per column into ``date_failures`` if given, or logged.
+        """
         for col in date_columns:
             if col in df.columns:
-                # Try to parse dates
-                df[f'{col}_parsed'] = pd.to_datetime(df[col], errors='coerce')
+                # Parse with the column's detected format
+                parsed = parse_dates(df[col])
                 
-                # Log parsing errors
-                invalid_dates = df[df[f'{col}_parsed'].isna() & df[col].notna()]
-                if len(invalid_dates) > 0:
-                    self.logger.warning(
-                        f"Failed to parse {len(invalid_dates)} dates in column {col}"
-                    )
+                # Count parsing errors
+                failed = int((parsed.isna() & df[col].notna()).sum())
+                if failed > 0:
+                    if date_failures is None:
+                        self.logger.warning(f"Failed to parse {failed} dates in column {col}")
+                    else:
+                        date_failures[col] = date_failures.get(col, 0) + failed
                 
                 # Replace original column with parsed version
-                df[col] = df[f'{col}_parsed']
-                df.drop(f'{col}_parsed', axis=1, inplace=True)
+                df[col] = parsed
                 
                 # Extract date components for analysis
                 if df[col].notna().sum() > 0:
@@ -214,21 +851,17 @@ class DataProcessor:
         
         return df
     
+    def _report_date_failures(self, date_failures: Dict[str, int]) -> None:
+        """Log the values of each date column that could not be parsed."""
+        for col, failed in date_failures.items():
+            self.logger.warning(f"Failed to parse {failed} dates in column {col}")
+    
     def _clean_values(self, df: pd.DataFrame, value_columns: List[str]) -> pd.DataFrame:
         """Clean and standardize value columns."""
         for col in value_columns:
             if col in df.columns:
-                # Convert to string first for cleaning
-                df[col] = df[col].astype(str)
-                
-                # Remove currency symbols and formatting
-                df[col] = df[col].str.replace('R$', '', regex=False)
-                df[col] = df[col].str.replace('.', '', regex=False)  # Remove thousand separators
-                df[col] = df[col].str.replace(',', '.', regex=False)  # Convert decimal separator
-                df[col] = df[col].str.strip()
-                
-                # Convert to numeric
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+                # Parse "R$ 1.234,56" style amounts; numeric columns are kept as is
+                df[col] = parse_currency(df[col])
                 
                 # Check for negative values
                 negative_count = (df[col] < 0).sum()
@@ -241,25 +874,48 @@ class DataProcessor:
                 
         return df
     
-    def _handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Handle missing values based on column type."""
+    def _handle_missing_values(
+        self,
+        df: pd.DataFrame,
+        missing_counts: Optional[Dict[str, int]] = None
+    ) -> pd.DataFrame:
+        """
+        Handle missing values based on column type.
+        
+        With ``missing_counts`` (batch processing) the missing values of each
+        numeric column are added to it instead of being logged.
+        """
         # For numeric columns, optionally fill with 0 or median
-        numeric_columns = df.select_dtypes(include=[np.number]).columns
+        numeric_columns = [
+            col for col in df.columns
+            if pd.api.types.is_numeric_dtype(df[col].dtype)
+            and not pd.api.types.is_bool_dtype(df[col].dtype)
+        ]
         
         for col in numeric_columns:
-            missing_pct = df[col].isna().sum() / len(df) * 100
+            missing = df[col].isna().sum()
             
-            if missing_pct > 0:
-                self.logger.info(f"Column {col} has {missing_pct:.1f}% missing values")
+            if missing > 0:
+                if missing_counts is None:
+                    self.logger.info(
+                        f"Column {col} has {missing / len(df) * 100:.1f}% missing values"
+                    )
+                else:
+                    missing_counts[col] = missing_counts.get(col, 0) + int(missing)
                 
                 # For value columns, missing often means 0
                 if 'valor' in col.lower() or 'value' in col.lower():
-                    df[col].fillna(0, inplace=True)
+                    df[col] = df[col].fillna(0)
         
-        # For text columns, fill with empty string
-        text_columns = df.select_dtypes(include=['object']).columns
+        # For text columns, fill with empty string (nested records are left alone)
+        text_columns = [
+            col for col in df.columns
+            if df[col].dtype == ARROW_STRING or isinstance(df[col].dtype, pd.StringDtype)
+            or (df[col].dtype == object
+                and pd.api.types.infer_dtype(df[col], skipna=True) in ("string", "empty"))
+        ]
         for col in text_columns:
-            df[col].fillna('', inplace=True)
+            df[col] = df[col].fillna('')
         
         return df
     
@@ -291,6 +947,35 @@ class DataProcessor:
     
     def _validate_data(self, df: pd.DataFrame, config: Dict[str, Any]) -> Dict[str, Any]:
         """Validate processed data."""
+        return self._validation_results(list(df.columns), len(df),
+                                        self._validation_counts(df, config), config)
+    
+    def _validation_counts(self, df: pd.DataFrame, config: Dict[str, Any]) -> Dict[str, int]:
+        """Invalid values per check; counts of separate batches add up."""
+        counts = {}
+        
+        # Check date validity
+        for col in config.get("date_columns", []):
+            if col in df.columns:
+                counts[f"future dates in {col}"] = int(
+                    df[df[col] > pd.Timestamp.now()][col].notna().sum()
+                )
+        
+        # Check value validity
+        for col in config.get("value_columns", []):
+            if col in df.columns:
+                counts[f"negative values in {col}"] = int((df[col] < 0).sum())
+        
+        return counts
+    
+    def _validation_results(
+        self,
+        columns: List[str],
+        row_count: int,
+        counts: Dict[str, int],
+        config: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Validation results from the columns, row count and invalid value counts."""
         issues = []
         
         # Check for required columns
@@ -300,81 +985,99 @@ class DataProcessor:
             config.get("value_columns", [])
         )
         
-        missing_columns = [col for col in required_columns if col not in df.columns]
+        missing_columns = [col for col in required_columns if col not in columns]
         if missing_columns:
             issues.append(f"Missing required columns: {missing_columns}")
         
         # Check for empty DataFrame
-        if len(df) == 0:
+        if row_count == 0:
             issues.append("DataFrame is empty")
         
-        # Check date validity
-        for col in config.get("date_columns", []):
-            if col in df.columns:
-                future_dates = df[df[col] > pd.Timestamp.now()][col].notna().sum()
-                if future_dates > 0:
-                    issues.append(f"Found {future_dates} future dates in {col}")
-        
-        # Check value validity
-        for col in config.get("value_columns", []):
-            if col in df.columns:
-                negative_values = (df[col] < 0).sum()
-                if negative_values > 0:
-                    issues.append(f"Found {negative_values} negative values in {col}")
+        issues.extend(f"Found {count} {check}" for check, count in counts.items() if count > 0)
         
         return {
             "is_valid": len(issues) == 0,
             "issues": issues,
-            "row_count": len(df),
-            "column_count": len(df.columns)
+            "row_count": row_count,
+            "column_count": len(columns)
         }
     
-    def _save_processed_data(self, dataset_name: str, df: pd.DataFrame) -> Path:
-        """Save processed data to Parquet format."""
+    def _save_processed_data(self, dataset_name: str, df: pd.DataFrame,
+                             processing_seconds: Optional[float] = None,
+                             date_failures: Optional[Dict[str, int]] = None,
+                             replace: bool = True) -> Path:
+        """
+        Save processed data to the dataset's partitioned Parquet layout.
+        
+        Rows are partitioned like the raw data (year/month of the dataset's
+        date field and órgão); unless ``replace`` is False, the partitions
+        written replace their previous contents. Every other partition is
+        left untouched.
+        """
         # Create output directory
         output_dir = self.output_dir / dataset_name
         output_dir.mkdir(parents=True, exist_ok=True)
         
         # Generate filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"{dataset_name}_processed_{timestamp}.parquet"
-        output_path = output_dir / filename
         
         # Save to Parquet
-        df.to_parquet(
-            output_path,
-            engine='pyarrow',
-            compression='snappy',
-            index=False
-        )
+        with PartitionedDatasetWriter(output_dir, filename,
+                                      date_field=PARTITION_DATE_FIELDS.get(dataset_name),
+                                      replace=replace) as writer:
+            writer.write_frame(df)
         
-        # Also save data info
-        info_path = output_path.with_suffix('.info.json')
+        # Also save data info (hidden, so dataset readers only see Parquet files)
+        info_path = output_dir / f".{Path(filename).stem}.info.json"
         info = {
             "dataset": dataset_name,
             "processed_at": datetime.now().isoformat(),
+            "engine": self.engine,
+            "processing_seconds": processing_seconds,
+            "memory_mb": df.memory_usage(deep=True).sum() / (1024 * 1024),
             "row_count": len(df),
             "column_count": len(df.columns),
             "columns": list(df.columns),
             "dtypes": df.dtypes.astype(str).to_dict(),
-            "file_size_mb": output_path.stat().st_size / (1024 * 1024)
+            "date_parse_failures": date_failures or {},
+            "files": [str(f) for f in writer.written],
+            "file_size_mb": sum(f.stat().st_size for f in writer.written) / (1024 * 1024)
         }
         
-        import json
         with open(info_path, 'w') as f:
             json.dump(info, f, indent=2)
         
-        return output_path
+        return output_dir
     
     def process_all(
         self,
-        datasets: Optional[List[str]] = None
+        datasets: Optional[List[str]] = None,
+        batch_size: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        memory_budget_mb: Optional[int] = None,
+        incremental: bool = False
     ) -> Dict[str, Any]:
         """
         Process all available datasets.
         
+        With more than one worker, datasets are processed in a process pool.
+        Datasets too large for one worker's share of ``memory_budget_mb`` are
+        split into tasks over groups of órgão partitions (deduplicated within
+        each group; the current-state table stays one row per id). Tasks are
+        started largest first, and only while their estimated memory fits in
+        the budget next to the running ones, so two huge datasets never run
+        at once.
+        
         Args:
             datasets: List of dataset names to process (None for all)
+            batch_size: Process in batches of this many rows (see
+                ``process_dataset_streaming``) instead of loading each dataset
+            max_workers: Worker processes (PROCESSING_MAX_WORKERS by default)
+            memory_budget_mb: Memory to plan for across workers
+                (PROCESSING_MEMORY_MB by default)
+            incremental: Only process raw files not processed yet (see
+                ``process_incremental``); ``rows`` then counts the new rows
             
         Returns:
             Processing summary
@@ -383,27 +1086,27 @@ class DataProcessor:
         if datasets is None:
             datasets = [d.name for d in self.input_dir.iterdir() 
                        if d.is_dir() and not d.name.startswith('.')]
+        max_workers = max_workers or DEFAULT_MAX_WORKERS
         
-        results = {}
-        
-        for dataset in datasets:
-            self.logger.info(f"\nProcessing {dataset}...")
-            
-            try:
-                df = self.process_dataset(dataset)
-                
-                results[dataset] = {
-                    "status": "success",
-                    "rows": len(df),
-                    "columns": len(df.columns)
-                }
+        if max_workers > 1:
+            results = self._process_parallel(datasets, batch_size, max_workers,
+                                             memory_budget_mb or DEFAULT_MEMORY_BUDGET_MB,
+                                             incremental)
+        else:
+            results = {}
+            for dataset in datasets:
+                self.logger.info(f"\nProcessing {dataset}...")
                 
-            except Exception as e:
-                self.logger.error(f"Failed to process {dataset}: {e}")
-                results[dataset] = {
-                    "status": "failed",
-                    "error": str(e)
-                }
+                try:
+                    results[dataset] = self._process_task(dataset, batch_size=batch_size,
+                                                          incremental=incremental)
+                    
+                except Exception as e:
+                    self.logger.error(f"Failed to process {dataset}: {e}")
+                    results[dataset] = {
+                        "status": "failed",
+                        "error": str(e)
+                    }
         
         # Generate summary
         summary = {
@@ -414,4 +1117,163 @@ class DataProcessor:
             "results": results
         }
         
-        return summary
\ No newline at end of file
+        return summary
+    
+    def _process_task(
+        self,
+        dataset_name: str,
+        filters: Optional[Union[List[Tuple[str, str, Any]], ds.Expression]] = None,
+        batch_size: Optional[int] = None,
+        incremental: bool = False
+    ) -> Dict[str, Any]:
+        """Process (part of) a dataset into a process_all result."""
+        if incremental:
+            df = self.process_incremental(dataset_name)
+        elif batch_size:
+            stats = self.process_dataset_streaming(dataset_name, filters=filters,
+                                                   batch_size=batch_size)
+            return {
+                "status": "success",
+                "rows": stats["rows_written"],
+                "columns": len(stats.get("columns", []))
+            }
+        else:
+            df = self.process_dataset(dataset_name, filters=filters)
+        
+        return {
+            "status": "success",
+            "rows": len(df),
+            "columns": len(df.columns)
+        }
+    
+    def _plan_tasks(self, datasets: List[str], task_mb: float) -> List[Dict[str, Any]]:
+        """
+        Split datasets into tasks of about ``task_mb`` estimated memory.
+        
+        Datasets are split along órgão partitions, which map to the same
+        processed partitions whatever the dates, so tasks never write to the
+        same partition.
+        """
+        tasks = []
+        for dataset in datasets:
+            sizes = defaultdict(int)
+            dataset_dir = self.input_dir / dataset
+            for path in dataset_files(dataset_dir) if dataset_dir.exists() else []:
+                orgao = next((part.split("=", 1)[1] for part in path.relative_to(dataset_dir).parts
+                              if part.startswith("orgao_codigo=")), None)
+                orgao = None if orgao in (None, NULL_PARTITION) else unquote(orgao)
+                sizes[orgao] += path.stat().st_size
+            memory_mb = {orgao: size * MEMORY_PER_RAW_BYTE / (1024 * 1024)
+                         for orgao, size in sizes.items()}
+            
+            if sum(memory_mb.values()) <= task_mb or list(sizes) in ([], [None]):
+                tasks.append({"dataset": dataset, "filters": None,
+                              "memory_mb": sum(memory_mb.values())})
+                continue
+            
+            # First-fit of the largest órgãos into groups of at most task_mb
+            groups = []
+            for orgao in sorted(memory_mb, key=memory_mb.get, reverse=True):
+                group = next((g for g in groups if g["memory_mb"] + memory_mb[orgao] <= task_mb),
+                             None)
+                if group is None:
+                    group = {"orgaos": [], "memory_mb": 0.0}
+                    groups.append(group)
+                group["orgaos"].append(orgao)
+                group["memory_mb"] += memory_mb[orgao]
+            
+            for group in groups:
+                codes = [orgao for orgao in group["orgaos"] if orgao is not None]
+                expression = ds.field("orgao_codigo").isin(codes)
+                if None in group["orgaos"]:
+                    expression = expression | ds.field("orgao_codigo").is_null()
+                tasks.append({"dataset": dataset, "filters": expression,
+                              "memory_mb": group["memory_mb"]})
+        
+        return tasks
+    
+    def _process_parallel(
+        self,
+        datasets: List[str],
+        batch_size: Optional[int],
+        max_workers: int,
+        memory_budget_mb: int,
+        incremental: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """Run the tasks of ``_plan_tasks`` in a process pool; results merged per dataset."""
+        # Incremental runs share one manifest per dataset, so datasets are not split
+        task_mb = float("inf") if incremental else memory_budget_mb / max_workers
+        pending = sorted(self._plan_tasks(datasets, task_mb),
+                         key=lambda task: task["memory_mb"], reverse=True)
+        self.logger.info(
+            f"Processing {len(datasets)} datasets as {len(pending)} tasks "
+            f"on {max_workers} workers ({memory_budget_mb} MB budget)"
+        )
+        settings = {
+            "input_dir": str(self.input_dir),
+            "output_dir": str(self.output_dir),
+            "current_dir": str(self.current_dir),
+            "engine": self.engine
+        }
+        task_results = defaultdict(list)
+        
+        with Manager() as manager, ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # One lock per dataset serializes the merges into its current-state table
+            locks = {dataset: manager.Lock() for dataset in datasets}
+            running = {}
+            while pending or running:
+                used_mb = sum(task["memory_mb"] for task in running.values())
+                for task in list(pending):
+                    if len(running) >= max_workers:
+                        break
+                    if running and used_mb + task["memory_mb"] > memory_budget_mb:
+                        continue
+                    future = executor.submit(
+                        _run_task, settings, self.processing_configs,
+                        locks[task["dataset"]], task["dataset"], task["filters"], batch_size,
+                        incremental
+                    )
+                    running[future] = task
+                    used_mb += task["memory_mb"]
+                    pending.remove(task)
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        task_results[task["dataset"]].append(future.result())
+                    except Exception as e:
+                        self.logger.error(f"Failed to process {task['dataset']}: {e}")
+                        task_results[task["dataset"]].append({"status": "failed",
+                                                              "error": str(e)})
+        
+        results = {}
+        for dataset in datasets:
+            parts = task_results[dataset]
+            errors = [part["error"] for part in parts if part["status"] == "failed"]
+            if errors:
+                results[dataset] = {"status": "failed", "error": "; ".join(errors)}
+            else:
+                results[dataset] = {
+                    "status": "success",
+                    "rows": sum(part["rows"] for part in parts),
+                    "columns": max(part["columns"] for part in parts)
+                }
+        return results
+
+
+def _run_task(
+    settings: Dict[str, Any],
+    processing_configs: Dict[str, Dict[str, Any]],
+    current_lock: Any,
+    dataset_name: str,
+    filters: Optional[ds.Expression],
+    batch_size: Optional[int],
+    incremental: bool
+) -> Dict[str, Any]:
+    """Process-pool entry point of DataProcessor.process_all."""
+    processor = DataProcessor(**settings)
+    processor.processing_configs = processing_configs
+    processor.current_lock = current_lock
+    return processor._process_task(dataset_name, filters=filters, batch_size=batch_size,
+                                   incremental=incremental)
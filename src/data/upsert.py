@@ -0,0 +1,403 @@
+"""
+Current-state tables: records upserted by key across incremental runs.
+"""
+
+import os
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.data.dataset import PARTITION_COLUMNS, read_dataset
+from src.data.writer import StreamingParquetWriter
+
+
+# Hash buckets of a new table (fixed once the table exists)
+DEFAULT_BUCKETS = int(os.getenv("UPSERT_BUCKETS", "32"))
+
+# Hidden column holding each row's key hash
+KEY_COLUMN = "_key"
+
+
+def key_hashes(df: pd.DataFrame, id_columns: List[str]) -> np.ndarray:
+    """64-bit hash of each row's id columns (compared as strings)."""
+    hashes = pd.util.hash_pandas_object(df[id_columns].astype(str), index=False)
+    return hashes.to_numpy().view(np.int64)
+
+
+def _key_idents(df: pd.DataFrame, id_columns: List[str]) -> pd.Series:
+    """Each row's id columns as one string, to tell apart keys whose hashes collide."""
+    text = df[id_columns].astype(str)
+    return text[id_columns[0]].str.cat([text[col] for col in id_columns[1:]], sep="\x1f")
+
+
+def _flatten_structs(frame: pd.DataFrame) -> pd.DataFrame:
+    """Replace Arrow struct columns by one column per (nested) field."""
+    structs = [col for col in frame.columns
+               if isinstance(frame[col].dtype, pd.ArrowDtype)
+               and pa.types.is_struct(frame[col].dtype.pyarrow_dtype)]
+    if not structs:
+        return frame
+    
+    table = pa.table({col: pa.array(frame[col]) for col in structs})
+    while any(pa.types.is_struct(field.type) for field in table.schema):
+        table = table.flatten()
+    fields = table.to_pandas(types_mapper=pd.ArrowDtype)
+    fields.index = frame.index
+    return pd.concat([frame.drop(columns=structs), fields], axis=1)
+
+
+def row_digests(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """64-bit hash of each row's content in ``columns``."""
+    # Arrow structs are hashed field by field, without building Python dicts
+    frame = _flatten_structs(df[columns])
+    frame = frame[sorted(frame.columns)].copy()
+    for col in frame.columns:
+        dtype = frame[col].dtype
+        if dtype == object or (isinstance(dtype, pd.ArrowDtype)
+                               and pa.types.is_nested(dtype.pyarrow_dtype)):
+            # Nested records/lists are not hashable; compare their JSON form
+            frame[col] = frame[col].astype(object).map(
+                lambda v: json.dumps(v, sort_keys=True, default=str)
+                if isinstance(v, (dict, list, np.ndarray)) else v
+            )
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view(np.int64)
+
+
+class UpsertTable:
+    """
+    Compacted current-state table: one row per key, latest version wins.
+    
+    Rows are spread over hash buckets of their key (``id_columns``). A SQLite
+    index next to the data (``.index.sqlite3``) maps every key hash to the
+    digest of its current content and its bucket, and lists the live data
+    files. Merging a batch therefore only looks up the batch's own keys:
+    
+    - rows whose content is unchanged (the overlap re-fetched by incremental
+      runs) are skipped without touching any data file;
+    - new keys are appended as a small file in their bucket;
+    - updated keys are dropped from the files of their bucket that hold them,
+      found by reading only the key column. Those files are rewritten in
+      full, so an update costs about ``rows / buckets`` rows read and written
+      once ``compact`` has merged a bucket into one file; tables with many
+      updates should use more buckets (UPSERT_BUCKETS).
+    
+    The index also stores each key's id values: a 64-bit hash shared by two
+    different keys is detected and raises instead of overwriting a record.
+    
+    New files are written first and the index is switched to them in one
+    transaction, so a crash mid-merge leaves the previous state readable;
+    unreferenced files are removed on the next merge. Tables assume a
+    single writer at a time.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS keys (
+            key INTEGER PRIMARY KEY,
+            digest INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            ident TEXT
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            bucket INTEGER NOT NULL,
+            rows INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+    
+    def __init__(
+        self,
+        base_dir: Union[str, Path],
+        id_columns: Optional[List[str]] = None,
+        buckets: Optional[int] = None
+    ):
+        """
+        Open (or create) a current-state table.
+        
+        Args:
+            base_dir: Directory holding the table
+            id_columns: Columns identifying a record (those of the existing
+                table if omitted)
+            buckets: Hash buckets for a new table (UPSERT_BUCKETS by default)
+        
+        Raises:
+            ValueError: If the table was built with different id columns, or
+                a new table is opened without id columns
+        """
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        
+        self.conn = sqlite3.connect(str(self.base_dir / ".index.sqlite3"), isolation_level=None)
+        self.conn.executescript(self.SCHEMA)
+        
+        # Tables created before keys stored their id values (those are not checked)
+        if "ident" not in [row[1] for row in self.conn.execute("PRAGMA table_info(keys)")]:
+            self.conn.execute("ALTER TABLE keys ADD COLUMN ident TEXT")
+        
+        meta = dict(self.conn.execute("SELECT name, value FROM meta"))
+        if not meta:
+            if not id_columns:
+                self.conn.close()
+                raise ValueError(f"Table {self.base_dir} does not exist; id columns required")
+            meta = {"id_columns": json.dumps(list(id_columns)),
+                    "buckets": str(buckets or DEFAULT_BUCKETS)}
+            self.conn.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+        elif id_columns is not None and json.loads(meta["id_columns"]) != list(id_columns):
+            self.conn.close()
+            raise ValueError(
+                f"Table {self.base_dir} is keyed on {json.loads(meta['id_columns'])}, "
+                f"not {list(id_columns)}"
+            )
+        self.id_columns = json.loads(meta["id_columns"])
+        self.buckets = int(meta["buckets"])
+    
+    def __enter__(self) -> "UpsertTable":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        """Close the index."""
+        self.conn.close()
+    
+    def files(self, bucket: Optional[int] = None) -> List[Path]:
+        """Live data files (of one bucket, if given)."""
+        if bucket is None:
+            rows = self.conn.execute("SELECT path FROM files ORDER BY path")
+        else:
+            rows = self.conn.execute("SELECT path FROM files WHERE bucket = ? ORDER BY path",
+                                     (bucket,))
+        return [self.base_dir / path for (path,) in rows]
+    
+    def _remove_orphans(self) -> None:
+        """Delete data files left behind by an interrupted merge."""
+        live = set(self.files())
+        for path in self.base_dir.glob("bucket-*.parquet"):
+            if path not in live:
+                self.logger.info(f"Removing unreferenced file {path}")
+                path.unlink()
+        for path in self.base_dir.glob(".bucket-*.tmp"):
+            path.unlink()
+    
+    def _classify(self, keys: np.ndarray, digests: np.ndarray, buckets: np.ndarray,
+                  idents: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (known, unchanged) masks for a batch by joining it with the index.
+        
+        Raises:
+            RuntimeError: If a key hash already belongs to different id values
+        """
+        self.conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS incoming "
+            "(key INTEGER PRIMARY KEY, digest INTEGER, bucket INTEGER, ident TEXT)"
+        )
+        self.conn.execute("BEGIN")
+        self.conn.execute("DELETE FROM incoming")
+        self.conn.executemany("INSERT INTO incoming VALUES (?, ?, ?, ?)",
+                              zip(keys.tolist(), digests.tolist(), buckets.tolist(),
+                                  idents.tolist()))
+        existing = dict(self.conn.execute(
+            "SELECT i.key, k.digest FROM incoming i JOIN keys k ON k.key = i.key"
+        ))
+        collision = self.conn.execute(
+            "SELECT i.ident, k.ident FROM incoming i JOIN keys k ON k.key = i.key "
+            "WHERE k.ident IS NOT NULL AND k.ident != i.ident LIMIT 1"
+        ).fetchone()
+        self.conn.execute("COMMIT")
+        if collision is not None:
+            raise RuntimeError(
+                f"Key hash collision in {self.base_dir}: {collision[0]!r} and {collision[1]!r}"
+            )
+        
+        known = np.fromiter((k in existing for k in keys.tolist()), dtype=bool, count=len(keys))
+        old = np.fromiter((existing.get(k, 0) for k in keys.tolist()), dtype=np.int64,
+                          count=len(keys))
+        return known, known & (old == digests)
+    
+    def upsert(self, df: pd.DataFrame) -> Dict[str, int]:
+        """
+        Merge a batch of records; the last row of a key in the batch wins.
+        
+        Returns:
+            Counts of inserted, updated and unchanged rows and files written
+        """
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0, "files_written": 0}
+        missing = [col for col in self.id_columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing id columns: {missing}")
+        if df.empty:
+            return stats
+        
+        self._remove_orphans()
+        
+        df = df.drop(columns=[c for c in PARTITION_COLUMNS + [KEY_COLUMN] if c in df.columns])
+        df = df.assign(**{KEY_COLUMN: key_hashes(df, self.id_columns)})
+        idents = _key_idents(df, self.id_columns).to_numpy()
+        repeated = df[KEY_COLUMN].duplicated(keep=False).to_numpy()
+        if repeated.any() and (
+            pd.Series(idents[repeated]).groupby(df[KEY_COLUMN].to_numpy()[repeated]).nunique() > 1
+        ).any():
+            raise RuntimeError(f"Key hash collision between rows of the batch for {self.base_dir}")
+        latest = ~df[KEY_COLUMN].duplicated(keep="last").to_numpy()
+        df, idents = df[latest], idents[latest]
+        
+        # Content excludes metadata such as _collected_at / _processed_at
+        content = [col for col in df.columns if not col.startswith("_")]
+        keys = df[KEY_COLUMN].to_numpy()
+        digests = row_digests(df, content)
+        buckets = keys % self.buckets
+        
+        known, unchanged = self._classify(keys, digests, buckets, idents)
+        stats["unchanged"] = int(unchanged.sum())
+        stats["updated"] = int((known & ~unchanged).sum())
+        stats["inserted"] = int((~known).sum())
+        
+        changed = ~unchanged
+        if not changed.any():
+            return stats
+        
+        # Write the new files before anything references them
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        updated_keys = keys[known & ~unchanged]
+        new_files, superseded = [], []
+        try:
+            for bucket in np.unique(buckets[changed]).tolist():
+                rows = df[changed & (buckets == bucket)]
+                writer = StreamingParquetWriter(
+                    self.base_dir / f"bucket-{bucket:03d}-{stamp}.parquet"
+                )
+                
+                stale = updated_keys[updated_keys % self.buckets == bucket]
+                if len(stale):
+                    # Rewrite only the files holding superseded versions, without them
+                    stale = pa.array(stale, type=pa.int64())
+                    for path in self.files(bucket):
+                        file_keys = pq.read_table(path, columns=[KEY_COLUMN])[KEY_COLUMN]
+                        if not pc.any(pc.is_in(file_keys, value_set=stale)).as_py():
+                            continue
+                        table = pq.read_table(path)
+                        writer.write_table(
+                            table.filter(pc.invert(pc.is_in(table[KEY_COLUMN], value_set=stale)))
+                        )
+                        superseded.append(path)
+                
+                writer.write_table(pa.Table.from_pandas(rows, preserve_index=False))
+                new_files.append((writer.close(), bucket, writer.rows_written))
+        except Exception:
+            for path, _, _ in new_files:
+                path.unlink(missing_ok=True)
+            raise
+        
+        # Switch the index to the new state atomically
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO keys (key, digest, bucket, ident) VALUES (?, ?, ?, ?)",
+                zip(keys[changed].tolist(), digests[changed].tolist(),
+                    buckets[changed].tolist(), idents[changed].tolist())
+            )
+            self.conn.executemany("DELETE FROM files WHERE path = ?",
+                                  [(path.name,) for path in superseded])
+            self.conn.executemany("INSERT INTO files (path, bucket, rows) VALUES (?, ?, ?)",
+                                  [(path.name, bucket, rows) for path, bucket, rows in new_files])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        
+        for path in superseded:
+            path.unlink(missing_ok=True)
+        
+        stats["files_written"] = len(new_files)
+        self.logger.info(
+            f"Upserted into {self.base_dir}: {stats['inserted']} inserted, "
+            f"{stats['updated']} updated, {stats['unchanged']} unchanged"
+        )
+        return stats
+    
+    def compact(self, min_files: int = 2) -> Dict[str, int]:
+        """
+        Merge the delta files of each bucket into one file sorted by key.
+        
+        Args:
+            min_files: Files a bucket needs to be compacted
+        
+        Returns:
+            Counts of buckets compacted and files removed
+        """
+        stats = {"buckets": 0, "files_removed": 0}
+        self._remove_orphans()
+        
+        rows = self.conn.execute(
+            "SELECT bucket FROM files GROUP BY bucket HAVING COUNT(*) >= ? ORDER BY bucket",
+            (min_files,)
+        )
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        for (bucket,) in rows.fetchall():
+            old = self.files(bucket)
+            table = pa.concat_tables(
+                [pq.read_table(path) for path in old], promote_options="permissive"
+            )
+            sort_keys = [(col, "ascending") for col in self.id_columns if col in table.column_names]
+            
+            with StreamingParquetWriter(
+                self.base_dir / f"bucket-{bucket:03d}-{stamp}.parquet"
+            ) as writer:
+                writer.write_table(table.sort_by(sort_keys))
+            new = writer.path
+            
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM files WHERE bucket = ?", (bucket,))
+                self.conn.execute("INSERT INTO files (path, bucket, rows) VALUES (?, ?, ?)",
+                                  (new.name, bucket, writer.rows_written))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                new.unlink(missing_ok=True)
+                raise
+            
+            for path in old:
+                path.unlink(missing_ok=True)
+            stats["buckets"] += 1
+            stats["files_removed"] += len(old)
+        
+        if stats["buckets"]:
+            self.logger.info(f"Compacted {stats['buckets']} buckets of {self.base_dir}")
+        return stats
+    
+    def read(
+        self,
+        filters: Optional[List[Tuple[str, str, Any]]] = None,
+        columns: Optional[List[str]] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Read the current state (one row per key).
+        
+        Returns:
+            DataFrame, or None if the table is empty
+        """
+        df = read_dataset(self.base_dir, filters=filters, columns=columns, files=self.files())
+        if df is not None and KEY_COLUMN in df.columns and (columns is None
+                                                             or KEY_COLUMN not in columns):
+            df = df.drop(columns=[KEY_COLUMN])
+        return df
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Return key, file and bucket counts."""
+        keys = self.conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+        files = self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        return {"keys": keys, "files": files, "buckets": self.buckets}
@@ -0,0 +1,226 @@
+"""
+Streaming Parquet writer for paged API data.
+"""
+
+import os
+import logging
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Union
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Rows buffered before a row group is written
+DEFAULT_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "100000"))
+
+
+def conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Cast ``table`` to ``schema``, adding null columns for missing fields.
+    
+    ``schema`` must be a superset of the table's schema as produced by
+    ``pa.unify_schemas(..., promote_options="permissive")``.
+    """
+    if table.schema.equals(schema):
+        return table
+    
+    try:
+        columns = [
+            table.column(field.name).cast(field.type) if field.name in table.column_names
+            else pa.nulls(len(table), field.type)
+            for field in schema
+        ]
+        return pa.Table.from_arrays(columns, schema=schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # Older pyarrow cannot cast structs that gained fields; go through Python
+        return pa.Table.from_pylist(table.to_pylist(), schema=schema)
+
+
+class StreamingParquetWriter:
+    """
+    Append pages of records to a Parquet file without holding the dataset in memory.
+    
+    Pages are converted to Arrow as they arrive and buffered until
+    ``row_group_size`` rows are available, then written as one row group.
+    Without an explicit ``schema`` the file schema is inferred from the pages
+    buffered before the first row group. If a later page brings new columns
+    or wider types, the rows already written are rewritten once under the
+    unified schema, so nothing is dropped or mis-typed.
+    
+    Data goes to a hidden temporary file next to ``path`` that is renamed
+    into place by ``close``; readers never see a partial file, and ``abort``
+    (or an exception inside a ``with`` block) removes it.
+    
+    Example:
+        with StreamingParquetWriter(path, constants={"_endpoint": pa.scalar("orgaos")}) as writer:
+            for page in pages:
+                writer.write(page)
+    """
+    
+    def __init__(
+        self,
+        path: Union[str, Path],
+        schema: Optional[pa.Schema] = None,
+        row_group_size: Optional[int] = None,
+        compression: str = "snappy",
+        constants: Optional[Dict[str, pa.Scalar]] = None,
+        metadata: Optional[Dict[str, str]] = None
+    ):
+        """
+        Initialize writer.
+        
+        Args:
+            path: Final output file
+            schema: Schema of the records (inferred from the first pages if omitted)
+            row_group_size: Rows per row group (PARQUET_ROW_GROUP_SIZE by default)
+            compression: Parquet compression codec
+            constants: Columns appended to every row with a fixed value
+            metadata: Key-value metadata stored in the file's schema
+        """
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        self.schema = schema.remove_metadata() if schema is not None else None
+        self.row_group_size = row_group_size or DEFAULT_ROW_GROUP_SIZE
+        self.compression = compression
+        self.constants = constants or {}
+        self.metadata = metadata
+        
+        self.logger = logging.getLogger(__name__)
+        self.writer: Optional[pq.ParquetWriter] = None
+        self.buffer: List[pa.Table] = []
+        self.buffered_rows = 0
+        self.rows_written = 0
+        self.row_groups = 0
+        self.rewrites = 0
+    
+    def __enter__(self) -> "StreamingParquetWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+    
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        """Append a page of records."""
+        if not records:
+            return
+        
+        # Infer the page's own schema: converting straight to the file schema
+        # would silently drop keys (including nested ones) it does not know
+        self.write_table(pa.Table.from_pylist(records))
+    
+    def write_table(self, table: pa.Table) -> None:
+        """Append an Arrow table of records."""
+        if len(table) == 0:
+            return
+        
+        if table.schema.metadata:
+            # pandas metadata of Arrow-backed frames names dtypes that
+            # ``to_pandas()`` cannot resolve; column types are all we need
+            table = table.replace_schema_metadata(None)
+        
+        if self.schema is None:
+            self.schema = table.schema
+        else:
+            schema = pa.unify_schemas([self.schema, table.schema], promote_options="permissive")
+            if not schema.equals(self.schema):
+                self._evolve(schema)
+        
+        self.buffer.append(table)
+        self.buffered_rows += len(table)
+        if self.buffered_rows >= self.row_group_size:
+            self.flush(final=False)
+    
+    def _file_schema(self, schema: pa.Schema) -> pa.Schema:
+        """Record schema plus the constant columns and the file metadata."""
+        for name, value in self.constants.items():
+            schema = schema.append(pa.field(name, value.type))
+        return schema.with_metadata(self.metadata) if self.metadata else schema
+    
+    def flush(self, final: bool = True) -> None:
+        """
+        Write buffered pages as row groups of ``row_group_size`` rows.
+        
+        Unless ``final``, a remainder smaller than a row group stays buffered
+        so pages never produce undersized row groups mid-file.
+        """
+        if not self.buffer:
+            return
+        
+        table = pa.concat_tables([conform_table(t, self.schema) for t in self.buffer])
+        rows = len(table) if final else len(table) // self.row_group_size * self.row_group_size
+        remainder = table.slice(rows)
+        self.buffer = [remainder] if len(remainder) else []
+        self.buffered_rows = len(remainder)
+        if rows == 0:
+            return
+        table = table.slice(0, rows)
+        
+        for name, value in self.constants.items():
+            table = table.append_column(name, pa.array([value.as_py()] * len(table),
+                                                       type=value.type))
+        
+        if self.writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = pq.ParquetWriter(self.tmp_path, self._file_schema(self.schema),
+                                           compression=self.compression)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += len(table)
+        self.row_groups += -(-len(table) // self.row_group_size)
+    
+    def _evolve(self, schema: pa.Schema) -> None:
+        """Switch to a wider schema, rewriting row groups already on disk."""
+        self.schema = schema
+        if self.writer is None:
+            # Nothing written yet; buffered pages are conformed at flush
+            return
+        
+        self.logger.info(f"Schema of {self.path.name} evolved; rewriting {self.rows_written} rows")
+        self.writer.close()
+        old_path = self.tmp_path.with_name(self.tmp_path.name + ".old")
+        os.replace(self.tmp_path, old_path)
+        
+        file_schema = self._file_schema(schema)
+        self.writer = pq.ParquetWriter(self.tmp_path, file_schema, compression=self.compression)
+        try:
+            source = pq.ParquetFile(old_path)
+            for i in range(source.num_row_groups):
+                self.writer.write_table(conform_table(source.read_row_group(i), file_schema),
+                                        row_group_size=self.row_group_size)
+            source.close()
+        finally:
+            old_path.unlink(missing_ok=True)
+        self.rewrites += 1
+    
+    def close(self) -> Optional[Path]:
+        """
+        Flush remaining rows and move the file into place.
+        
+        Returns:
+            Path of the written file, or None if no rows were written
+        """
+        self.flush()
+        if self.writer is None:
+            return None
+        
+        self.writer.close()
+        self.writer = None
+        with open(self.tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(self.tmp_path, self.path)
+        
+        self.logger.debug(
+            f"Wrote {self.rows_written} rows in {self.row_groups} row groups to {self.path}"
+        )
+        return self.path
+    
+    def abort(self) -> None:
+        """Discard everything written so far."""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.buffer = []
+        self.buffered_rows = 0
+        self.tmp_path.unlink(missing_ok=True)
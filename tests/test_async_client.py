@@ -0,0 +1,312 @@
+"""
+Unit tests for AsyncTransparenciaAPIClient with mocked requests.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from urllib.parse import urljoin
+from unittest.mock import AsyncMock, patch
+
+import aiohttp
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.api.async_client import AsyncTransparenciaAPIClient, NOT_MODIFIED
+from src.api.client import CacheManager
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """Create async client instance with mocked environment."""
+    monkeypatch.setenv("TRANSPARENCIA_API_TOKEN", "test_token")
+    monkeypatch.setenv("TRANSPARENCIA_API_EMAIL", "test@email.com")
+    monkeypatch.setenv("CACHE_ENABLED", "false")
+    monkeypatch.setenv("API_RATE_BURST", "100")
+
+    original_init = CacheManager.__init__
+    monkeypatch.setattr("src.api.async_client.CacheManager.__init__",
+                        lambda self, **kwargs: original_init(
+                            self, cache_dir=str(tmp_path / "cache"), ttl=3600))
+    return AsyncTransparenciaAPIClient(max_concurrency=3)
+
+
+class TestAsyncTransparenciaAPIClient:
+    """Test AsyncTransparenciaAPIClient class."""
+
+    def test_client_initialization_without_token(self, monkeypatch):
+        """Test client initialization fails without token."""
+        monkeypatch.delenv("TRANSPARENCIA_API_TOKEN", raising=False)
+
+        with pytest.raises(ValueError, match="TRANSPARENCIA_API_TOKEN not found"):
+            AsyncTransparenciaAPIClient()
+
+    def test_get_contratos(self, client):
+        """Test get_contratos awaits the shared request path."""
+        expected_data = [{"contrato": "123"}]
+
+        with patch.object(client, "_make_request", AsyncMock(return_value=expected_data)) as mock:
+            result = asyncio.run(client.get_contratos(ano=2023))
+
+        assert result == expected_data
+        mock.assert_awaited_once_with("/contratos", {"ano": 2023})
+
+    def test_concurrency_is_bounded(self, client):
+        """Test no more than max_concurrency requests are in flight."""
+        in_flight = 0
+        peak = 0
+
+        async def fake_fetch(session, url, params, stale=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return [{"pagina": params["pagina"]}], {}
+
+        async def run():
+            async with client:
+                return await client.fetch_pages(client.get_pagamentos, list(range(1, 11)))
+
+        with patch.object(client, "_fetch", side_effect=fake_fetch):
+            with patch.object(client.rate_limiter, "wait_if_needed", AsyncMock(return_value=0.0)):
+                results = asyncio.run(run())
+
+        assert [r[0]["pagina"] for r in results] == list(range(1, 11))
+        assert peak == 3
+
+    def test_retry_on_server_error(self, client):
+        """Test transient errors are retried."""
+        calls = []
+
+        async def fake_fetch(session, url, params, stale=None):
+            calls.append(params)
+            if len(calls) == 1:
+                raise asyncio.TimeoutError()
+            return [{"id": 1}], {}
+
+        async def run():
+            async with client:
+                return await client.get_orgaos()
+
+        with patch.object(client, "_fetch", side_effect=fake_fetch):
+            with patch.object(client.rate_limiter, "wait_if_needed", AsyncMock(return_value=0.0)):
+                with patch("src.api.async_client.asyncio.sleep", AsyncMock()):
+                    result = asyncio.run(run())
+
+        assert result == [{"id": 1}]
+        assert len(calls) == 2
+
+    def test_not_modified_reuses_cached_body(self, client, monkeypatch):
+        """Test a 304 renews the stale entry instead of downloading it again."""
+        monkeypatch.setattr(client.cache, "enabled", True)
+        client.cache.set(urljoin(client.BASE_URL, "/orgaos-siafi"), {}, [{"id": 1}], etag='"v1"')
+        client.cache.ttl = 0
+        seen = []
+
+        async def fake_fetch(session, url, params, stale=None):
+            seen.append(stale.conditional_headers())
+            return NOT_MODIFIED, {"etag": '"v1"', "last_modified": None}
+
+        async def run():
+            async with client:
+                return await client.get_orgaos()
+
+        with patch.object(client, "_fetch", side_effect=fake_fetch):
+            with patch.object(client.rate_limiter, "wait_if_needed", AsyncMock(return_value=0.0)):
+                result = asyncio.run(run())
+
+        assert result == [{"id": 1}]
+        assert seen == [{"If-None-Match": '"v1"'}]
+        assert client.cache.revalidated == 1
+
+    def test_cache_io_runs_off_the_event_loop(self, client, monkeypatch):
+        """Test disk-backed cache calls do not run on the event loop thread."""
+        import threading
+
+        threads = {}
+        for name in ("get", "get_stale", "set"):
+            original = getattr(client.cache, name)
+
+            def record(*args, _name=name, _original=original, **kwargs):
+                threads[_name] = threading.get_ident()
+                return _original(*args, **kwargs)
+
+            monkeypatch.setattr(client.cache, name, record)
+
+        async def fake_fetch(session, url, params, stale=None):
+            return [{"id": 1}], {}
+
+        async def run():
+            async with client:
+                await client.get_orgaos()
+            return threading.get_ident()
+
+        with patch.object(client, "_fetch", side_effect=fake_fetch):
+            loop_thread = asyncio.run(run())
+
+        assert set(threads) == {"get", "get_stale", "set"}
+        assert loop_thread not in threads.values()
+
+    def test_close_closes_the_cache(self, client):
+        """Test closing the client also closes the cache database."""
+        asyncio.run(client.close())
+
+        assert client.cache.backend._conn is None
+
+    def test_retry_delay_honours_retry_after(self, client):
+        """Test a 429 waits for Retry-After instead of the default backoff."""
+        throttled = aiohttp.ClientResponseError(None, (), status=429,
+                                                headers={"Retry-After": "7"})
+        server_error = aiohttp.ClientResponseError(None, (), status=503)
+
+        # The adaptive controller pauses the bucket itself
+        assert client._retry_delay(throttled, attempt=0) == 0
+        client.rate_controller = None
+        assert client._retry_delay(throttled, attempt=0) == 7
+        assert client._retry_delay(server_error, attempt=2) == 4
+
+    def test_throttled_request_waits_once(self, client):
+        """Test a 429 waits for Retry-After once, through the paused bucket."""
+        import time
+        responses = [429, 200]
+        sleeps = []
+        real_sleep = asyncio.sleep
+
+        async def recording_sleep(delay, *args, **kwargs):
+            sleeps.append(delay)
+            return await real_sleep(delay, *args, **kwargs)
+
+        async def fake_fetch(session, url, params, stale=None):
+            status = responses.pop(0)
+            client.rate_controller.on_response(status, {"Retry-After": "0.3"})
+            if status == 429:
+                raise aiohttp.ClientResponseError(None, (), status=429,
+                                                  headers={"Retry-After": "0.3"})
+            return [{"id": 1}], {}
+
+        async def run():
+            try:
+                return await client._request("/test", "http://test", {})
+            finally:
+                await client.close()
+
+        start = time.monotonic()
+        with patch.object(client, "_fetch", side_effect=fake_fetch), \
+                patch.object(asyncio, "sleep", recording_sleep):
+            data = asyncio.run(run())
+        elapsed = time.monotonic() - start
+
+        assert data == [{"id": 1}]
+        # Bucket token, no separate Retry-After sleep, then the paused bucket
+        assert sleeps[:2] == [0, 0]
+        assert sleeps[2] == pytest.approx(0.3, abs=0.05)
+        assert 0.25 <= elapsed < 0.5
+
+    def test_responses_drive_the_adaptive_quota(self, client):
+        """Test 429s and rate headers adjust the quota shared by both limiters."""
+        class FakeResponse:
+            def __init__(self, status, headers):
+                self.status = status
+                self.headers = headers
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def raise_for_status(self):
+                if self.status >= 400:
+                    raise aiohttp.ClientResponseError(None, (), status=self.status)
+
+            async def json(self, content_type=None):
+                return [{"id": 1}]
+
+        class FakeSession:
+            def __init__(self, responses):
+                self.responses = responses
+
+            def get(self, url, params=None, headers=None):
+                return self.responses.pop(0)
+
+        session = FakeSession([FakeResponse(429, {"Retry-After": "0"}),
+                               FakeResponse(200, {"X-Rate-Limit-Remaining": "350"})])
+
+        async def run():
+            with pytest.raises(aiohttp.ClientResponseError):
+                await client._fetch(session, "http://test", {})
+            return await client._fetch(session, "http://test", {})
+
+        data, _ = asyncio.run(run())
+
+        assert data == [{"id": 1}]
+        assert client.rate_controller.get_stats()["throttled"] == 1
+        assert client.rate_bucket.max_calls == 16  # 30 halved, then +1 with headroom
+        assert client.rate_limiter.get_current_limit() == 16
+
+    def test_paginate_stops_on_empty_page(self, client):
+        """Test pagination stops at the first empty page."""
+        pages = {1: [{"id": 1}], 2: [{"id": 2}], 3: [{"id": 3}], 4: [{"id": 4}]}
+
+        async def fake_method(**params):
+            return pages.get(params["pagina"], [])
+
+        result = asyncio.run(client.paginate(fake_method, page_size=1))
+
+        assert result == [{"id": 1}, {"id": 2}, {"id": 3}, {"id": 4}]
+
+    def test_paginate_respects_max_pages(self, client):
+        """Test pagination honours max_pages."""
+        async def fake_method(**params):
+            return [{"id": params["pagina"]}]
+
+        result = asyncio.run(client.paginate(fake_method, max_pages=5, page_size=1))
+
+        assert [r["id"] for r in result] == [1, 2, 3, 4, 5]
+
+    def test_paginate_keeps_pages_before_a_failure(self, client):
+        """Test a failed page keeps the batch's earlier pages and cancels the later ones."""
+        cancelled = []
+
+        async def fake_method(**params):
+            page = params["pagina"]
+            if page == 5:
+                raise ConnectionError("boom")
+            try:
+                await asyncio.sleep(1 if page == 6 else 0)
+            except asyncio.CancelledError:
+                cancelled.append(page)
+                raise
+            return [{"id": page}]
+
+        result = asyncio.run(client.paginate(fake_method, page_size=1))
+
+        # Pages 4-6 form the second batch with max_concurrency=3
+        assert [r["id"] for r in result] == [1, 2, 3, 4]
+        assert cancelled == [6]
+
+    def test_fetch_pages_cancels_siblings_on_failure(self, client):
+        """Test fetch_pages re-raises a page's error without leaving requests running."""
+        cancelled = []
+
+        async def fake_method(**params):
+            if params["pagina"] == 1:
+                raise ConnectionError("boom")
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(params["pagina"])
+                raise
+            return [{"id": params["pagina"]}]
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(client.fetch_pages(fake_method, [1, 2, 3]))
+
+        assert sorted(cancelled) == [2, 3]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
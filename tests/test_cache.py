@@ -0,0 +1,427 @@
+"""
+Unit tests for the cache backends.
+"""
+
+import json
+import sqlite3
+import sys
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.api.cache import (
+    CacheManager, CacheEntry, CacheSweeper, FileCacheBackend, MemoryCache, PayloadCodec,
+    SQLiteCacheBackend
+)
+from unittest.mock import patch
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def cache(request, tmp_path, monkeypatch):
+    """Create a cache manager for each backend."""
+    monkeypatch.setenv("CACHE_ENABLED", "true")
+    return CacheManager(cache_dir=str(tmp_path / "cache"), ttl=3600, backend=request.param)
+
+
+class TestCacheBackends:
+    """Behaviour shared by every backend."""
+
+    def test_set_and_get(self, cache):
+        """Test round trip through the backend."""
+        data = [{"id": 1, "nome": "Ministério da Educação"}]
+
+        cache.set("http://test.com/api", {"pagina": 1}, data)
+
+        assert cache.get("http://test.com/api", {"pagina": 1}) == data
+        assert cache.get("http://test.com/api", {"pagina": 2}) is None
+
+    def test_stats_and_clear(self, cache):
+        """Test exact stats and clearing."""
+        for page in range(3):
+            cache.set("http://test.com/api", {"pagina": page}, {"page": page})
+
+        stats = cache.get_stats()
+        assert stats["entries"] == 3
+        assert stats["size_bytes"] > 0
+
+        assert cache.clear() == 3
+        assert cache.get_stats()["entries"] == 0
+
+    def test_purge_expired(self, cache):
+        """Test expired entries are swept without being read."""
+        key_old = cache._get_cache_key("http://test.com/old", {})
+        cache.backend.set(key_old, CacheEntry(data=1, cached_at=time.time() - 7200))
+        cache.set("http://test.com/new", {}, 2)
+
+        assert cache.purge_expired() == 1
+        assert cache.get("http://test.com/new", {}) == 2
+        assert cache.get_stats()["entries"] == 1
+
+    def test_stale_entry_with_validators_is_kept(self, cache):
+        """Test expired entries with validators stay available for revalidation."""
+        url = "http://test.com/orgaos"
+        key = cache._get_cache_key(url, {})
+        cache.backend.set(key, CacheEntry(data=[1], cached_at=time.time() - 7200,
+                                          url=url, params={}, etag='"v1"'))
+
+        assert cache.get(url, {}) is None
+        stale = cache.get_stale(url, {})
+        assert stale.data == [1]
+        assert stale.conditional_headers() == {"If-None-Match": '"v1"'}
+
+        assert cache.revalidate(url, {}, stale, last_modified="Mon, 01 Jan 2024") == [1]
+        assert cache.get(url, {}) == [1]
+        assert cache.backend.get(key).last_modified == "Mon, 01 Jan 2024"
+        assert cache.get_stats()["revalidated"] == 1
+
+    def test_stale_entry_without_validators_is_dropped(self, cache):
+        """Test expired entries without validators cannot be revalidated."""
+        key = cache._get_cache_key("http://test.com/api", {})
+        cache.backend.set(key, CacheEntry(data=1, cached_at=time.time() - 7200))
+
+        assert cache.get("http://test.com/api", {}) is None
+        assert cache.get_stale("http://test.com/api", {}) is None
+
+    def test_purge_keeps_revalidatable_entries(self, cache):
+        """Test purging honours the stale window for entries with validators."""
+        now = time.time()
+        cache.backend.set("a", CacheEntry(data=1, cached_at=now - 7200, etag='"a"'))
+        cache.backend.set("b", CacheEntry(data=2, cached_at=now - 7200))
+        cache.backend.set("c", CacheEntry(data=3, cached_at=now - cache.ttl - cache.stale_ttl - 1,
+                                          last_modified="Mon, 01 Jan 2024"))
+
+        assert cache.purge_expired() == 2
+        assert cache.backend.get("a").data == 1
+
+    def test_reads_and_migrates_legacy_json(self, cache):
+        """Test legacy pretty-printed JSON entries are read and converted in place."""
+        url, params = "http://test.com/api", {"pagina": 1}
+        legacy_file = cache.cache_dir / f"{cache._get_cache_key(url, params)}.json"
+        legacy_file.write_text(json.dumps({
+            "cached_at": datetime.now().isoformat(),
+            "url": url,
+            "params": params,
+            "data": [{"nome": "Órgão"}]
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        assert cache.get(url, params) == [{"nome": "Órgão"}]
+        assert not legacy_file.exists()
+        assert cache.get(url, params) == [{"nome": "Órgão"}]
+
+    def test_migrate_legacy(self, cache):
+        """Test bulk migration of legacy files."""
+        for page in range(3):
+            (cache.cache_dir / f"key{page}.json").write_text(json.dumps({
+                "cached_at": datetime.now().isoformat(), "data": page
+            }))
+
+        assert cache.migrate_legacy() == 3
+        assert not list(cache.cache_dir.glob("*.json"))
+        assert cache.backend.get("key2").data == 2
+
+
+class TestPayloadCodec:
+    """Test payload encoding and compression."""
+
+    DATA = [{"id": n, "nome": "Ministério", "valor": 1234.5, "ativo": True, "obs": None}
+            for n in range(50)]
+
+    @pytest.mark.parametrize("encoding", ["json", "msgpack"])
+    @pytest.mark.parametrize("codec", ["none", "zlib", "gzip", "zstd", "lz4"])
+    def test_round_trip(self, encoding, codec):
+        """Test every encoding/codec combination round-trips."""
+        payload = PayloadCodec(encoding=encoding, codec=codec).encode(self.DATA)
+
+        assert PayloadCodec().decode(payload) == self.DATA
+
+    def test_compression_shrinks_payload(self):
+        """Test compressed payloads are smaller than pretty-printed JSON."""
+        pretty = json.dumps(self.DATA, ensure_ascii=False, indent=2).encode("utf-8")
+
+        assert len(PayloadCodec(codec="zstd").encode(self.DATA)) < len(pretty) / 5
+
+    def test_rejects_headerless_payload(self):
+        """Test payloads without the codec header are rejected."""
+        payload = zlib.compress(json.dumps(self.DATA).encode("utf-8"))
+
+        with pytest.raises(ValueError, match="Unrecognized"):
+            PayloadCodec().decode(payload)
+
+    def test_invalid_codec(self):
+        """Test unknown codecs are rejected."""
+        with pytest.raises(ValueError, match="Unknown cache codec"):
+            PayloadCodec(codec="brotli")
+
+
+class TestMemoryCache:
+    """Test the in-process LRU tier."""
+
+    def test_hit_skips_backend(self, tmp_path, monkeypatch):
+        """Test repeated lookups are served from memory."""
+        monkeypatch.setenv("CACHE_ENABLED", "true")
+        cache = CacheManager(cache_dir=str(tmp_path), ttl=3600)
+        cache.set("http://test.com/orgaos-siafi", {"pagina": 1}, [{"codigo": "1"}])
+
+        with patch.object(cache.backend, "get") as backend_get:
+            for _ in range(3):
+                assert cache.get("http://test.com/orgaos-siafi", {"pagina": 1}) == [{"codigo": "1"}]
+            backend_get.assert_not_called()
+
+        stats = cache.get_stats()["memory"]
+        assert stats["hits"] == 3
+        assert stats["entries"] == 1
+
+    def test_disk_hit_is_promoted(self, tmp_path, monkeypatch):
+        """Test entries read from disk populate the memory tier."""
+        monkeypatch.setenv("CACHE_ENABLED", "true")
+        cache = CacheManager(cache_dir=str(tmp_path), ttl=3600)
+        key = cache._get_cache_key("http://test.com", {})
+        cache.backend.set(key, CacheEntry(data=[1, 2], cached_at=time.time()))
+
+        assert cache.get("http://test.com", {}) == [1, 2]
+        assert cache.get("http://test.com", {}) == [1, 2]
+
+        stats = cache.get_stats()
+        assert stats["disk_hits"] == 1
+        assert stats["memory"]["hits"] == 1
+
+    def test_evicts_least_recently_used(self):
+        """Test the entry bound evicts in LRU order."""
+        memory = MemoryCache(max_entries=2)
+        for key in ("a", "b"):
+            memory.set(key, CacheEntry(data=key, cached_at=time.time()))
+
+        memory.get("a", ttl=60)
+        memory.set("c", CacheEntry(data="c", cached_at=time.time()))
+
+        assert memory.get("b", ttl=60) is None
+        assert memory.get("a", ttl=60).data == "a"
+        assert memory.stats()["evictions"] == 1
+
+    def test_byte_bound(self):
+        """Test the byte bound limits the tier size."""
+        memory = MemoryCache(max_entries=100, max_bytes=20000)
+        for n in range(10):
+            memory.set(str(n), CacheEntry(data=["x" * 1000] * 5, cached_at=time.time()))
+
+        stats = memory.stats()
+        assert stats["size_bytes"] <= 20000
+        assert stats["entries"] < 10
+        assert stats["evictions"] > 0
+
+    def test_honours_ttl(self):
+        """Test entries older than the TTL are not served."""
+        memory = MemoryCache()
+        memory.set("k", CacheEntry(data=1, cached_at=time.time() - 10))
+
+        assert memory.get("k", ttl=5) is None
+        assert memory.stats()["entries"] == 0
+
+
+class TestEviction:
+    """Test the size budget of the persistent tier."""
+
+    PAYLOAD = [{"texto": str(n) * 2000} for n in range(10)]
+
+    def fill(self, backend, keys):
+        for key in keys:
+            backend.set(key, CacheEntry(data=self.PAYLOAD + [key], cached_at=time.time()))
+            time.sleep(0.01)
+
+    def test_sqlite_lru(self, tmp_path):
+        """Test LRU evicts the least recently read entries first."""
+        backend = SQLiteCacheBackend(tmp_path, codec=PayloadCodec(codec="none"))
+        self.fill(backend, ["a", "b", "c"])
+        backend.get("a")
+
+        entry_size = backend.stats()["size_bytes"] // 3
+        assert backend.evict(max_bytes=entry_size * 2, policy="lru") == 1
+        assert backend.get("b") is None
+        assert backend.get("a") is not None
+
+    def test_sqlite_lfu(self, tmp_path):
+        """Test LFU evicts the least frequently read entries first."""
+        backend = SQLiteCacheBackend(tmp_path, codec=PayloadCodec(codec="none"))
+        self.fill(backend, ["a", "b", "c"])
+        for _ in range(3):
+            backend.get("a")
+            backend.get("c")
+        backend.get("b")
+        backend.get("b")
+
+        entry_size = backend.stats()["size_bytes"] // 3
+        assert backend.evict(max_bytes=entry_size * 2, policy="lfu") == 1
+        assert backend.get("b") is None
+
+    def test_file_lru(self, tmp_path):
+        """Test the file backend evicts by access time."""
+        backend = FileCacheBackend(tmp_path, codec=PayloadCodec(codec="none"))
+        self.fill(backend, ["a", "b", "c"])
+        time.sleep(0.01)
+        backend.get("a")
+
+        entry_size = backend.stats()["size_bytes"] // 3
+        assert backend.evict(max_bytes=entry_size * 2, policy="lru") == 1
+        assert backend.get("b") is None
+
+    def test_file_backend_rejects_lfu(self, tmp_path):
+        """Test LFU needs the SQLite backend."""
+        with pytest.raises(ValueError, match="not supported"):
+            CacheManager(cache_dir=str(tmp_path), backend="file", eviction_policy="lfu")
+
+    def test_budget_enforced_on_write(self, tmp_path, monkeypatch):
+        """Test writes keep the cache under max_size_mb."""
+        monkeypatch.setenv("CACHE_ENABLED", "true")
+        monkeypatch.setattr(CacheManager, "EVICTION_CHECK_INTERVAL", 1)
+        cache = CacheManager(cache_dir=str(tmp_path), max_size_mb=0.05, memory_entries=0,
+                             codec=PayloadCodec(codec="none"))
+
+        for page in range(20):
+            cache.set("http://test.com", {"pagina": page}, self.PAYLOAD)
+
+        stats = cache.get_stats()
+        assert stats["size_bytes"] <= 0.05 * 1024 * 1024
+        assert stats["evictions"] > 0
+        assert cache.get("http://test.com", {"pagina": 19}) is not None
+
+    def test_settings_are_shared(self, tmp_path):
+        """Test limits saved by one manager are picked up by another."""
+        CacheManager(cache_dir=str(tmp_path)).set_limits(max_size_mb=123, eviction_policy="lfu")
+
+        other = CacheManager(cache_dir=str(tmp_path))
+        assert other.max_size_mb == 123
+        assert other.eviction_policy == "lfu"
+
+    def test_sweeper(self, tmp_path, monkeypatch):
+        """Test a sweep purges expired entries and enforces the budget."""
+        monkeypatch.setenv("CACHE_ENABLED", "true")
+        cache = CacheManager(cache_dir=str(tmp_path), ttl=60, memory_entries=0)
+        cache.backend.set("old", CacheEntry(data=1, cached_at=time.time() - 120))
+        cache.set("http://test.com", {}, 2)
+
+        result = CacheSweeper(cache).sweep()
+
+        assert result == {"expired": 1, "evicted": 0}
+        assert cache.get_stats()["entries"] == 1
+
+    def test_sweeper_thread_stops(self, tmp_path):
+        """Test the sweeper thread can be started and stopped."""
+        cache = CacheManager(cache_dir=str(tmp_path))
+        sweeper = cache.start_sweeper(interval=0.01)
+        time.sleep(0.05)
+        cache.stop_sweeper()
+        sweeper.join(timeout=1)
+
+        assert not sweeper.is_alive()
+
+    def test_sweeper_is_shared_per_directory(self, tmp_path):
+        """Test managers over one directory share a sweeper until the last one stops."""
+        first = CacheManager(cache_dir=str(tmp_path))
+        second = CacheManager(cache_dir=str(tmp_path))
+        sweeper = first.start_sweeper(interval=0.01)
+
+        assert second.start_sweeper(interval=0.01) is sweeper
+        first.stop_sweeper()
+        assert sweeper.is_alive()
+        second.stop_sweeper()
+        sweeper.join(timeout=1)
+        assert not sweeper.is_alive()
+
+    def test_shared_sweeper_outlives_a_closed_manager(self, tmp_path):
+        """Test closing the manager a shared sweeper runs through hands it to another."""
+        first = CacheManager(cache_dir=str(tmp_path))
+        second = CacheManager(cache_dir=str(tmp_path))
+        sweeper = first.start_sweeper(interval=60)
+        second.start_sweeper(interval=60)
+
+        first.close()
+
+        assert sweeper.cache is second
+        assert sweeper.sweep() == {"expired": 0, "evicted": 0}
+        second.close()
+        assert not sweeper.is_alive()
+
+
+class TestSQLiteCacheBackend:
+    """SQLite specific behaviour."""
+
+    def test_uses_wal_and_single_file(self, tmp_path):
+        """Test entries share one WAL-mode database."""
+        backend = SQLiteCacheBackend(tmp_path)
+        backend.set("k", CacheEntry(data={"a": 1}, cached_at=time.time(), url="u", params={}))
+
+        conn = sqlite3.connect(str(backend.db_path))
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("SELECT url FROM responses WHERE key = 'k'").fetchone() == ("u",)
+        assert not list(tmp_path.glob("*.json"))
+
+    def test_upgrades_existing_database(self, tmp_path):
+        """Test databases without access-tracking columns are upgraded."""
+        conn = sqlite3.connect(str(tmp_path / "responses.sqlite3"))
+        conn.execute(
+            "CREATE TABLE responses (key TEXT PRIMARY KEY, url TEXT NOT NULL, "
+            "params TEXT NOT NULL, cached_at REAL NOT NULL, size INTEGER NOT NULL, "
+            "payload BLOB NOT NULL)"
+        )
+        conn.commit()
+        conn.close()
+
+        backend = SQLiteCacheBackend(tmp_path)
+        backend.set("k", CacheEntry(data=1, cached_at=time.time()))
+
+        assert backend.get("k").data == 1
+        assert backend.evict(max_bytes=0, policy="lfu") == 1
+
+    def test_reads_are_recorded_in_batches(self, tmp_path):
+        """Test hits are buffered and written together, at the latest on close."""
+        backend = SQLiteCacheBackend(tmp_path)
+        backend.set("k", CacheEntry(data=1, cached_at=time.time()))
+        backend.get("k")
+        backend.get("k")
+
+        reader = sqlite3.connect(str(backend.db_path))
+        assert reader.execute("SELECT hits FROM responses").fetchone() == (0,)
+
+        backend.close()
+        assert reader.execute("SELECT hits FROM responses").fetchone() == (2,)
+        reader.close()
+
+        # A closed backend reconnects on next use
+        assert backend.get("k").data == 1
+
+    def test_revalidation_keeps_payload(self, tmp_path):
+        """Test a revalidated row keeps its payload and only refreshes metadata."""
+        backend = SQLiteCacheBackend(tmp_path)
+        backend.set("k", CacheEntry(data=[1, 2], cached_at=1.0, etag='"v1"'))
+        payload = backend.conn.execute("SELECT payload FROM responses").fetchone()[0]
+
+        backend.touch("k", CacheEntry(data=None, cached_at=2.0, etag='"v2"'))
+
+        entry = backend.get("k")
+        assert entry.data == [1, 2]
+        assert entry.cached_at == 2.0
+        assert entry.etag == '"v2"'
+        assert backend.conn.execute("SELECT payload FROM responses").fetchone()[0] == payload
+
+    def test_unknown_backend(self, tmp_path):
+        """Test invalid backend names are rejected."""
+        with pytest.raises(ValueError, match="Unknown cache backend"):
+            CacheManager(cache_dir=str(tmp_path), backend="redis")
+
+    def test_default_backend_from_env(self, tmp_path, monkeypatch):
+        """Test CACHE_BACKEND selects the backend."""
+        monkeypatch.setenv("CACHE_BACKEND", "file")
+        assert isinstance(CacheManager(cache_dir=str(tmp_path)).backend, FileCacheBackend)
+
+        monkeypatch.delenv("CACHE_BACKEND")
+        assert isinstance(CacheManager(cache_dir=str(tmp_path)).backend, SQLiteCacheBackend)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -14,7 +14,9 @@ import requests
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.api.client import TransparenciaAPIClient, RateLimiter, CacheManager
+from src.api.client import (
+    TransparenciaAPIClient, RateLimiter, CacheManager, AdaptiveRateController, parse_retry_after
+)
 
 
 class TestRateLimiter:
@@ -57,6 +59,141 @@ class TestRateLimiter:
         elapsed = time.time() - start
         # Should have taken at least 0.5 seconds due to rate limiting
         assert elapsed >= 0.5
+    
+    def test_rate_limiter_burst(self):
+        """Test burst calls go out immediately and the rest are paced."""
+        import time
+        limiter = RateLimiter(max_calls=6, window_seconds=0.5, burst=4)
+        
+        start = time.time()
+        waits = [limiter.acquire() for _ in range(6)]
+        
+        assert waits[:4] == [0.0] * 4
+        assert all(w > 0 for w in waits[4:])
+        # The calls beyond the burst are paced at 12/s
+        assert time.time() - start >= 0.15
+    
+    def test_rate_limiter_sustains_the_quota(self):
+        """Test steady-state throughput equals max_calls per window."""
+        limiter = RateLimiter(max_calls=20, window_seconds=0.5, burst=5)
+        
+        waits = [limiter.reserve() for _ in range(25)]
+        
+        # 5 burst tokens, then 20 calls spread over exactly one window
+        assert waits[:5] == [0.0] * 5
+        assert waits[-1] == pytest.approx(0.5, abs=0.01)
+    
+    def test_rate_limiter_is_thread_safe(self):
+        """Test concurrent callers never exceed the quota."""
+        import threading
+        import time
+        limiter = RateLimiter(max_calls=11, window_seconds=0.5, burst=1)
+        stamps = []
+        
+        def worker():
+            limiter.acquire()
+            stamps.append(time.monotonic())
+        
+        threads = [threading.Thread(target=worker) for _ in range(11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stamps.sort()
+        # 1 immediate call plus 10 paced at 22/s
+        assert stamps[-1] - stamps[0] >= 0.4
+    
+    def test_rate_limiter_follows_schedule(self):
+        """Test the refill rate is capped by the time-of-day quota."""
+        quota = {"limit": 700}
+        limiter = RateLimiter(max_calls=1000, window_seconds=60, burst=1,
+                              schedule=lambda: quota["limit"])
+        
+        assert limiter.refill_rate() == pytest.approx(700 / 60)
+        
+        quota["limit"] = 400
+        assert limiter.refill_rate() == pytest.approx(400 / 60)
+    
+    def test_rate_limiter_invalid_burst(self):
+        """Test burst must allow at least one call."""
+        with pytest.raises(ValueError, match="burst"):
+            RateLimiter(max_calls=10, burst=0)
+
+
+class TestAdaptiveRateController:
+    """Test AdaptiveRateController class."""
+    
+    @pytest.fixture
+    def controller(self):
+        """Create a controller over a 100 calls/minute limiter."""
+        limiter = RateLimiter(max_calls=100, window_seconds=60)
+        return AdaptiveRateController(limiter, ceiling=400)
+    
+    def test_additive_increase_with_headroom(self, controller):
+        """Test the quota grows while the server reports headroom."""
+        for _ in range(5):
+            controller.on_response(200, {"X-Rate-Limit-Remaining": "300"})
+        
+        assert controller.limiter.max_calls == 105
+    
+    def test_increase_is_capped(self, controller):
+        """Test the quota never exceeds the ceiling."""
+        controller.limiter.set_max_calls(400)
+        controller.on_response(200, {"X-Rate-Limit-Remaining": "300"})
+        
+        assert controller.limiter.max_calls == 400
+    
+    def test_no_header_no_increase(self, controller):
+        """Test the quota is not raised without server feedback."""
+        controller.on_response(200, {})
+        
+        assert controller.limiter.max_calls == 100
+    
+    def test_soft_decrease_when_remaining_is_low(self, controller):
+        """Test a low remaining quota slows the limiter down."""
+        controller.on_response(200, {"X-Rate-Limit-Remaining": "10"})
+        
+        assert controller.limiter.max_calls == pytest.approx(90)
+    
+    def test_multiplicative_decrease_on_429(self, controller):
+        """Test a 429 halves the quota and pauses for Retry-After."""
+        delay = controller.on_response(429, {"Retry-After": "0.3"})
+        
+        assert delay == 0.3
+        assert controller.limiter.max_calls == 50
+        assert controller.throttled == 1
+        assert 0.25 <= controller.limiter.acquire() < 0.5
+    
+    def test_decrease_respects_floor(self, controller):
+        """Test repeated 429s stop at the floor."""
+        for _ in range(10):
+            controller.on_response(429, {"Retry-After": "0"})
+        
+        assert controller.limiter.max_calls == controller.floor
+    
+    def test_default_ceiling_is_the_configured_rate(self):
+        """Test the quota never grows past the configured rate or the schedule."""
+        limiter = RateLimiter(max_calls=30, window_seconds=60, schedule=lambda: 400)
+        controller = AdaptiveRateController(limiter)
+        
+        for _ in range(5):
+            controller.on_response(200, {"X-Rate-Limit-Remaining": "300"})
+        
+        assert controller.get_ceiling() == 30
+        assert limiter.max_calls == 30
+        limiter.schedule = lambda: 20
+        assert controller.get_ceiling() == 20
+    
+    def test_parse_retry_after(self):
+        """Test Retry-After in seconds and as an HTTP date."""
+        from email.utils import formatdate
+        import time
+        
+        assert parse_retry_after("5") == 5
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("garbage") is None
+        assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
 
 
 class TestCacheManager:
@@ -144,11 +281,50 @@ class TestTransparenciaAPIClient:
     def client(self, mock_env, tmp_path, monkeypatch):
         """Create client instance with mocked environment."""
         # Use temp directory for cache
+        original_init = CacheManager.__init__
         monkeypatch.setattr("src.api.client.CacheManager.__init__", 
-                            lambda self, **kwargs: CacheManager.__init__(
+                            lambda self, **kwargs: original_init(
                                 self, cache_dir=str(tmp_path / "cache"), ttl=3600))
         return TransparenciaAPIClient()
     
+    def test_shared_rate_limiter_is_opt_in(self, mock_env, monkeypatch, tmp_path):
+        """Test RATE_LIMIT_STATE_FILE enables the cross-process limiter."""
+        monkeypatch.setenv("CACHE_ENABLED", "false")
+        original_init = CacheManager.__init__
+        monkeypatch.setattr("src.api.client.CacheManager.__init__",
+                            lambda self, **kwargs: original_init(
+                                self, cache_dir=str(tmp_path / "cache"), ttl=3600))
+        monkeypatch.delenv("RATE_LIMIT_STATE_FILE", raising=False)
+        assert TransparenciaAPIClient().shared_limiter is None
+        
+        monkeypatch.setenv("RATE_LIMIT_STATE_FILE", str(tmp_path / "rate.sqlite3"))
+        client = TransparenciaAPIClient()
+        
+        assert client.shared_limiter.db_path == tmp_path / "rate.sqlite3"
+        assert client.shared_limiter.scope == client.shared_limiter.scope_for_token("test_token")
+        
+        # The shared window follows the adaptive quota
+        client.rate_controller.on_response(429, {"Retry-After": "0"})
+        assert client.shared_limiter.get_current_limit() == 15
+    
+    def test_close_releases_the_sweeper(self, mock_env, monkeypatch, tmp_path):
+        """Test clients share the cache sweeper and stop it when closed."""
+        monkeypatch.setenv("CACHE_ENABLED", "true")
+        original_init = CacheManager.__init__
+        monkeypatch.setattr("src.api.client.CacheManager.__init__",
+                            lambda self, **kwargs: original_init(
+                                self, cache_dir=str(tmp_path / "cache"), ttl=3600))
+        
+        with TransparenciaAPIClient() as first, TransparenciaAPIClient() as second:
+            sweeper = first.cache.sweeper
+            assert second.cache.sweeper is sweeper
+        
+        sweeper.join(timeout=1)
+        assert not sweeper.is_alive()
+        # The cache database connections are closed too
+        assert first.cache.backend._conn is None
+        assert second.cache.backend._conn is None
+    
     def test_client_initialization_without_token(self, monkeypatch):
         """Test client initialization fails without token."""
         monkeypatch.delenv("TRANSPARENCIA_API_TOKEN", raising=False)
@@ -192,6 +368,72 @@ class TestTransparenciaAPIClient:
         
         assert result == {"data": "test"}
     
+    @patch('src.api.client.requests.Session.get')
+    def test_make_request_revalidates_expired_entry(self, mock_get, client, monkeypatch):
+        """Test expired entries are revalidated with a conditional request."""
+        monkeypatch.setattr(client.cache, "enabled", True)
+        monkeypatch.setattr(client.rate_limiter, "acquire", lambda: 0.0)
+        first = Mock(status_code=200, headers={"ETag": '"v1"'})
+        first.json.return_value = [{"codigo": "1"}]
+        not_modified = Mock(status_code=304, headers={"ETag": '"v1"'})
+        not_modified.json.side_effect = AssertionError("304 bodies must not be parsed")
+        mock_get.side_effect = [first, not_modified]
+        
+        assert client._make_request("/orgaos-siafi") == [{"codigo": "1"}]
+        
+        # Expire the entry
+        client.cache.ttl = 0
+        assert client._make_request("/orgaos-siafi") == [{"codigo": "1"}]
+        
+        assert mock_get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+        assert client.cache.get_stats()["revalidated"] == 1
+        assert client.cache.get_stats()["refetched"] == 0
+    
+    @patch('src.api.client.requests.Session.get')
+    def test_make_request_refetches_changed_entry(self, mock_get, client, monkeypatch):
+        """Test a changed resource replaces the stale entry."""
+        monkeypatch.setattr(client.cache, "enabled", True)
+        monkeypatch.setattr(client.rate_limiter, "acquire", lambda: 0.0)
+        first = Mock(status_code=200, headers={"Last-Modified": "Mon, 01 Jan 2024"})
+        first.json.return_value = [{"codigo": "1"}]
+        changed = Mock(status_code=200, headers={"Last-Modified": "Tue, 02 Jan 2024"})
+        changed.json.return_value = [{"codigo": "2"}]
+        mock_get.side_effect = [first, changed]
+        
+        client._make_request("/orgaos-siafi")
+        client.cache.ttl = 0
+        
+        assert client._make_request("/orgaos-siafi") == [{"codigo": "2"}]
+        assert mock_get.call_args.kwargs["headers"] == {"If-Modified-Since": "Mon, 01 Jan 2024"}
+        assert client.cache.get_stats()["refetched"] == 1
+    
+    @patch('src.api.client.requests.Session.get')
+    def test_make_request_retries_throttled_response(self, mock_get, client, monkeypatch):
+        """Test a 429 is retried after Retry-After and slows the limiter down."""
+        monkeypatch.setattr(client.rate_limiter, "acquire", lambda: 0.0)
+        throttled = Mock(status_code=429, headers={"Retry-After": "0"})
+        ok = Mock(status_code=200, headers={"X-Rate-Limit-Remaining": "350"})
+        ok.json.return_value = [{"id": 1}]
+        mock_get.side_effect = [throttled, ok]
+        
+        assert client._make_request("/test-endpoint") == [{"id": 1}]
+        assert mock_get.call_count == 2
+        stats = client.get_stats()["rate"]
+        assert stats["throttled"] == 1
+        assert stats["max_calls"] == 16  # 30 halved, then +1 with headroom
+    
+    @patch('src.api.client.requests.Session.get')
+    def test_make_request_gives_up_when_throttled(self, mock_get, client, monkeypatch):
+        """Test persistent 429s surface as HTTP errors."""
+        monkeypatch.setattr(client.rate_limiter, "acquire", lambda: 0.0)
+        throttled = Mock(status_code=429, text="Too Many Requests", headers={"Retry-After": "0"})
+        throttled.raise_for_status.side_effect = requests.exceptions.HTTPError(response=throttled)
+        mock_get.return_value = throttled
+        
+        with pytest.raises(requests.exceptions.HTTPError):
+            client._make_request("/test-endpoint")
+        assert mock_get.call_count == client.THROTTLE_RETRIES + 1
+    
     @patch('src.api.client.requests.Session.get')
     def test_make_request_timeout(self, mock_get, client):
         """Test request timeout handling."""
@@ -214,6 +456,7 @@ class TestTransparenciaAPIClient:
         mock_response = Mock()
         mock_response.status_code = 404
         mock_response.text = "Not found"
+        mock_response.headers = {}
         mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=mock_response)
         mock_get.return_value = mock_response
         
@@ -352,6 +595,86 @@ class TestTransparenciaAPIClient:
         assert len(result) == 2
         assert result == [{"id": 1}, {"id": 2}]
     
+    def test_prefetch_pages_yields_in_order(self, client):
+        """Test prefetching yields pages in order despite out-of-order completion."""
+        import time
+        
+        def method(pagina, quantidade):
+            # Later pages finish first
+            time.sleep(0.05 / pagina)
+            return [{"id": pagina}] if pagina <= 6 else []
+        
+        pages = list(client.prefetch_pages(method, window=3, page_size=1))
+        
+        assert pages == [[{"id": n}] for n in range(1, 7)]
+    
+    def test_prefetch_pages_stops_on_short_page(self, client):
+        """Test a page shorter than the previous ones ends pagination."""
+        requested = []
+        
+        def method(pagina, quantidade):
+            requested.append(pagina)
+            return [{"id": pagina}] * (2 if pagina < 3 else 1)
+        
+        pages = list(client.prefetch_pages(method, window=2, page_size=2))
+        
+        assert [len(p) for p in pages] == [2, 2, 1]
+        # Only the window past the end may have been requested speculatively
+        assert max(requested) <= 5
+    
+    def test_prefetch_pages_respects_max_pages(self, client):
+        """Test prefetching never requests pages past max_pages."""
+        requested = []
+        
+        def method(pagina, quantidade):
+            requested.append(pagina)
+            return [{"id": pagina}]
+        
+        pages = list(client.prefetch_pages(method, window=4, max_pages=3, page_size=1))
+        
+        assert len(pages) == 3
+        assert sorted(requested) == [1, 2, 3]
+    
+    def test_paginate_with_prefetch(self, client):
+        """Test paginate delegates to the prefetching paginator."""
+        mock_method = Mock(side_effect=lambda **kwargs: (
+            [{"id": kwargs["pagina"]}] if kwargs["pagina"] <= 3 else []
+        ))
+        
+        result = client.paginate(mock_method, page_size=1, prefetch=2)
+        
+        assert result == [{"id": 1}, {"id": 2}, {"id": 3}]
+    
+    def test_iter_pages_yields_each_page(self, client):
+        """Test iter_pages yields pages lazily until an empty page."""
+        mock_method = Mock(side_effect=[
+            [{"id": 1}, {"id": 2}],
+            [{"id": 3}],
+            []
+        ])
+        
+        pages = client.iter_pages(mock_method, page_size=2)
+        
+        assert next(pages) == [{"id": 1}, {"id": 2}]
+        assert mock_method.call_count == 1
+        assert list(pages) == [[{"id": 3}]]
+    
+    def test_iter_pages_as_arrow(self, client):
+        """Test iter_pages can yield pyarrow record batches."""
+        mock_method = Mock(side_effect=[[{"id": 1, "nome": "A"}], []])
+        
+        batches = list(client.iter_pages(mock_method, as_arrow=True))
+        
+        assert len(batches) == 1
+        assert batches[0].num_rows == 1
+        assert batches[0].schema.names == ["id", "nome"]
+    
+    def test_iter_records(self, client):
+        """Test iter_records flattens pages into records."""
+        mock_method = Mock(side_effect=[[{"id": 1}, {"id": 2}], [{"id": 3}], []])
+        
+        assert list(client.iter_records(mock_method)) == [{"id": 1}, {"id": 2}, {"id": 3}]
+    
     def test_get_available_endpoints(self, client):
         """Test getting available endpoints."""
         endpoints = client.get_available_endpoints()
@@ -361,41 +684,22 @@ class TestTransparenciaAPIClient:
         assert "despesas_contratos" in endpoints
         assert endpoints["despesas_contratos"] == "/contratos"
     
-    def test_clear_cache(self, client, tmp_path):
+    def test_clear_cache(self, client):
         """Test clearing cache."""
-        # Create some cache files
-        cache_dir = tmp_path / "cache"
-        cache_dir.mkdir(exist_ok=True)
-        
-        # Create dummy cache files
-        (cache_dir / "test1.json").write_text("{}")
-        (cache_dir / "test2.json").write_text("{}")
+        client.cache.set("http://test.com/a", {}, {"data": 1})
+        client.cache.set("http://test.com/b", {}, {"data": 2})
         
-        # Mock the cache directory path
-        with patch('src.api.client.Path', return_value=cache_dir):
-            client.clear_cache()
+        client.clear_cache()
         
-        # Check files were deleted
-        assert not (cache_dir / "test1.json").exists()
-        assert not (cache_dir / "test2.json").exists()
+        assert client.cache.get("http://test.com/a", {}) is None
+        assert client.cache.get("http://test.com/b", {}) is None
     
-    def test_get_stats(self, client, tmp_path):
+    def test_get_stats(self, client):
         """Test getting client statistics."""
-        # Create some cache files
-        cache_dir = tmp_path / "cache"
-        cache_dir.mkdir(exist_ok=True)
-        (cache_dir / "test1.json").write_text("{}")
-        (cache_dir / "test2.json").write_text("{}")
-        
-        # Mock the cache directory path
-        with patch('src.api.client.Path') as mock_path:
-            mock_path.return_value.exists.return_value = True
-            mock_path.return_value.glob.return_value = [
-                cache_dir / "test1.json",
-                cache_dir / "test2.json"
-            ]
-            
-            stats = client.get_stats()
+        client.cache.set("http://test.com/a", {}, {"data": 1})
+        client.cache.set("http://test.com/b", {}, {"data": 2})
+        
+        stats = client.get_stats()
         
         assert stats["rate_limit"] == 30
         assert stats["timeout"] == 60
@@ -404,6 +708,5 @@ class TestTransparenciaAPIClient:
         assert stats["cached_items"] == 2
         assert stats["endpoints_available"] > 0
 
-
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s"])
\ No newline at end of file
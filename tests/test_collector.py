@@ -0,0 +1,531 @@
+"""
+Unit tests for DataCollector with a mocked API client.
+"""
+
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data.collector import DataCollector
+from src.data.dataset import read_dataset
+
+
+class FakeDatetime(datetime):
+    """datetime whose now() advances one second per tick, for unique file names."""
+    
+    current = datetime(2024, 3, 1)
+    
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+    
+    @classmethod
+    def tick(cls):
+        cls.current += timedelta(seconds=1)
+
+
+def make_fetch(pages):
+    """Return a fake API method serving ``pages`` (1-indexed)."""
+    def fetch(**params):
+        return pages.get(params["pagina"], [])
+    return fetch
+
+
+@pytest.fixture
+def collector(monkeypatch, tmp_path):
+    """Create collector writing to a temp directory."""
+    monkeypatch.setenv("TRANSPARENCIA_API_TOKEN", "test_token")
+    monkeypatch.setenv("CACHE_ENABLED", "false")
+    monkeypatch.chdir(tmp_path)
+    return DataCollector(output_dir=str(tmp_path / "raw"))
+
+
+class TestCollectEndpoint:
+    """Test DataCollector.collect_endpoint."""
+    
+    def test_collects_all_pages(self, collector):
+        """Test every page ends up in the Parquet output."""
+        pages = {
+            1: [{"id": 1, "data": "01/01/2024"}, {"id": 2, "data": "02/01/2024"}],
+            2: [{"id": 3, "data": "03/01/2024"}],
+        }
+        
+        stats = collector.collect_endpoint("pagamentos", make_fetch(pages), date_field="data")
+        
+        assert stats["status"] == "completed"
+        assert stats["records_collected"] == 3
+        assert stats["pages_collected"] == 2
+        
+        df = read_dataset(collector.output_dir / "pagamentos")
+        assert df["id"].tolist() == [1, 2, 3]
+        assert (df["_endpoint"] == "pagamentos").all()
+        assert collector.state["collections"]["pagamentos"]["last_date"] == "03/01/2024"
+    
+    def test_schema_evolves_across_pages(self, collector):
+        """Test columns that only appear in later pages are kept."""
+        pages = {
+            1: [{"id": 1, "valor": None, "orgao": {"codigo": "1"}}],
+            2: [{"id": 2, "valor": 10.5, "orgao": {"codigo": "2", "sigla": "X"}, "extra": "a"}],
+        }
+        
+        stats = collector.collect_endpoint("contratos", make_fetch(pages))
+        
+        df = read_dataset(collector.output_dir / "contratos")
+        assert df["valor"].tolist()[1] == 10.5
+        assert df["extra"].isna().tolist() == [True, False]
+        assert df["orgao"].tolist()[1] == {"codigo": "2", "sigla": "X"}
+    
+    def test_partitions_are_replaced_or_added(self, collector, monkeypatch):
+        """Test full crawls replace their partitions and incremental ones add files."""
+        pages = {1: [{"id": 1, "data": "01/01/2024", "codigoOrgao": "26000"},
+                     {"id": 2, "data": "01/02/2024", "codigoOrgao": "26000"}]}
+        monkeypatch.setattr(FakeDatetime, "current", datetime(2024, 3, 1))
+        monkeypatch.setattr("src.data.collector.datetime", FakeDatetime)
+        
+        collector.collect_endpoint("pagamentos", make_fetch(pages), date_field="data",
+                                   incremental=False)
+        FakeDatetime.tick()
+        stats = collector.collect_endpoint("pagamentos", make_fetch(pages), date_field="data",
+                                           incremental=False)
+        
+        assert stats["output_files"][0].endswith(
+            "pagamentos/year=2024/month=1/orgao_codigo=26000/pagamentos_20240301_000001.parquet"
+        )
+        assert sorted(read_dataset(collector.output_dir / "pagamentos")["id"]) == [1, 2]
+        
+        FakeDatetime.tick()
+        new_page = {1: [{"id": 3, "data": "02/02/2024", "codigoOrgao": "26000"}]}
+        collector.collect_endpoint("pagamentos", make_fetch(new_page), date_field="data")
+        
+        february = read_dataset(collector.output_dir / "pagamentos", filters=[("month", "=", 2)])
+        assert sorted(february["id"]) == [2, 3]
+    
+    def test_spool_is_removed_and_sample_written(self, collector):
+        """Test temporary spool is cleaned up and a JSON sample is kept."""
+        pages = {1: [{"id": n} for n in range(10)]}
+        
+        stats = collector.collect_endpoint("orgaos", make_fetch(pages))
+        
+        output_file = Path(stats["output_files"][0])
+        assert not collector._get_spool_path("orgaos").exists()
+        sample_file = collector.output_dir / "orgaos" / f".{output_file.stem}.sample.json"
+        with open(sample_file, encoding="utf-8") as f:
+            assert len(json.load(f)) == 5
+    
+    def test_compact_data(self, collector, monkeypatch):
+        """Test incremental runs are compacted to one file and one sample."""
+        monkeypatch.setattr(FakeDatetime, "current", datetime(2024, 3, 1))
+        monkeypatch.setattr("src.data.collector.datetime", FakeDatetime)
+        for n in range(3):
+            FakeDatetime.tick()
+            page = {1: [{"id": n, "data": f"0{3 - n}/01/2024", "codigoOrgao": "26000"}]}
+            collector.collect_endpoint("pagamentos", make_fetch(page), date_field="data")
+        endpoint_dir = collector.output_dir / "pagamentos"
+        
+        stats = collector.compact_data()
+        
+        assert stats["pagamentos"]["files_removed"] == 3
+        assert stats["pagamentos"]["samples_removed"] == 2
+        assert len(list(endpoint_dir.rglob("*.parquet"))) == 1
+        assert read_dataset(endpoint_dir)["id"].tolist() == [2, 1, 0]
+        assert collector.compact_data() == {}
+
+
+class Crash(BaseException):
+    """Simulated process death (not caught by the collector's error handling)."""
+
+
+class TestResume:
+    """Test page checkpoints and resumption."""
+    
+    def crashing_fetch(self, pages, requested, crash_at=None):
+        """Fake API method that records requested pages and dies at ``crash_at``."""
+        def fetch(**params):
+            requested.append(params["pagina"])
+            if params["pagina"] == crash_at:
+                raise Crash()
+            return pages.get(params["pagina"], [])
+        return fetch
+    
+    def test_crash_resumes_from_next_page(self, collector):
+        """Test a rerun after a crash only fetches the pages not yet checkpointed."""
+        pages = {n: [{"id": n, "data": f"0{n}/01/2024"}] for n in range(1, 6)}
+        requested = []
+        
+        with pytest.raises(Crash):
+            collector.collect_endpoint("pagamentos", self.crashing_fetch(pages, requested, 4),
+                                       date_field="data")
+        
+        spool_path = collector._get_spool_path("pagamentos")
+        assert spool_path.exists()
+        reloaded = DataCollector(output_dir=str(collector.output_dir))
+        assert reloaded.get_collection_status()["checkpoints"]["pagamentos"] == {
+            "page": 3, "records_collected": 3
+        }
+        
+        requested.clear()
+        stats = reloaded.collect_endpoint("pagamentos", self.crashing_fetch(pages, requested),
+                                          date_field="data")
+        
+        assert requested == [4, 5, 6]
+        assert stats["status"] == "completed"
+        assert stats["resumed_from_page"] == 4
+        assert stats["records_collected"] == 5
+        assert read_dataset(reloaded.output_dir / "pagamentos")["id"].tolist() == [1, 2, 3, 4, 5]
+        assert reloaded.state["collections"]["pagamentos"]["last_date"] == "05/01/2024"
+        assert "pagamentos" not in reloaded.state["checkpoints"]
+        assert not spool_path.exists()
+    
+    def test_partial_page_is_discarded(self, collector):
+        """Test bytes written after the last checkpoint are truncated on resume."""
+        pages = {n: [{"id": n}] for n in range(1, 4)}
+        requested = []
+        
+        with pytest.raises(Crash):
+            collector.collect_endpoint("orgaos", self.crashing_fetch(pages, requested, 3))
+        with open(collector._get_spool_path("orgaos"), "ab") as f:
+            f.write(b"\x1f\x8b\x08 torn write")
+        
+        stats = collector.collect_endpoint("orgaos", make_fetch(pages))
+        
+        assert read_dataset(collector.output_dir / "orgaos")["id"].tolist() == [1, 2, 3]
+    
+    def test_too_many_errors_keeps_checkpoint(self, collector):
+        """Test a crawl that gives up is resumed instead of saved as complete."""
+        pages = {1: [{"id": 1}], 2: [{"id": 2}]}
+        failing = {"on": True}
+        
+        def fetch(**params):
+            if params["pagina"] > 1 and failing["on"]:
+                raise ConnectionError("boom")
+            return pages.get(params["pagina"], [])
+        
+        first = collector.collect_endpoint("orgaos", fetch)
+        assert first["status"] == "failed"
+        assert "output_files" not in first
+        assert collector.state["checkpoints"]["orgaos"]["page"] == 1
+        
+        failing["on"] = False
+        second = collector.collect_endpoint("orgaos", fetch)
+        
+        assert second["resumed_from_page"] == 2
+        assert read_dataset(collector.output_dir / "orgaos")["id"].tolist() == [1, 2]
+    
+    def test_checkpoints_are_batched(self, collector, monkeypatch):
+        """Test the state is written once per CHECKPOINT_PAGES pages, not per page."""
+        monkeypatch.setattr("src.data.collector.CHECKPOINT_PAGES", 10)
+        pages = {n: [{"id": n}] for n in range(1, 26)}
+        checkpoints = []
+        set_checkpoint = collector._set_checkpoint
+        
+        def record(slot, checkpoint):
+            checkpoints.append(checkpoint and (checkpoint["page"], checkpoint.get("complete")))
+            set_checkpoint(slot, checkpoint)
+        
+        monkeypatch.setattr(collector, "_set_checkpoint", record)
+        stats = collector.collect_endpoint("orgaos", make_fetch(pages))
+        
+        assert stats["records_collected"] == 25
+        assert checkpoints == [(10, None), (20, None), (25, True)]
+    
+    def test_failed_page_is_retried_not_skipped(self, collector):
+        """Test a transient page error is retried so the crawl has no gaps."""
+        pages = {n: [{"id": n}] for n in range(1, 4)}
+        failures = {2: 2}
+        
+        def fetch(**params):
+            if failures.get(params["pagina"], 0) > 0:
+                failures[params["pagina"]] -= 1
+                raise ConnectionError("boom")
+            return pages.get(params["pagina"], [])
+        
+        stats = collector.collect_endpoint("orgaos", fetch)
+        
+        assert stats["status"] == "completed"
+        assert stats["errors"] == 2
+        assert read_dataset(collector.output_dir / "orgaos")["id"].tolist() == [1, 2, 3]
+    
+    def test_failed_crawl_never_replaces_partitions(self, collector):
+        """Test a crawl that gives up leaves the existing dataset untouched."""
+        collector.collect_endpoint("orgaos", make_fetch({1: [{"id": 1}], 2: [{"id": 2}]}))
+        
+        def fetch(**params):
+            if params["pagina"] == 2:
+                raise ConnectionError("boom")
+            return [{"id": 10 + params["pagina"]}] if params["pagina"] < 4 else []
+        
+        stats = collector.collect_endpoint("orgaos", fetch)
+        
+        assert stats["status"] == "failed"
+        assert read_dataset(collector.output_dir / "orgaos")["id"].tolist() == [1, 2]
+        assert collector.state["collections"]["orgaos"]["records_collected"] == 2
+    
+    def test_resume_disabled_or_params_changed_start_over(self, collector):
+        """Test a checkpoint is only used for the same query with resume enabled."""
+        pages = {n: [{"id": n}] for n in range(1, 4)}
+        requested = []
+        
+        with pytest.raises(Crash):
+            collector.collect_endpoint("orgaos", self.crashing_fetch(pages, requested, 3))
+        
+        requested.clear()
+        with pytest.raises(Crash):
+            collector.collect_endpoint("orgaos", self.crashing_fetch(pages, requested, 3),
+                                       params={"sistema": "siafi"})
+        assert requested == [1, 2, 3]
+        
+        requested.clear()
+        stats = collector.collect_endpoint("orgaos", self.crashing_fetch(pages, requested),
+                                           params={"sistema": "siafi"}, resume=False)
+        assert requested == [1, 2, 3, 4]
+        assert stats["records_collected"] == 3
+    
+    def test_window_resumes_from_checkpoint(self, collector):
+        """Test an interrupted window continues from its last page."""
+        requested = []
+        crash = {"at": 2}
+        
+        def fetch(**params):
+            requested.append(params["pagina"])
+            if params["pagina"] == crash["at"]:
+                raise Crash()
+            return [{"id": params["pagina"]}] if params["pagina"] <= 3 else []
+        
+        with pytest.raises(Crash):
+            collector.collect_windowed("contratos", fetch, date_field="data",
+                                       start_date=datetime(2023, 1, 1),
+                                       end_date=datetime(2023, 1, 31))
+        
+        crash["at"] = None
+        requested.clear()
+        stats = collector.collect_windowed("contratos", fetch, date_field="data",
+                                           start_date=datetime(2023, 1, 1),
+                                           end_date=datetime(2023, 1, 31))
+        
+        assert requested == [2, 3, 4]
+        assert pd.read_parquet(stats["output_files"][0])["id"].tolist() == [1, 2, 3]
+        assert collector.state["checkpoints"] == {}
+
+
+class TestCollectWindowed:
+    """Test DataCollector.collect_windowed."""
+    
+    def test_month_windows(self):
+        """Test month windows follow calendar months and are clipped to the range."""
+        windows = DataCollector._date_windows(datetime(2023, 1, 15), datetime(2023, 3, 10))
+        
+        assert windows == [
+            (datetime(2023, 1, 15), datetime(2023, 1, 31)),
+            (datetime(2023, 2, 1), datetime(2023, 2, 28)),
+            (datetime(2023, 3, 1), datetime(2023, 3, 10)),
+        ]
+    
+    def test_week_windows(self):
+        """Test week windows span 7 days."""
+        windows = DataCollector._date_windows(datetime(2023, 12, 25), datetime(2024, 1, 9),
+                                              window="week")
+        
+        assert windows == [
+            (datetime(2023, 12, 25), datetime(2023, 12, 31)),
+            (datetime(2024, 1, 1), datetime(2024, 1, 7)),
+            (datetime(2024, 1, 8), datetime(2024, 1, 9)),
+        ]
+    
+    def test_invalid_window(self):
+        """Test unknown window sizes are rejected."""
+        with pytest.raises(ValueError, match="Unknown window"):
+            DataCollector._date_windows(datetime(2023, 1, 1), datetime(2023, 2, 1), "day")
+    
+    def test_windows_are_collected_and_recorded(self, collector):
+        """Test every window is crawled with its own date filter."""
+        seen = []
+        
+        def fetch(**params):
+            if params["pagina"] > 1:
+                return []
+            seen.append((params["dataInicial"], params["dataFinal"]))
+            return [{"id": params["dataInicial"], "data": params["dataInicial"]}]
+        
+        stats = collector.collect_windowed(
+            "contratos", fetch, date_field="data",
+            start_date=datetime(2023, 1, 1), end_date=datetime(2023, 3, 31), max_workers=3
+        )
+        
+        assert stats["status"] == "completed"
+        assert stats["windows_completed"] == 3
+        assert stats["records_collected"] == 3
+        assert sorted(seen) == [("01/01/2023", "31/01/2023"), ("01/02/2023", "28/02/2023"),
+                                ("01/03/2023", "31/03/2023")]
+        
+        df = pd.concat(pd.read_parquet(f) for f in stats["output_files"])
+        assert sorted(df["id"]) == ["01/01/2023", "01/02/2023", "01/03/2023"]
+        windows = collector.state["collections"]["contratos"]["windows"]
+        assert set(windows) == {"2023-01-01_2023-01-31", "2023-02-01_2023-02-28",
+                                "2023-03-01_2023-03-31"}
+    
+    def test_rerun_only_redoes_missing_windows(self, collector):
+        """Test a rerun skips completed windows and retries failed ones."""
+        calls = []
+        fail = {"02/2023"}
+        
+        def fetch(**params):
+            month = params["dataInicial"][3:]
+            if month in fail:
+                raise ConnectionError("boom")
+            if params["pagina"] > 1:
+                return []
+            calls.append(month)
+            return [{"id": month}]
+        
+        first = collector.collect_windowed(
+            "contratos", fetch, date_field="data",
+            start_date=datetime(2023, 1, 1), end_date=datetime(2023, 3, 31)
+        )
+        assert first["status"] == "failed"
+        assert first["windows_failed"] == 1
+        
+        fail.clear()
+        calls.clear()
+        reloaded = DataCollector(output_dir=str(collector.output_dir))
+        second = reloaded.collect_windowed(
+            "contratos", fetch, date_field="data",
+            start_date=datetime(2023, 1, 1), end_date=datetime(2023, 3, 31)
+        )
+        
+        assert second["status"] == "completed"
+        assert second["windows_skipped"] == 2
+        assert calls == ["02/2023"]
+    
+    def test_compacted_windows_stay_done(self, collector):
+        """Test windows whose files were compacted are not recrawled on top of them."""
+        calls = []
+        
+        def fetch(**params):
+            if params["pagina"] > 1:
+                return []
+            calls.append(params["dataInicial"])
+            return [{"id": params["dataInicial"] + suffix, "data": params["dataInicial"],
+                     "codigoOrgao": "26000"} for suffix in "ab"]
+        
+        kwargs = dict(date_field="data", start_date=datetime(2023, 1, 2),
+                      end_date=datetime(2023, 1, 22), window="week")
+        first = collector.collect_windowed("pagamentos", fetch, **kwargs)
+        assert first["windows_completed"] == 3
+        endpoint_dir = collector.output_dir / "pagamentos"
+        
+        stats = collector.compact_data()
+        assert stats["pagamentos"]["files_removed"] == 3
+        
+        calls.clear()
+        reloaded = DataCollector(output_dir=str(collector.output_dir))
+        second = reloaded.collect_windowed("pagamentos", fetch, **kwargs)
+        
+        assert second["windows_skipped"] == 3
+        assert calls == []
+        assert len(read_dataset(endpoint_dir)) == 6
+
+
+class TestCollectAll:
+    """Test DataCollector.collect_all."""
+    
+    def fake_collections(self, collector, pages_per_endpoint, delay=0.0):
+        """Replace the endpoint table with fake methods tracking concurrency."""
+        import threading
+        import time
+        
+        lock = threading.Lock()
+        tracker = {"in_flight": 0, "peak": 0, "started": []}
+        
+        def make_method(name, priority):
+            def fetch(**params):
+                with lock:
+                    if params["pagina"] == 1:
+                        tracker["started"].append(name)
+                    tracker["in_flight"] += 1
+                    tracker["peak"] = max(tracker["peak"], tracker["in_flight"])
+                time.sleep(delay)
+                with lock:
+                    tracker["in_flight"] -= 1
+                if params["pagina"] > pages_per_endpoint:
+                    return []
+                return [{"id": params["pagina"], "endpoint": name}]
+            return fetch
+        
+        priorities = {"pagamentos": 4, "orgaos": 0, "contratos": 3, "fornecedores": 1}
+        collections = {
+            name: {"method": make_method(name, priority), "params": {},
+                   "date_field": None, "priority": priority}
+            for name, priority in priorities.items()
+        }
+        collector._get_collections = lambda: collections
+        return tracker
+    
+    def test_endpoints_run_concurrently(self, collector):
+        """Test independent endpoints are collected in parallel."""
+        tracker = self.fake_collections(collector, pages_per_endpoint=3, delay=0.02)
+        
+        summary = collector.collect_all(max_workers=4)
+        
+        assert summary["successful"] == 4
+        assert summary["total_records"] == 12
+        assert tracker["peak"] > 1
+        assert set(collector.state["collections"]) == {
+            "pagamentos", "orgaos", "contratos", "fornecedores"
+        }
+    
+    def test_priority_orders_the_queue(self, collector):
+        """Test reference tables are scheduled before large endpoints."""
+        tracker = self.fake_collections(collector, pages_per_endpoint=1)
+        
+        summary = collector.collect_all(max_workers=1)
+        
+        assert tracker["started"] == ["orgaos", "fornecedores", "contratos", "pagamentos"]
+        assert list(summary["results"]) == tracker["started"]
+    
+    def windowed(self, collector, max_workers):
+        """Collect with contratos and pagamentos split into four month windows."""
+        tracker = self.fake_collections(collector, pages_per_endpoint=1, delay=0.01)
+        collections = collector._get_collections()
+        for name in ("contratos", "pagamentos"):
+            collections[name]["date_field"] = "data"
+        
+        summary = collector.collect_all(max_workers=max_workers, window="month",
+                                        start_date=datetime(2023, 1, 1),
+                                        end_date=datetime(2023, 4, 30))
+        return tracker, summary
+    
+    def test_windows_follow_endpoint_priority(self, collector):
+        """Test windows are queued at their endpoint's priority."""
+        tracker, summary = self.windowed(collector, max_workers=1)
+        
+        assert tracker["started"] == (["orgaos", "fornecedores"] + ["contratos"] * 4
+                                      + ["pagamentos"] * 4)
+        assert summary["successful"] == 4
+        assert summary["results"]["pagamentos"]["windows_completed"] == 4
+    
+    def test_windows_share_one_pool(self, collector):
+        """Test windows of every endpoint count against the same max_workers."""
+        tracker, summary = self.windowed(collector, max_workers=2)
+        
+        assert summary["successful"] == 4
+        assert summary["total_records"] == 10
+        assert tracker["peak"] <= 2
+    
+    def test_endpoint_selection(self, collector):
+        """Test only the requested endpoints are collected."""
+        self.fake_collections(collector, pages_per_endpoint=1)
+        
+        summary = collector.collect_all(endpoints=["orgaos", "contratos"], max_workers=2)
+        
+        assert list(summary["results"]) == ["orgaos", "contratos"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,285 @@
+"""
+Unit tests for the Hive-partitioned dataset layout.
+"""
+
+import sys
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data.dataset import (
+    COMPACTION_JOURNAL, NULL_PARTITION, PartitionedDatasetWriter, compact_dataset,
+    compacted_from, dataset_files, iter_dataset, partition_frame, partition_key, partition_path, read_dataset,
+    recover_compaction
+)
+
+
+RECORDS = [
+    {"id": 1, "data": "15/01/2024", "codigoOrgao": "01000"},
+    {"id": 2, "data": "2024-02-03", "unidadeGestora": {"orgaoVinculado": {"codigoSIAFI": "26000"}}},
+    {"id": 3, "data": None, "codigoOrgao": ""},
+]
+
+
+class TestPartitionKeys:
+    """Test partition key extraction."""
+    
+    def test_partition_key(self):
+        """Test dates in both formats and nested órgão codes are recognized."""
+        assert [partition_key(r, "data") for r in RECORDS] == [
+            (2024, 1, "01000"), (2024, 2, "26000"), (None, None, None)
+        ]
+    
+    def test_partition_frame_matches_records(self):
+        """Test the vectorized keys agree with the per-record ones."""
+        keys = partition_frame(pd.DataFrame(RECORDS), "data")
+        
+        rows = [tuple(None if pd.isna(v) else v for v in row)
+                for row in keys.itertuples(index=False)]
+        assert rows == [partition_key(r, "data") for r in RECORDS]
+    
+    def test_partition_frame_with_parsed_dates(self):
+        """Test datetime columns are used directly."""
+        df = pd.DataFrame({"data": [datetime(2023, 12, 31)], "codigoOrgao": ["36000"]})
+        
+        keys = partition_frame(df, "data")
+        
+        assert keys.iloc[0].tolist() == [2023, 12, "36000"]
+    
+    def test_partition_frame_with_arrow_structs(self):
+        """Test nested órgão codes are read from Arrow struct columns."""
+        table = pa.Table.from_pandas(pd.DataFrame(RECORDS), preserve_index=False)
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        
+        keys = partition_frame(df, "data")
+        
+        assert [None if pd.isna(v) else v for v in keys["orgao_codigo"]] == ["01000", "26000", None]
+    
+    def test_partition_path(self):
+        """Test Hive directory names, with nulls in the default partition."""
+        assert partition_path((2024, 1, "01000")) == "year=2024/month=1/orgao_codigo=01000"
+        assert partition_path((None, None, None)).startswith(f"year={NULL_PARTITION}/")
+
+
+class TestPartitionedDatasetWriter:
+    """Test PartitionedDatasetWriter and read_dataset."""
+    
+    def write(self, base_dir, records, basename, **kwargs):
+        with PartitionedDatasetWriter(base_dir, basename, date_field="data", **kwargs) as writer:
+            writer.write(records)
+        return writer.written
+    
+    def test_records_are_routed_to_partitions(self, tmp_path):
+        """Test one file per partition and pruning on read."""
+        written = self.write(tmp_path, RECORDS, "run1.parquet")
+        
+        assert len(written) == 3
+        assert (tmp_path / "year=2024/month=1/orgao_codigo=01000/run1.parquet").exists()
+        
+        df = read_dataset(tmp_path, filters=[("orgao_codigo", "=", "01000")])
+        assert df["id"].tolist() == [1]
+        assert df["orgao_codigo"].tolist() == ["01000"]
+        assert sorted(read_dataset(tmp_path)["id"]) == [1, 2, 3]
+    
+    def test_add_keeps_existing_files(self, tmp_path):
+        """Test a run without replace adds files to the partitions it touches."""
+        self.write(tmp_path, RECORDS[:1], "run1.parquet")
+        self.write(tmp_path, [{"id": 4, "data": "20/01/2024", "codigoOrgao": "01000"}],
+                   "run2.parquet")
+        
+        df = read_dataset(tmp_path, filters=[("year", "=", 2024), ("month", "=", 1)])
+        assert sorted(df["id"]) == [1, 4]
+    
+    def test_replace_only_touched_partitions(self, tmp_path):
+        """Test replace supersedes written partitions and leaves the others."""
+        self.write(tmp_path, RECORDS[:2], "run1.parquet")
+        self.write(tmp_path, [{"id": 5, "data": "20/01/2024", "codigoOrgao": "01000"}],
+                   "run2.parquet", replace=True)
+        
+        assert sorted(read_dataset(tmp_path)["id"]) == [2, 5]
+    
+    def test_replace_predicate(self, tmp_path):
+        """Test a predicate limits which touched partitions are replaced."""
+        self.write(tmp_path, RECORDS, "run1.parquet")
+        self.write(tmp_path, [{"id": 6, "data": "01/01/2024", "codigoOrgao": "01000"},
+                              {"id": 7, "data": None}],
+                   "run2.parquet", replace=lambda key: key[:2] == (2024, 1))
+        
+        assert sorted(read_dataset(tmp_path)["id"]) == [2, 3, 6, 7]
+    
+    def test_buffers_are_bounded(self, tmp_path):
+        """Test rows buffered across partitions are flushed past the limit."""
+        with PartitionedDatasetWriter(tmp_path, "run.parquet", date_field="data",
+                                      max_buffered_rows=2) as writer:
+            writer.write(RECORDS)
+            assert sum(w.buffered_rows for w in writer.writers.values()) <= 2
+        
+        assert sorted(read_dataset(tmp_path)["id"]) == [1, 2, 3]
+    
+    def test_unpartitioned_dataset(self, tmp_path):
+        """Test datasets without a date field are written at the root."""
+        with PartitionedDatasetWriter(tmp_path, "orgaos.parquet") as writer:
+            writer.write([{"codigo": "1"}])
+        
+        assert writer.written == [tmp_path / "orgaos.parquet"]
+        assert read_dataset(tmp_path).columns.tolist() == ["codigo"]
+    
+    def test_write_frame(self, tmp_path):
+        """Test DataFrames are partitioned and share one schema."""
+        df = pd.DataFrame({
+            "id": [1, 2],
+            "data": pd.to_datetime(["2024-01-05", "2024-03-01"]),
+            "codigoOrgao": ["01000", "01000"],
+            "year": [0, 0]
+        })
+        
+        with PartitionedDatasetWriter(tmp_path, "p.parquet", date_field="data") as writer:
+            writer.write_frame(df)
+        
+        assert len(writer.written) == 2
+        assert read_dataset(tmp_path, filters=[("month", "=", 3)])["id"].tolist() == [2]
+    
+    def test_hidden_files_are_ignored(self, tmp_path):
+        """Test samples and temporary files are not read as data."""
+        self.write(tmp_path, RECORDS[:1], "run1.parquet")
+        (tmp_path / ".run1.sample.json").write_text("[]")
+        (tmp_path / "year=2024" / ".partial.parquet.tmp").write_text("")
+        
+        assert len(dataset_files(tmp_path)) == 1
+        assert read_dataset(tmp_path)["id"].tolist() == [1]
+    
+    def test_missing_dataset(self, tmp_path):
+        """Test reading a dataset without files returns None."""
+        assert read_dataset(tmp_path / "missing") is None
+    
+    def test_iter_dataset(self, tmp_path):
+        """Test datasets stream in bounded batches with the rows of read_dataset."""
+        self.write(tmp_path, RECORDS * 3, "run.parquet")
+        
+        batches = list(iter_dataset(tmp_path, batch_size=2))
+        
+        assert [len(batch) for batch in batches] == [2, 2, 2, 2, 1]
+        pd.testing.assert_frame_equal(pd.concat(batches, ignore_index=True),
+                                      read_dataset(tmp_path))
+        assert [len(b) for b in iter_dataset(tmp_path, filters=[("month", "=", 1)])] == [3]
+        assert list(iter_dataset(tmp_path / "missing")) == []
+
+
+
+class TestCompaction:
+    """Test compact_dataset."""
+    
+    def write_runs(self, base_dir, runs):
+        for i, records in enumerate(runs):
+            with PartitionedDatasetWriter(base_dir, f"run{i}.parquet", date_field="data") as writer:
+                writer.write(records)
+    
+    def test_small_files_are_merged_and_sorted(self, tmp_path):
+        """Test each partition ends up with one file, sorted, with the same rows."""
+        self.write_runs(tmp_path, [
+            [{"id": i, "data": f"{28 - i:02d}/01/2024", "codigoOrgao": "01000"}] for i in range(5)
+        ] + [[{"id": 9, "data": "01/02/2024", "codigoOrgao": "01000"}]])
+        
+        stats = compact_dataset(tmp_path, sort_by=["data", "missing"])
+        
+        assert stats == {"partitions": 1, "files_removed": 5, "files_written": 1, "rows": 5}
+        january = tmp_path / "year=2024/month=1/orgao_codigo=01000"
+        assert [p.name.startswith("compacted_") for p in dataset_files(january)] == [True]
+        df = read_dataset(tmp_path, filters=[("month", "=", 1)])
+        assert df["id"].tolist() == [4, 3, 2, 1, 0]
+        # The single-file partition is left alone
+        assert (tmp_path / "year=2024/month=2/orgao_codigo=01000/run5.parquet").exists()
+    
+    def test_schema_is_unified(self, tmp_path):
+        """Test files written with different columns share one schema afterwards."""
+        self.write_runs(tmp_path, [
+            [{"id": 1, "data": "01/01/2024", "codigoOrgao": "01000"}],
+            [{"id": 2, "data": "02/01/2024", "codigoOrgao": "01000", "valor": 1.5}],
+        ])
+        
+        compact_dataset(tmp_path)
+        
+        df = read_dataset(tmp_path).sort_values("id")
+        assert df["valor"].isna().tolist() == [True, False]
+    
+    def test_target_rows(self, tmp_path):
+        """Test large partitions are split and files at the target are skipped."""
+        self.write_runs(tmp_path, [
+            [{"id": i, "data": "01/01/2024", "codigoOrgao": "01000"}] for i in range(5)
+        ])
+        
+        stats = compact_dataset(tmp_path, target_rows=2)
+        
+        assert stats["files_written"] == 3
+        assert compact_dataset(tmp_path, target_rows=2)["partitions"] == 0
+        assert sorted(read_dataset(tmp_path)["id"]) == [0, 1, 2, 3, 4]
+    
+    def test_compacted_files_record_their_sources(self, tmp_path):
+        """Test compacted files list the original files, through repeated compactions."""
+        self.write_runs(tmp_path, [
+            [{"id": i, "data": "01/01/2024", "codigoOrgao": "01000"}] for i in range(3)
+        ])
+        partition = tmp_path / "year=2024/month=1/orgao_codigo=01000"
+        (partition / "run2.parquet").rename(tmp_path / "held.parquet")
+        compact_dataset(tmp_path)
+        
+        first = dataset_files(partition)[0]
+        assert compacted_from(first) == ["run0.parquet", "run1.parquet"]
+        assert compacted_from(tmp_path / "held.parquet") == []
+        
+        (tmp_path / "held.parquet").rename(partition / "run2.parquet")
+        compact_dataset(tmp_path)
+        
+        assert compacted_from(dataset_files(partition)[0]) == [
+            "run0.parquet", "run1.parquet", "run2.parquet"
+        ]
+    
+    def test_interrupted_compaction(self, tmp_path):
+        """Test readers never see both old and new files, and recovery finishes the job."""
+        self.write_runs(tmp_path, [
+            [{"id": i, "data": "01/01/2024", "codigoOrgao": "01000"}] for i in range(2)
+        ])
+        partition = tmp_path / "year=2024/month=1/orgao_codigo=01000"
+        compact_dataset(tmp_path)
+        new = dataset_files(partition)[0]
+        
+        # Simulate a crash after committing but before removing the originals
+        for name in ("run0.parquet", "run1.parquet"):
+            (partition / name).write_bytes(new.read_bytes())
+        (partition / COMPACTION_JOURNAL).write_text(json.dumps(
+            {"state": "committed", "old": ["run0.parquet", "run1.parquet"], "new": [new.name]}
+        ))
+        assert dataset_files(tmp_path) == [new]
+        
+        recover_compaction(partition)
+        assert sorted(p.name for p in partition.iterdir()) == [new.name]
+        assert sorted(read_dataset(tmp_path)["id"]) == [0, 1]
+    
+    def test_uncommitted_output_is_hidden(self, tmp_path):
+        """Test files of a compaction still being written are not read."""
+        self.write_runs(tmp_path, [
+            [{"id": i, "data": "01/01/2024", "codigoOrgao": "01000"}] for i in range(2)
+        ])
+        partition = tmp_path / "year=2024/month=1/orgao_codigo=01000"
+        (partition / "compacted_x.parquet").write_bytes((partition / "run0.parquet").read_bytes())
+        (partition / COMPACTION_JOURNAL).write_text(json.dumps(
+            {"state": "writing", "old": ["run0.parquet", "run1.parquet"],
+             "new": ["compacted_x.parquet"]}
+        ))
+        
+        assert sorted(read_dataset(tmp_path)["id"]) == [0, 1]
+        
+        compact_dataset(tmp_path)
+        assert not (partition / "compacted_x.parquet").exists()
+        assert sorted(read_dataset(tmp_path)["id"]) == [0, 1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,143 @@
+"""
+Unit tests for the vectorized value parsers.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data.parsers import (
+    DATE_FORMAT_BR, detect_date_format, parse_currency, parse_currency_array, parse_dates
+)
+
+
+class TestParseCurrency:
+    """Test parse_currency."""
+    
+    @pytest.mark.parametrize("text, expected", [
+        ("R$ 1.234,56", 1234.56),
+        ("1.234.567,8", 1234567.8),
+        ("12,00", 12.0),
+        (" 42 ", 42.0),
+        ("1.234", 1234.0),
+        ("-R$ 10,00", -10.0),
+        ("R$ -10,00", -10.0),
+        ("(1.234,56)", -1234.56),
+        ("(R$ 2,50)", -2.5),
+        ("R$ 1.000,50", 1000.5),
+        ("1234.5", 1234.5),
+        ("-0.25", -0.25),
+    ])
+    def test_amounts(self, text, expected):
+        """Test Brazilian formats, signs and dot decimals are parsed."""
+        assert parse_currency(pd.Series([text])).tolist() == [expected]
+    
+    @pytest.mark.parametrize("text", ["", "abc", "nan", "1.2.3", "(1,00", "--5", "1,2,3", None])
+    def test_invalid_values_are_nan(self, text):
+        """Test values that are not amounts become NaN instead of garbage."""
+        assert parse_currency(pd.Series([text], dtype=object)).isna().all()
+    
+    def test_numeric_columns_are_untouched(self):
+        """Test floats keep their decimal point."""
+        values = pd.Series([1234.5, None, 7], index=[10, 11, 12])
+        
+        result = parse_currency(values)
+        
+        assert result.dtype == np.float64
+        assert result.index.tolist() == [10, 11, 12]
+        assert result.tolist()[0] == 1234.5 and np.isnan(result.tolist()[1])
+    
+    def test_mixed_object_column(self):
+        """Test numbers mixed with text keep their value."""
+        values = pd.Series([2.5, "1.000,5", None, {"valor": 1}], dtype=object)
+        
+        result = parse_currency(values)
+        
+        assert result.tolist()[:2] == [2.5, 1000.5]
+        assert result.isna().tolist()[2:] == [True, True]
+    
+    def test_arrow_backed_strings(self):
+        """Test Arrow-backed string columns are parsed directly."""
+        values = pd.Series(["R$ 1,50", None], dtype="string[pyarrow]")
+        
+        assert parse_currency(values).tolist()[0] == 1.5
+        assert parse_currency_array(pa.array(["(3,00)"])).to_pylist() == [-3.0]
+
+
+class TestParseDates:
+    """Test detect_date_format and parse_dates."""
+    
+    @pytest.mark.parametrize("values, expected", [
+        (["05/03/2024", "13/03/2024"], DATE_FORMAT_BR),
+        (["05/03/2024 10:30:00"], "%d/%m/%Y %H:%M:%S"),
+        (["05/03/2024 10:30"], "%d/%m/%Y %H:%M"),
+        (["2024-03-05", "2024-03-05T10:30:00"], "ISO8601"),
+        (["abc", None], None),
+    ])
+    def test_detect_format(self, values, expected):
+        """Test the API's date formats are told apart from a sample."""
+        assert detect_date_format(pd.Series(values, dtype=object)) == expected
+    
+    def test_day_first(self):
+        """Test dd/mm/yyyy dates are not read month first."""
+        result = parse_dates(pd.Series(["05/03/2024", "13/03/2024"]))
+        
+        assert result.tolist() == [pd.Timestamp("2024-03-05"), pd.Timestamp("2024-03-13")]
+    
+    def test_mixed_formats_and_invalid_values(self):
+        """Test values in other formats are retried and invalid ones become NaT."""
+        values = pd.Series(["05/03/2024", "2024-03-07", None, "", "31/02/2024", " 06/03/2024 "],
+                           index=list("abcdef"))
+        
+        result = parse_dates(values)
+        
+        assert result.index.tolist() == list("abcdef")
+        assert result.tolist()[:2] == [pd.Timestamp("2024-03-05"), pd.Timestamp("2024-03-07")]
+        assert result.isna().tolist()[2:5] == [True, True, True]
+        assert result.tolist()[5] == pd.Timestamp("2024-03-06")
+    
+    def test_mixed_utc_offsets(self):
+        """Test ISO datetimes with different offsets parse to local times."""
+        values = pd.Series(["2024-01-05T10:00:00-03:00", "2024-01-06T10:00:00-02:00",
+                            "2024-01-07T10:00:00.5Z", "2024-01-08 10:00:00+0000"])
+        
+        result = parse_dates(values)
+        
+        assert pd.api.types.is_datetime64_dtype(result.dtype)
+        assert result.dt.day.tolist() == [5, 6, 7, 8]
+        assert result.dt.hour.tolist() == [10, 10, 10, 10]
+        assert detect_date_format(values) == "ISO8601"
+    
+    def test_br_dates_mixed_with_offset_datetimes(self):
+        """Test BR dates next to ISO datetimes with offsets give a datetime column."""
+        result = parse_dates(pd.Series(["05/01/2024", "2024-01-06T10:00:00-03:00"]))
+        
+        assert pd.api.types.is_datetime64_dtype(result.dtype)
+        assert result.tolist() == [pd.Timestamp("2024-01-05"), pd.Timestamp("2024-01-06 10:00")]
+    
+    def test_repeated_values_match_direct_parsing(self):
+        """Test parsing each distinct string once gives the per-value result."""
+        days = np.random.default_rng(0).integers(1, 29, 1000)
+        values = pd.Series([f"{day:02d}/03/2024" for day in days])
+        
+        expected = pd.to_datetime(values, format=DATE_FORMAT_BR)
+        pd.testing.assert_series_equal(parse_dates(values), expected)
+    
+    def test_arrow_backed_and_datetime_columns(self):
+        """Test Arrow-backed strings are parsed and datetime columns are untouched."""
+        values = pd.Series(["05/03/2024", None], dtype=pd.ArrowDtype(pa.string()))
+        dates = pd.Series(pd.to_datetime(["2024-03-05"]))
+        
+        assert parse_dates(values).tolist()[0] == pd.Timestamp("2024-03-05")
+        assert parse_dates(dates) is dates
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,414 @@
+"""
+Unit tests for DataProcessor.
+"""
+
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data.dataset import PartitionedDatasetWriter, compact_dataset, read_dataset
+from src.data.processor import DataProcessor
+
+
+RAW_PAGAMENTOS = [
+    {
+        "data": f"{day:02d}/03/2024",
+        "dataDocumento": f"{day:02d}/03/2024",
+        "valor": f"R$ {day}.000,50",
+        "valorDocumento": None if day == 3 else float(day),
+        "codigoFavorecido": 1000 + day,
+        "numeroDocumento": f"2024NE{day:04d}",
+        "nomeFavorecido": f"  EMPRESA   {day}  LTDA ",
+        "observacao": None,
+        "unidadeGestora": {"codigo": "150001", "orgaoVinculado": {"codigoSIAFI": "26000"}}
+    }
+    for day in range(1, 6)
+]
+
+
+def write_raw(input_dir, records, name="pagamentos", basename=None):
+    with PartitionedDatasetWriter(Path(input_dir) / name, basename or f"{name}.parquet",
+                                  date_field="data") as writer:
+        writer.write(records)
+
+
+@pytest.fixture
+def make_processor(tmp_path):
+    """Factory of processors over a shared raw directory."""
+    write_raw(tmp_path / "raw", RAW_PAGAMENTOS)
+    
+    def make(engine=None):
+        return DataProcessor(
+            input_dir=str(tmp_path / "raw"),
+            output_dir=str(tmp_path / (engine or "default") / "processed"),
+            current_dir=str(tmp_path / (engine or "default") / "current"),
+            engine=engine
+        )
+    return make
+
+
+class TestEngines:
+    """Test the pandas and arrow processing engines."""
+    
+    def test_unknown_engine(self, tmp_path):
+        """Test an unknown engine is rejected."""
+        with pytest.raises(ValueError):
+            DataProcessor(output_dir=str(tmp_path), engine="spark")
+    
+    def test_engines_agree(self, make_processor):
+        """Test both engines produce the same cleaned values."""
+        frames = {
+            engine: make_processor(engine).process_dataset("pagamentos")
+            .sort_values("numeroDocumento").reset_index(drop=True)
+            for engine in ("pandas", "arrow")
+        }
+        
+        for col in ["valor", "valorDocumento", "data", "data_month", "codigoFavorecido",
+                    "nomeFavorecido", "observacao"]:
+            assert frames["pandas"][col].astype(object).tolist() == \
+                frames["arrow"][col].astype(object).tolist(), col
+        assert frames["arrow"]["nomeFavorecido"].tolist()[0] == "EMPRESA 1 LTDA"
+        assert frames["arrow"]["valor"].tolist()[0] == 1000.5
+        assert frames["arrow"]["valorDocumento"].tolist()[2] == 0
+    
+    def test_arrow_engine_keeps_arrow_columns(self, make_processor):
+        """Test text and nested columns stay Arrow-backed."""
+        processor = make_processor("arrow")
+        df = processor.process_dataset("pagamentos")
+        
+        assert isinstance(df["nomeFavorecido"].dtype, pd.ArrowDtype)
+        assert isinstance(df["unidadeGestora"].dtype, pd.ArrowDtype)
+        assert df["codigoFavorecido"].tolist()[0] == "1001"
+        
+        # The output reads back without the Arrow backend too
+        files = list((processor.output_dir / "pagamentos").rglob("*.parquet"))
+        assert files and all(len(pd.read_parquet(path)) for path in files)
+    
+    def test_arrow_engine_updates_current_state(self, make_processor):
+        """Test Arrow struct columns are merged and re-runs are recognized as unchanged."""
+        processor = make_processor("arrow")
+        processor.process_dataset("pagamentos")
+        
+        stats = processor.upsert_current("pagamentos", processor.process_dataset("pagamentos"))
+        
+        assert stats["unchanged"] == len(RAW_PAGAMENTOS)
+        assert len(processor.load_current("pagamentos")) == len(RAW_PAGAMENTOS)
+
+
+class TestDates:
+    """Test date parsing in the processing pipeline."""
+    
+    def test_dates_are_day_first(self, make_processor):
+        """Test API dates are parsed day first, not month first."""
+        df = make_processor().process_dataset("pagamentos")
+        
+        assert sorted(df["data"].dt.day.tolist()) == [1, 2, 3, 4, 5]
+        assert set(df["data_month"]) == {3}
+    
+    def test_failures_are_counted_per_column(self, make_processor):
+        """Test values that are not dates are counted in the info JSON and batch stats."""
+        processor = make_processor()
+        processor.processing_configs["pagamentos"]["date_columns"].append("nomeFavorecido")
+        
+        processor.process_dataset("pagamentos")
+        info = next((processor.output_dir / "pagamentos").glob(".*.info.json"))
+        assert json.loads(info.read_text())["date_parse_failures"] == {
+            "nomeFavorecido": len(RAW_PAGAMENTOS)
+        }
+        
+        for info in (processor.output_dir / "pagamentos").glob(".*.info.json"):
+            info.unlink()
+        processor.process_dataset_streaming("pagamentos", batch_size=2)
+        info = next((processor.output_dir / "pagamentos").glob(".*.info.json"))
+        assert json.loads(info.read_text())["date_parse_failures"] == {
+            "nomeFavorecido": len(RAW_PAGAMENTOS)
+        }
+    
+    def test_mixed_formats_and_offsets_give_datetime_columns(self, make_processor):
+        """Test columns mixing BR dates and ISO offsets support the .dt accessor."""
+        df = pd.DataFrame({"data": ["05/01/2024", "2024-01-06T10:00:00-03:00",
+                                    "2024-01-07T10:00:00-02:00"]})
+        
+        parsed = make_processor()._parse_dates(df, ["data"])
+        
+        assert parsed["data"].dt.day.tolist() == [5, 6, 7]
+
+
+class TestStreaming:
+    """Test batch-by-batch processing."""
+    
+    @staticmethod
+    def processed(processor):
+        return (read_dataset(processor.output_dir / "pagamentos")
+                .drop(columns=["_processed_at"])
+                .sort_values("numeroDocumento").reset_index(drop=True))
+    
+    @pytest.mark.parametrize("engine", ["pandas", "arrow"])
+    def test_matches_in_memory_processing(self, make_processor, tmp_path, engine):
+        """Test batches produce the same output and current state as one frame."""
+        in_memory = make_processor(engine)
+        in_memory.process_dataset("pagamentos")
+        streaming = DataProcessor(input_dir=str(tmp_path / "raw"),
+                                  output_dir=str(tmp_path / "streaming" / "processed"),
+                                  current_dir=str(tmp_path / "streaming" / "current"),
+                                  engine=engine)
+        
+        stats = streaming.process_dataset_streaming("pagamentos", batch_size=2)
+        
+        assert stats["status"] == "success"
+        assert stats["batches"] == 3
+        assert stats["rows_written"] == len(RAW_PAGAMENTOS)
+        pd.testing.assert_frame_equal(self.processed(streaming), self.processed(in_memory))
+        assert stats["current"]["keys"] == len(RAW_PAGAMENTOS)
+        assert len(list((streaming.output_dir / "pagamentos").glob(".*.info.json"))) == 1
+    
+    def test_duplicates_across_batches(self, tmp_path):
+        """Test the last version of a record wins even in a later batch."""
+        updated = dict(RAW_PAGAMENTOS[0], valor="R$ 7,00")
+        write_raw(tmp_path / "raw", RAW_PAGAMENTOS + [updated])
+        processor = DataProcessor(input_dir=str(tmp_path / "raw"),
+                                  output_dir=str(tmp_path / "processed"),
+                                  current_dir=str(tmp_path / "current"))
+        
+        stats = processor.process_dataset_streaming("pagamentos", batch_size=2)
+        
+        df = self.processed(processor)
+        assert stats["duplicates_removed"] == 1
+        assert len(df) == len(RAW_PAGAMENTOS)
+        assert df.loc[df["numeroDocumento"] == "2024NE0001", "valor"].tolist() == [7.0]
+    
+    def test_complete_duplicates_without_ids(self, tmp_path):
+        """Test datasets without id columns drop repeated rows across batches."""
+        write_raw(tmp_path / "raw", RAW_PAGAMENTOS * 2, name="despesas")
+        processor = DataProcessor(input_dir=str(tmp_path / "raw"),
+                                  output_dir=str(tmp_path / "processed"),
+                                  current_dir=str(tmp_path / "current"))
+        
+        stats = processor.process_dataset_streaming("despesas", batch_size=3)
+        
+        assert stats["rows_written"] == len(RAW_PAGAMENTOS)
+        assert stats["duplicates_removed"] == len(RAW_PAGAMENTOS)
+        assert stats["current"] is None
+    
+    def test_seen_rows_are_kept_in_few_sorted_runs(self, make_processor):
+        """Test cross-batch deduplication matches drop_duplicates with O(log n) runs."""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({"a": rng.integers(0, 500, 5000), "b": rng.integers(0, 3, 5000)})
+        processor = make_processor()
+        seen = []
+        
+        kept = pd.concat(processor._drop_seen(df.iloc[start:start + 100], seen)
+                         for start in range(0, len(df), 100))
+        
+        pd.testing.assert_frame_equal(kept, df.drop_duplicates())
+        assert sum(len(run) for run in seen) == len(kept)
+        assert len(seen) <= 8
+        assert all(np.all(run[1:] > run[:-1]) for run in seen)
+    
+    def test_invalid_data_keeps_previous_output(self, make_processor):
+        """Test a batch failing validation leaves the processed partitions untouched."""
+        processor = make_processor()
+        processor.process_dataset_streaming("pagamentos", batch_size=2)
+        before = self.processed(processor)
+        
+        negative = dict(RAW_PAGAMENTOS[4], valor="-R$ 0,50")
+        write_raw(processor.input_dir, RAW_PAGAMENTOS[:4] + [negative])
+        stats = processor.process_dataset_streaming("pagamentos", batch_size=2)
+        
+        assert stats["status"] == "invalid"
+        assert stats["validation"]["issues"] == ["Found 1 negative values in valor"]
+        pd.testing.assert_frame_equal(self.processed(processor), before)
+    
+    def test_process_all_in_batches(self, make_processor):
+        """Test process_all streams datasets when given a batch size."""
+        summary = make_processor().process_all(batch_size=2)
+        
+        assert summary["results"]["pagamentos"]["status"] == "success"
+        assert summary["results"]["pagamentos"]["rows"] == len(RAW_PAGAMENTOS)
+
+
+class TestParallel:
+    """Test process_all on a process pool."""
+    
+    @pytest.fixture
+    def processors(self, tmp_path):
+        records = [
+            dict(record, numeroDocumento=f"{record['numeroDocumento']}-{orgao}",
+                 unidadeGestora={"orgaoVinculado": {"codigoSIAFI": orgao}})
+            for orgao in ["26000", "36000", "52000"] for record in RAW_PAGAMENTOS
+        ]
+        write_raw(tmp_path / "raw", records)
+        write_raw(tmp_path / "raw", [{"codigo": "1", "nome": " MEC "}], name="orgaos")
+        return [
+            DataProcessor(input_dir=str(tmp_path / "raw"),
+                          output_dir=str(tmp_path / name / "processed"),
+                          current_dir=str(tmp_path / name / "current"))
+            for name in ["sequential", "parallel"]
+        ]
+    
+    def test_plan_splits_large_datasets_by_orgao(self, processors):
+        """Test datasets over the task size are split into órgão groups."""
+        processor = processors[0]
+        
+        assert len(processor._plan_tasks(["pagamentos", "orgaos"], task_mb=1024)) == 2
+        tasks = processor._plan_tasks(["pagamentos"], task_mb=0.001)
+        assert len(tasks) == 3
+        assert all(task["filters"] is not None for task in tasks)
+    
+    def test_matches_sequential_processing(self, processors):
+        """Test the merged summary and output match processing in one process."""
+        sequential, parallel = processors
+        expected = sequential.process_all(max_workers=1)
+        
+        # A tiny budget splits pagamentos into one task per órgão
+        summary = parallel.process_all(max_workers=2, memory_budget_mb=0.001)
+        
+        assert summary.keys() == expected.keys()
+        assert summary["results"] == expected["results"]
+        assert summary["results"]["pagamentos"]["rows"] == 3 * len(RAW_PAGAMENTOS)
+        
+        def processed(processor):
+            return (read_dataset(processor.output_dir / "pagamentos")
+                    .drop(columns=["_processed_at"])
+                    .sort_values("numeroDocumento").reset_index(drop=True))
+        pd.testing.assert_frame_equal(processed(parallel), processed(sequential))
+        assert len(parallel.load_current("pagamentos")) == 3 * len(RAW_PAGAMENTOS)
+    
+    def test_failed_task_fails_its_dataset(self, processors):
+        """Test a failing task is reported against its dataset only."""
+        parallel = processors[1]
+        (parallel.input_dir / "orgaos" / "orgaos.parquet").write_text("not parquet")
+        
+        summary = parallel.process_all(max_workers=2)
+        
+        assert summary["failed"] == 1
+        assert summary["results"]["orgaos"]["status"] == "failed"
+        assert summary["results"]["pagamentos"]["status"] == "success"
+
+
+class TestIncremental:
+    """Test processing only the raw files added since the last run."""
+    
+    OTHER_ORGAO = [
+        dict(record, numeroDocumento=f"{record['numeroDocumento']}-36000",
+             unidadeGestora={"orgaoVinculado": {"codigoSIAFI": "36000"}})
+        for record in RAW_PAGAMENTOS
+    ]
+    
+    @pytest.fixture
+    def processor(self, tmp_path):
+        write_raw(tmp_path / "raw", RAW_PAGAMENTOS + self.OTHER_ORGAO)
+        return DataProcessor(input_dir=str(tmp_path / "raw"),
+                             output_dir=str(tmp_path / "processed"),
+                             current_dir=str(tmp_path / "current"))
+    
+    @staticmethod
+    def output_files(processor):
+        return {path: path.stat().st_mtime_ns
+                for path in (processor.output_dir / "pagamentos").rglob("*.parquet")}
+    
+    def test_unchanged_raw_data_is_skipped(self, processor):
+        """Test a second run without new files processes and rewrites nothing."""
+        assert len(processor.process_incremental("pagamentos")) == 2 * len(RAW_PAGAMENTOS)
+        files = self.output_files(processor)
+        
+        # Touched files are rehashed but their content is unchanged
+        for path in (processor.input_dir / "pagamentos").rglob("*.parquet"):
+            path.touch()
+        
+        assert processor.process_incremental("pagamentos").empty
+        assert self.output_files(processor) == files
+    
+    def test_new_file_is_merged(self, processor):
+        """Test only the new rows are processed and replace their previous versions."""
+        processor.process_incremental("pagamentos")
+        files = self.output_files(processor)
+        
+        updated = dict(RAW_PAGAMENTOS[0], valor="R$ 7,00")
+        added = dict(RAW_PAGAMENTOS[0], numeroDocumento="2024NE9999")
+        write_raw(processor.input_dir, [updated, added], basename="pagamentos_2.parquet")
+        df = processor.process_incremental("pagamentos")
+        
+        assert len(df) == 2
+        processed = read_dataset(processor.output_dir / "pagamentos")
+        assert len(processed) == 2 * len(RAW_PAGAMENTOS) + 1
+        assert processed.loc[processed["numeroDocumento"] == "2024NE0001",
+                             "valor"].tolist() == [7.0]
+        # Partitions of the other órgão were not rewritten
+        other = {path: mtime for path, mtime in files.items() if "36000" in str(path)}
+        assert other and all(self.output_files(processor).get(p) == m for p, m in other.items())
+        assert len(processor.load_current("pagamentos")) == 2 * len(RAW_PAGAMENTOS) + 1
+    
+    def test_invalid_delta_is_retried(self, processor):
+        """Test files whose rows fail validation stay out of the manifest."""
+        processor.process_incremental("pagamentos")
+        negative = dict(RAW_PAGAMENTOS[0], valor="-R$ 0,50")
+        write_raw(processor.input_dir, [negative], basename="pagamentos_2.parquet")
+        
+        assert len(processor.process_incremental("pagamentos")) == 1
+        assert len(processor.process_incremental("pagamentos")) == 1
+        assert len(read_dataset(processor.output_dir / "pagamentos")) == 2 * len(RAW_PAGAMENTOS)
+    
+    def test_process_all_incremental(self, processor):
+        """Test process_all reports the new rows of incremental runs."""
+        assert processor.process_all(incremental=True)["results"]["pagamentos"]["rows"] == 10
+        assert processor.process_all(incremental=True)["results"]["pagamentos"]["rows"] == 0
+    
+    def test_compacted_raw_files_stay_processed(self, processor):
+        """Test raw compaction does not make already processed rows look new."""
+        processor.process_incremental("pagamentos")
+        added = dict(RAW_PAGAMENTOS[0], numeroDocumento="2024NE9999")
+        write_raw(processor.input_dir, [added], basename="pagamentos_2.parquet")
+        processor.process_incremental("pagamentos")
+        files = self.output_files(processor)
+        
+        assert compact_dataset(processor.input_dir / "pagamentos")["partitions"] == 1
+        
+        assert processor.process_incremental("pagamentos").empty
+        assert self.output_files(processor) == files
+    
+    def test_compacted_unprocessed_raw_files_are_processed(self, processor):
+        """Test a compacted file holding unprocessed rows is merged without duplicates."""
+        processor.process_incremental("pagamentos")
+        added = dict(RAW_PAGAMENTOS[0], numeroDocumento="2024NE9999")
+        write_raw(processor.input_dir, [added], basename="pagamentos_2.parquet")
+        compact_dataset(processor.input_dir / "pagamentos")
+        
+        assert len(processor.process_incremental("pagamentos")) == len(RAW_PAGAMENTOS) + 1
+        processed = read_dataset(processor.output_dir / "pagamentos")
+        assert len(processed) == 2 * len(RAW_PAGAMENTOS) + 1
+        assert processor.process_incremental("pagamentos").empty
+    
+    def test_unpartitioned_merge_rewrites_only_affected_files(self, processor):
+        """Test datasets without a date field only rewrite files holding replaced rows."""
+        def orgao(codigo, nome):
+            return {"codigo": codigo, "codigoSiafi": codigo, "nome": nome}
+        
+        write_raw(processor.input_dir, [orgao("1", "MEC"), orgao("2", "MS")], name="orgaos")
+        processor.process_incremental("orgaos")
+        write_raw(processor.input_dir, [orgao("3", "MF")], name="orgaos",
+                  basename="orgaos_2.parquet")
+        processor.process_incremental("orgaos")
+        output_dir = processor.output_dir / "orgaos"
+        first, second = sorted(output_dir.glob("*.parquet"))
+        first_mtime = first.stat().st_mtime_ns
+        
+        write_raw(processor.input_dir, [orgao("3", "MF2")], name="orgaos",
+                  basename="orgaos_3.parquet")
+        assert len(processor.process_incremental("orgaos")) == 1
+        
+        assert first.stat().st_mtime_ns == first_mtime
+        assert not second.exists()
+        processed = read_dataset(output_dir).sort_values("codigo")
+        assert processed["nome"].tolist() == ["MEC", "MS", "MF2"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
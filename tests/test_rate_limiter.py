@@ -0,0 +1,127 @@
+"""
+Unit tests for the time-of-day rate limiters.
+"""
+
+import asyncio
+import multiprocessing
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.api.rate_limiter import (
+    AsyncSharedRateLimiter, SharedRateLimiter, get_current_limit
+)
+
+
+class SmallSharedRateLimiter(SharedRateLimiter):
+    """Shared limiter with a tiny quota so tests run quickly."""
+
+    def get_current_limit(self) -> int:
+        return 4
+
+
+def collect(db_path, count, queue):
+    """Worker process: make count requests and report their timestamps."""
+    limiter = SmallSharedRateLimiter(db_path, window_seconds=0.5)
+    for _ in range(count):
+        limiter.wait_if_needed()
+        queue.put(time.time())
+
+
+class TestCurrentLimit:
+    """Test the day/night schedule."""
+
+    def test_night_and_day_limits(self):
+        """Test 700 req/min at night and 400 req/min during the day."""
+        assert get_current_limit(datetime(2024, 1, 1, 3)) == 700
+        assert get_current_limit(datetime(2024, 1, 1, 6)) == 400
+        assert get_current_limit(datetime(2024, 1, 1, 23)) == 400
+
+
+class TestSharedRateLimiter:
+    """Test SharedRateLimiter class."""
+
+    def test_instances_share_quota(self, tmp_path):
+        """Test limiters on the same file count each other's requests."""
+        db_path = tmp_path / "rate.sqlite3"
+        first = SmallSharedRateLimiter(db_path, window_seconds=0.5)
+        second = SmallSharedRateLimiter(db_path, window_seconds=0.5)
+
+        for _ in range(2):
+            assert first.wait_if_needed() == 0.0
+            assert second.wait_if_needed() == 0.0
+
+        assert first.get_remaining_requests() == 0
+        assert not second.can_make_request()
+
+        start = time.time()
+        assert second.wait_if_needed() > 0
+        assert time.time() - start >= 0.4
+
+    def test_scopes_are_independent(self, tmp_path):
+        """Test different tokens keep separate counters."""
+        db_path = tmp_path / "rate.sqlite3"
+        first = SmallSharedRateLimiter(db_path, scope=SharedRateLimiter.scope_for_token("a"))
+        second = SmallSharedRateLimiter(db_path, scope=SharedRateLimiter.scope_for_token("b"))
+
+        for _ in range(4):
+            first.wait_if_needed()
+
+        assert first.get_remaining_requests() == 0
+        assert second.get_remaining_requests() == 4
+
+    def test_reset(self, tmp_path):
+        """Test reset clears the shared window."""
+        limiter = SmallSharedRateLimiter(tmp_path / "rate.sqlite3")
+        for _ in range(4):
+            limiter.wait_if_needed()
+
+        limiter.reset()
+
+        assert limiter.get_remaining_requests() == 4
+
+    def test_processes_share_quota(self, tmp_path):
+        """Test several processes never exceed the quota together."""
+        db_path = str(tmp_path / "rate.sqlite3")
+        SmallSharedRateLimiter(db_path).close()
+        queue = multiprocessing.Queue()
+
+        workers = [multiprocessing.Process(target=collect, args=(db_path, 4, queue))
+                   for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        stamps = sorted(queue.get(timeout=10) for _ in range(8))
+        for worker in workers:
+            worker.join()
+
+        # At most 4 requests inside any 0.5s window
+        for i in range(len(stamps) - 4):
+            assert stamps[i + 4] - stamps[i] >= 0.45
+
+    def test_async_limiter(self, tmp_path):
+        """Test the async variant shares the same state."""
+        db_path = tmp_path / "rate.sqlite3"
+        limiter = AsyncSharedRateLimiter(db_path, window_seconds=0.5)
+        limiter.shared.get_current_limit = lambda: 2
+
+        async def run():
+            waits = [await limiter.wait_if_needed() for _ in range(2)]
+            remaining = await limiter.get_remaining_requests()
+            waits.append(await limiter.wait_if_needed())
+            return waits, remaining
+
+        waits, remaining = asyncio.run(run())
+
+        assert waits[:2] == [0.0, 0.0]
+        assert remaining == 0
+        assert waits[2] > 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,184 @@
+"""
+Unit tests for request coalescing.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.api.async_client import AsyncTransparenciaAPIClient
+from src.api.client import TransparenciaAPIClient, CacheManager
+from src.api.singleflight import AsyncSingleFlight, SingleFlight, request_key
+
+
+def run_concurrently(fn, count):
+    """Call fn from several threads at once and return the results."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = fn()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+    """Test SingleFlight class."""
+
+    def test_request_key_ignores_param_order(self):
+        """Test keys are equal regardless of parameter order."""
+        assert request_key("u", {"a": 1, "b": 2}) == request_key("u", {"b": 2, "a": 1})
+        assert request_key("u", {"a": 1}) != request_key("u", {"a": 2})
+
+    def test_concurrent_calls_are_coalesced(self):
+        """Test identical concurrent calls run the function once."""
+        group = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return [{"id": 1}]
+
+        results = run_concurrently(lambda: group.do("key", slow), 5)
+
+        assert len(calls) == 1
+        assert all(r == [{"id": 1}] for r in results)
+        assert group.get_stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+    def test_errors_are_shared(self):
+        """Test waiters receive the leader's exception."""
+        group = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise ValueError("boom")
+
+        results = run_concurrently(lambda: group.do("key", failing), 3)
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert group.executed == 1
+
+    def test_key_is_released(self):
+        """Test sequential calls are not coalesced."""
+        group = SingleFlight()
+
+        assert group.do("key", lambda: 1) == 1
+        assert group.do("key", lambda: 2) == 2
+        assert group.coalesced == 0
+
+
+class TestAsyncSingleFlight:
+    """Test AsyncSingleFlight class."""
+
+    def test_concurrent_calls_are_coalesced(self):
+        """Test identical concurrent coroutines await one call."""
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return [{"id": 1}]
+
+        async def run():
+            return await asyncio.gather(*(group.do("key", slow) for _ in range(5)),
+                                        group.do("other", slow))
+
+        results = asyncio.run(run())
+
+        assert len(calls) == 2
+        assert results[:5] == [[{"id": 1}]] * 5
+        assert group.get_stats() == {"executed": 2, "coalesced": 4, "in_flight": 0}
+
+    def test_cancelled_waiter_does_not_cancel_call(self):
+        """Test cancelling one waiter leaves the shared call running."""
+        group = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run():
+            first = asyncio.ensure_future(group.do("key", slow))
+            second = asyncio.ensure_future(group.do("key", slow))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run()) == "done"
+
+
+class TestClientCoalescing:
+    """Test coalescing inside TransparenciaAPIClient."""
+
+    @pytest.fixture
+    def client(self, monkeypatch, tmp_path):
+        """Create client instance with mocked environment."""
+        monkeypatch.setenv("TRANSPARENCIA_API_TOKEN", "test_token")
+        monkeypatch.setenv("CACHE_ENABLED", "false")
+
+        original_init = CacheManager.__init__
+        monkeypatch.setattr("src.api.client.CacheManager.__init__",
+                            lambda self, **kwargs: original_init(
+                                self, cache_dir=str(tmp_path / "cache"), ttl=3600))
+        return TransparenciaAPIClient()
+
+    @patch('src.api.client.requests.Session.get')
+    def test_identical_requests_share_one_call(self, mock_get, client):
+        """Test concurrent identical requests hit the network once."""
+        def slow_get(*args, **kwargs):
+            time.sleep(0.1)
+            response = Mock(status_code=200, headers={})
+            response.json.return_value = [{"codigo": "1"}]
+            return response
+
+        mock_get.side_effect = slow_get
+
+        results = run_concurrently(lambda: client.get_orgaos(pagina=1), 4)
+
+        assert mock_get.call_count == 1
+        assert all(r == [{"codigo": "1"}] for r in results)
+        assert client.get_stats()["requests"]["coalesced"] == 3
+
+    @patch('src.api.client.requests.Session.get')
+    def test_leader_rechecks_the_cache(self, mock_get, client, monkeypatch):
+        """Test a miss racing with the previous leader's cache write is not refetched."""
+        lookups = iter([None, [{"codigo": "1"}]])
+        monkeypatch.setattr(client.cache, "get", lambda url, params: next(lookups))
+
+        assert client.get_orgaos(pagina=1) == [{"codigo": "1"}]
+        mock_get.assert_not_called()
+
+    def test_async_leader_rechecks_the_cache(self, monkeypatch, tmp_path):
+        """Test the async client also rechecks the cache once it leads the request."""
+        monkeypatch.setenv("TRANSPARENCIA_API_TOKEN", "test_token")
+        monkeypatch.setenv("CACHE_ENABLED", "false")
+        monkeypatch.chdir(tmp_path)
+        client = AsyncTransparenciaAPIClient()
+        lookups = iter([None, [{"codigo": "1"}]])
+        monkeypatch.setattr(client.cache, "get", lambda url, params: next(lookups))
+        monkeypatch.setattr(client, "_fetch", Mock(side_effect=AssertionError("refetched")))
+
+        assert asyncio.run(client.get_orgaos(pagina=1)) == [{"codigo": "1"}]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
@@ -0,0 +1,191 @@
+"""
+Unit tests for the current-state upsert tables.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data.processor import DataProcessor
+from src.data.upsert import UpsertTable
+
+
+def frame(ids, valor=1.0, **extra):
+    """Batch of payment-like records keyed on (codigoFavorecido, numeroDocumento)."""
+    return pd.DataFrame({
+        "codigoFavorecido": [f"F{i % 3}" for i in ids],
+        "numeroDocumento": [str(i) for i in ids],
+        "valor": [valor] * len(ids),
+        **extra
+    })
+
+
+ID_COLUMNS = ["codigoFavorecido", "numeroDocumento"]
+
+
+@pytest.fixture
+def table(tmp_path):
+    with UpsertTable(tmp_path / "pagamentos", ID_COLUMNS, buckets=4) as table:
+        yield table
+
+
+class TestUpsert:
+    """Test merging batches into a current-state table."""
+    
+    def test_insert_and_read(self, table):
+        """Test a first batch is inserted and read back without the key column."""
+        stats = table.upsert(frame(range(10)))
+        
+        assert stats["inserted"] == 10
+        df = table.read()
+        assert len(df) == 10
+        assert "_key" not in df.columns
+        assert table.get_stats()["keys"] == 10
+    
+    def test_unchanged_rows_write_nothing(self, table):
+        """Test re-collected identical records leave the data files alone."""
+        table.upsert(frame(range(10)))
+        files = table.files()
+        
+        stats = table.upsert(frame(range(10), _collected_at="later"))
+        
+        assert stats == {"inserted": 0, "updated": 0, "unchanged": 10, "files_written": 0}
+        assert table.files() == files
+    
+    def test_update_replaces_previous_version(self, table):
+        """Test an updated record supersedes its old version, in its bucket only."""
+        table.upsert(frame(range(20)))
+        before = table.files()
+        
+        stats = table.upsert(frame([5], valor=99.0))
+        
+        assert stats["updated"] == 1 and stats["files_written"] == 1
+        df = table.read()
+        assert len(df) == 20
+        assert df.loc[df["numeroDocumento"] == "5", "valor"].tolist() == [99.0]
+        # Other buckets keep their files
+        assert len(set(before) & set(table.files())) == len(before) - 1
+        assert all(path.exists() for path in table.files())
+    
+    def test_inserts_add_delta_files(self, table):
+        """Test new keys are appended without rewriting existing files."""
+        table.upsert(frame(range(10)))
+        before = set(table.files())
+        
+        stats = table.upsert(frame(range(10, 12)))
+        
+        assert stats["inserted"] == 2
+        assert before <= set(table.files())
+        assert len(table.read()) == 12
+    
+    def test_last_row_of_batch_wins(self, table):
+        """Test duplicate keys within a batch keep the last row."""
+        batch = pd.concat([frame([1], valor=1.0), frame([1], valor=2.0)])
+        
+        stats = table.upsert(batch)
+        
+        assert stats["inserted"] == 1
+        assert table.read()["valor"].tolist() == [2.0]
+    
+    def test_orphan_files_are_removed(self, table):
+        """Test files of an interrupted merge are cleaned up by the next one."""
+        table.upsert(frame(range(5)))
+        orphan = table.base_dir / "bucket-000-orphan.parquet"
+        frame([99]).to_parquet(orphan)
+        
+        table.upsert(frame([6]))
+        
+        assert not orphan.exists()
+        assert len(table.read()) == 6
+    
+    def test_id_columns_must_match(self, table):
+        """Test an existing table cannot be reopened with other id columns."""
+        table.upsert(frame(range(3)))
+        
+        with pytest.raises(ValueError):
+            UpsertTable(table.base_dir, ["numeroDocumento"])
+        with UpsertTable(table.base_dir) as reopened:
+            assert reopened.id_columns == ID_COLUMNS
+            assert reopened.buckets == 4
+    
+    def test_compact_merges_bucket_files(self, table):
+        """Test compaction leaves one file per bucket and the same current state."""
+        for start in range(0, 12, 3):
+            table.upsert(frame(range(start, start + 3)))
+        table.upsert(frame([1], valor=5.0))
+        before = table.read().sort_values("numeroDocumento").reset_index(drop=True)
+        
+        stats = table.compact()
+        
+        assert stats["buckets"] > 0
+        assert len(table.files()) == len({p.name.split("-")[1] for p in table.files()})
+        assert len(list(table.base_dir.glob("*.parquet"))) == len(table.files())
+        after = table.read().sort_values("numeroDocumento").reset_index(drop=True)
+        pd.testing.assert_frame_equal(before, after, check_like=True)
+        assert table.compact() == {"buckets": 0, "files_removed": 0}
+    
+    def test_update_rewrites_only_files_with_the_key(self, table):
+        """Test files of the bucket that do not hold the updated key are kept."""
+        table.upsert(frame(range(20)))
+        table.upsert(frame(range(20, 40)))
+        before = set(table.files())
+        
+        table.upsert(frame([5], valor=99.0))
+        
+        assert len(before - set(table.files())) == 1
+        assert table.read()["valor"].tolist().count(99.0) == 1
+    
+    def test_hash_collisions_are_detected(self, table, monkeypatch):
+        """Test different keys sharing a hash raise instead of overwriting each other."""
+        monkeypatch.setattr("src.data.upsert.key_hashes",
+                            lambda df, id_columns: np.zeros(len(df), dtype=np.int64))
+        table.upsert(frame([1]))
+        
+        with pytest.raises(RuntimeError, match="collision"):
+            table.upsert(frame([2]))
+        with pytest.raises(RuntimeError, match="collision"):
+            table.upsert(frame([3, 4]))
+        assert table.upsert(frame([1], valor=2.0))["updated"] == 1
+        assert table.read()["numeroDocumento"].tolist() == ["1"]
+    
+    def test_missing_id_columns(self, table):
+        """Test batches without the id columns are rejected."""
+        with pytest.raises(ValueError):
+            table.upsert(pd.DataFrame({"valor": [1.0]}))
+
+
+class TestProcessorCurrentState:
+    """Test the processor keeps the current state up to date."""
+    
+    def test_overlapping_runs_are_deduplicated(self, tmp_path):
+        """Test records seen by two processing runs appear once in the current state."""
+        processor = DataProcessor(
+            input_dir=str(tmp_path / "raw"),
+            output_dir=str(tmp_path / "processed"),
+            current_dir=str(tmp_path / "current")
+        )
+        
+        first = processor.upsert_current("pagamentos", frame(range(10)))
+        second = processor.upsert_current("pagamentos", frame(range(5, 15), valor=1.0))
+        
+        assert first["inserted"] == 10
+        assert second["inserted"] == 5 and second["unchanged"] == 5
+        assert len(processor.load_current("pagamentos")) == 15
+    
+    def test_datasets_without_ids_are_skipped(self, tmp_path):
+        """Test a dataset without id columns leaves no current-state table."""
+        processor = DataProcessor(current_dir=str(tmp_path / "current"),
+                                  output_dir=str(tmp_path / "processed"))
+        
+        assert processor.upsert_current("pagamentos", pd.DataFrame({"valor": [1.0]})) is None
+        assert processor.load_current("pagamentos") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])
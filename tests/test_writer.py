@@ -0,0 +1,103 @@
+"""
+Unit tests for the streaming Parquet writer.
+"""
+
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data.writer import StreamingParquetWriter, conform_table
+
+
+class TestStreamingParquetWriter:
+    """Test StreamingParquetWriter class."""
+    
+    def test_pages_are_grouped_into_row_groups(self, tmp_path):
+        """Test small pages are batched into full row groups."""
+        path = tmp_path / "out.parquet"
+        
+        with StreamingParquetWriter(path, row_group_size=10) as writer:
+            for start in range(0, 25, 3):
+                writer.write([{"id": n} for n in range(start, min(start + 3, 25))])
+        
+        metadata = pq.ParquetFile(path).metadata
+        assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [10, 10, 5]
+        assert pq.read_table(path)["id"].to_pylist() == list(range(25))
+    
+    def test_file_appears_only_on_close(self, tmp_path):
+        """Test output is written to a temporary file and renamed on close."""
+        path = tmp_path / "out.parquet"
+        writer = StreamingParquetWriter(path, row_group_size=2)
+        writer.write([{"id": 1}, {"id": 2}, {"id": 3}])
+        
+        assert not path.exists()
+        assert writer.tmp_path.exists()
+        
+        assert writer.close() == path
+        assert path.exists()
+        assert not writer.tmp_path.exists()
+    
+    def test_error_discards_partial_file(self, tmp_path):
+        """Test an exception inside the block leaves no output behind."""
+        path = tmp_path / "out.parquet"
+        
+        with pytest.raises(RuntimeError):
+            with StreamingParquetWriter(path, row_group_size=1) as writer:
+                writer.write([{"id": 1}])
+                raise RuntimeError("crash")
+        
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_schema_evolves_after_row_groups_are_written(self, tmp_path):
+        """Test new columns and wider types rewrite earlier row groups."""
+        path = tmp_path / "out.parquet"
+        
+        with StreamingParquetWriter(path, row_group_size=1) as writer:
+            writer.write([{"id": 1, "valor": None, "orgao": {"codigo": "1"}}])
+            writer.write([{"id": 2, "valor": 10.5, "orgao": {"codigo": "2", "sigla": "X"},
+                           "extra": "a"}])
+        
+        assert writer.rewrites == 1
+        rows = pq.read_table(path).to_pylist()
+        assert rows[0] == {"id": 1, "valor": None, "orgao": {"codigo": "1", "sigla": None},
+                           "extra": None}
+        assert rows[1]["orgao"] == {"codigo": "2", "sigla": "X"}
+    
+    def test_constant_columns(self, tmp_path):
+        """Test constant columns are appended to every row."""
+        path = tmp_path / "out.parquet"
+        
+        with StreamingParquetWriter(path, constants={"_endpoint": pa.scalar("orgaos")}) as writer:
+            writer.write([{"id": 1}])
+            writer.write([{"id": 2, "nome": "x"}])
+        
+        table = pq.read_table(path)
+        assert table.column_names == ["id", "nome", "_endpoint"]
+        assert table["_endpoint"].to_pylist() == ["orgaos", "orgaos"]
+    
+    def test_no_rows_writes_nothing(self, tmp_path):
+        """Test closing an empty writer creates no file."""
+        writer = StreamingParquetWriter(tmp_path / "out.parquet")
+        
+        assert writer.close() is None
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_conform_table_adds_missing_columns(self):
+        """Test conform_table casts columns and fills missing ones with nulls."""
+        table = pa.table({"id": pa.array([1], type=pa.int32())})
+        schema = pa.schema([("id", pa.int64()), ("nome", pa.string())])
+        
+        conformed = conform_table(table, schema)
+        
+        assert conformed.schema.equals(schema)
+        assert conformed.to_pylist() == [{"id": 1, "nome": None}]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s"])